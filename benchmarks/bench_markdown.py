@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark: markdown-to-HTML throughput of pandoc versus the native engine.
+
+Converts every document of the synthetic corpus with the pandoc binary (one
+subprocess per document, as borel runs it) and with the in-process native
+engine, and reports the median time and throughput of each.
+
+Usage:
+    python benchmarks/bench_markdown.py [--kinds mixed,tables] [--pages 1,10,100] [--runs 5]
+"""
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the borel package to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from corpus import KINDS, write_corpus  # noqa: E402
+
+from borel.html_generator import HTMLGenerator  # noqa: E402
+from borel.processor import MarkdownProcessor  # noqa: E402
+
+DEFAULT_PAGES = (1, 10, 100)
+
+
+def _median_time(func, runs: int) -> float:
+    func()
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--kinds', default=','.join(KINDS))
+    parser.add_argument('--pages', default=','.join(str(p) for p in DEFAULT_PAGES))
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    processor = MarkdownProcessor()
+    generator = HTMLGenerator()
+    engines = ('pandoc', 'native')
+
+    header = f"{'case':<20}{'size':>10}" + ''.join(f"{engine:>12}{'MB/s':>8}" for engine in engines) \
+        + f"{'speed-up':>10}"
+    print(header)
+    print('-' * len(header))
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        paths = write_corpus(corpus_dir, args.kinds.split(','), [int(p) for p in args.pages.split(',')])
+        for path in paths:
+            content, _ = processor.process_file(str(path))
+            size = len(content.encode('utf-8'))
+            seconds = {
+                engine: _median_time(lambda: generator._markdown_to_html(content, engine), args.runs)
+                for engine in engines
+            }
+            cells = ''.join(f"{seconds[engine] * 1000:>9.1f} ms{size / seconds[engine] / 1e6:>8.2f}"
+                            for engine in engines)
+            print(f"{path.stem:<20}{size / 1024:>7.1f} KB{cells}"
+                  f"{seconds['pandoc'] / seconds['native']:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
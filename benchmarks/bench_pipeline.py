@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Benchmark: time each stage of the rendering pipeline on a synthetic corpus.
+
+Stages are timed separately: markdown processing (frontmatter, page breaks),
+pandoc conversion, template rendering, WeasyPrint layout and PDF write. Every
+document runs in its own process so the peak RSS is its own. Results can be
+saved as JSON and compared against a stored baseline.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--kinds mixed,tables] [--pages 1,10,100]
+                                        [--runs 3] [--output results.json]
+                                        [--baseline benchmarks/baseline.json] [--threshold 0.1]
+"""
+
+import argparse
+import json
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Add the borel package to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from corpus import KINDS, write_corpus  # noqa: E402
+
+STAGES = ('process', 'pandoc', 'template', 'layout', 'write')
+DEFAULT_PAGES = (1, 10, 100)
+# Differences below this are treated as noise when comparing to a baseline
+MIN_DIFFERENCE = 0.005
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_case(input_file: str, runs: int) -> Dict[str, Any]:
+    """Time every stage for one document, in this process. One extra warm-up run is discarded."""
+    from borel.backends import import_weasyprint
+    from borel.config import get_default_css
+    from borel.fonts import get_font_config
+    from borel.html_generator import HTMLGenerator
+    from borel.processor import MarkdownProcessor
+
+    weasyprint = import_weasyprint()
+    css_content = get_default_css()
+    base_url = str(Path(input_file).parent.resolve()) + '/'
+    processor = MarkdownProcessor()
+    generator = HTMLGenerator()
+    timings: Dict[str, List[float]] = {stage: [] for stage in STAGES}
+    pages = pdf_size = None
+
+    for run in range(runs + 1):
+        sample: Dict[str, float] = {}
+
+        start = time.perf_counter()
+        content, metadata = processor.process_file(input_file)
+        sample['process'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        body = generator._markdown_to_html(content)
+        sample['pandoc'] = time.perf_counter() - start
+
+        # Template rendering alone: reuse the converted body instead of running pandoc again
+        template_only = HTMLGenerator()
+        template_only._markdown_to_html = lambda _: body
+        start = time.perf_counter()
+        html_content = template_only.generate_html(content, metadata, css_content)
+        sample['template'] = time.perf_counter() - start
+
+        if weasyprint is not None:
+            start = time.perf_counter()
+            document = weasyprint.HTML(string=html_content, base_url=base_url).render(
+                font_config=get_font_config())
+            sample['layout'] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            pdf = document.write_pdf()
+            sample['write'] = time.perf_counter() - start
+            pages, pdf_size = len(document.pages), len(pdf)
+
+        if run > 0:
+            for stage, seconds in sample.items():
+                timings[stage].append(seconds)
+
+    stages = {stage: statistics.median(values) for stage, values in timings.items() if values}
+    return {
+        'stages': stages,
+        'total': sum(stages.values()),
+        'peak_rss_mb': _peak_rss_mb(),
+        'markdown_bytes': Path(input_file).stat().st_size,
+        'pages': pages,
+        'pdf_bytes': pdf_size,
+    }
+
+
+def run_isolated(input_file: Path, runs: int) -> Dict[str, Any]:
+    """Run one case in a fresh interpreter and return its results."""
+    result = subprocess.run(
+        [sys.executable, __file__, '--case', str(input_file), '--runs', str(runs)],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1] if result.stderr.strip() else
+                f"exit status {result.returncode}"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Return a line per stage that got slower than the baseline by more than ``threshold``."""
+    regressions = []
+    for name, case in results['cases'].items():
+        base = baseline.get('cases', {}).get(name)
+        if not base or 'stages' not in case or 'stages' not in base:
+            continue
+        for stage, seconds in list(case['stages'].items()) + [('total', case['total'])]:
+            before = base['total'] if stage == 'total' else base['stages'].get(stage)
+            if not before:
+                continue
+            if seconds > before * (1 + threshold) and seconds - before > MIN_DIFFERENCE:
+                regressions.append(f"{name} {stage}: {before * 1000:.1f} ms -> {seconds * 1000:.1f} ms "
+                                   f"(+{seconds / before - 1:.0%})")
+    return regressions
+
+
+def _print_table(results: Dict[str, Any]) -> None:
+    header = f"{'case':<20}" + ''.join(f"{stage:>11}" for stage in STAGES + ('total',)) + f"{'peak RSS':>11}"
+    print(header)
+    print('-' * len(header))
+    for name, case in results['cases'].items():
+        if 'error' in case:
+            print(f"{name:<20} failed: {case['error']}")
+            continue
+        cells = [case['stages'].get(stage) for stage in STAGES] + [case['total']]
+        print(f"{name:<20}" + ''.join(f"{c * 1000:>8.1f} ms" if c is not None else f"{'-':>11}"
+                                      for c in cells)
+              + f"{case['peak_rss_mb']:>8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--kinds', default=','.join(KINDS))
+    parser.add_argument('--pages', default=','.join(str(p) for p in DEFAULT_PAGES),
+                        help='Document sizes in approximate pages (e.g. 1,10,100,1000)')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--corpus', help='Write the corpus here instead of a temporary directory')
+    parser.add_argument('--output', help='Save the results as JSON')
+    parser.add_argument('--baseline', help='Compare against previously saved results')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Relative slowdown reported as a regression')
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case, args.runs)))
+        return
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus_dir = args.corpus or temp_dir
+        paths = write_corpus(corpus_dir, args.kinds.split(','),
+                             [int(p) for p in args.pages.split(',')])
+        results: Dict[str, Any] = {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'runs': args.runs,
+            'cases': {},
+        }
+        for path in paths:
+            results['cases'][path.stem] = run_isolated(path, args.runs)
+            print(f"  {path.stem} done", file=sys.stderr)
+
+    _print_table(results)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2) + '\n', encoding='utf-8')
+        print(f"Saved results: {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"Regressions against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (threshold {args.threshold:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark: branding CSS applied twice (inline + re-parsed user stylesheet)
+versus applied once (inline only, extra stylesheets compiled once).
+
+Usage:
+    python benchmarks/bench_stylesheets.py [--css examples/diligent-branding.css]
+                                           [--input examples/sample.md] [--runs 10]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add the borel package to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from weasyprint import CSS, HTML
+
+from borel.html_generator import HTMLGenerator
+from borel.processor import MarkdownProcessor
+from borel.stylesheets import StylesheetManager
+
+
+def _time(func, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    repo = Path(__file__).parent.parent
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--css', default=str(repo / 'examples' / 'diligent-branding.css'))
+    parser.add_argument('--input', default=str(repo / 'examples' / 'sample.md'))
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    css_content = Path(args.css).read_text(encoding='utf-8')
+    content, metadata = MarkdownProcessor().process_file(args.input)
+    html_content = HTMLGenerator().generate_html(content, metadata, css_content)
+    base_url = str(Path(args.input).parent.resolve()) + '/'
+
+    def parse_only():
+        CSS(string=css_content, base_url=base_url)
+
+    def layout_twice():
+        # Previous behaviour: inline <style> plus the same CSS re-parsed as a user stylesheet
+        HTML(string=html_content, base_url=base_url).render(
+            stylesheets=[CSS(string=css_content, base_url=base_url)])
+
+    def layout_once():
+        HTML(string=html_content, base_url=base_url).render()
+
+    manager = StylesheetManager()
+
+    def compiled_lookup():
+        manager.get(css_content, base_url)
+
+    # Warm up fonts and caches so the first run does not skew the medians
+    layout_once()
+
+    results = {
+        'css parse': _time(parse_only, args.runs),
+        'compiled stylesheet lookup': _time(compiled_lookup, args.runs),
+        'layout, CSS applied twice': _time(layout_twice, args.runs),
+        'layout, CSS applied once': _time(layout_once, args.runs),
+    }
+
+    print(f"CSS: {args.css} ({len(css_content)} bytes), input: {args.input}, runs: {args.runs}")
+    for name, seconds in results.items():
+        print(f"  {name:<30} {seconds * 1000:9.2f} ms")
+    saved = results['layout, CSS applied twice'] - results['layout, CSS applied once']
+    print(f"  {'saved per document':<30} {saved * 1000:9.2f} ms "
+          f"({saved / results['layout, CSS applied twice']:.0%})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Deterministic generator of synthetic markdown documents for benchmarking.
+
+Each document kind stresses one part of the pipeline:
+
+    headings     many headings with short paragraphs
+    lists        long bullet and numbered lists, some nested
+    tables       large pipe tables
+    page-breaks  a [CRLF] page break after every short section
+    images       figures referencing generated PNG files
+    code         fenced code blocks
+    mixed        all of the above, one kind per page
+
+Sizes are given in approximate printed A4 pages. The same kind, size and
+seed always produce the same bytes.
+
+Usage:
+    python benchmarks/corpus.py OUTPUT_DIR [--kinds mixed,tables] [--pages 1,10,100,1000]
+"""
+
+import argparse
+import random
+import struct
+import zlib
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List
+
+KINDS = ('headings', 'lists', 'tables', 'page-breaks', 'images', 'code', 'mixed')
+DEFAULT_PAGES = (1, 10, 100, 1000)
+IMAGE_COUNT = 4
+
+_WORDS = (
+    "board governance risk compliance audit committee quarterly report revenue "
+    "strategy policy review approval meeting minutes agenda resolution director "
+    "shareholder disclosure control framework assessment finding remediation owner "
+    "deadline budget forecast variance capital liquidity exposure mitigation process "
+    "procedure evidence sample testing operating effectiveness design deficiency "
+    "material weakness escalation oversight charter independence conflict interest"
+).split()
+
+
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    text = ' '.join(rng.choice(_WORDS) for _ in range(words))
+    return text[0].upper() + text[1:] + '.'
+
+
+def _paragraph(rng: random.Random, sentences: int = 4) -> str:
+    return ' '.join(_sentence(rng, rng.randint(8, 16)) for _ in range(sentences))
+
+
+def _headings_page(rng: random.Random, page: int) -> str:
+    parts = [f"## Section {page}"]
+    for sub in range(1, 6):
+        parts.append(f"### {page}.{sub} {_sentence(rng, 4)[:-1]}")
+        parts.append(_paragraph(rng, 3))
+    return '\n\n'.join(parts)
+
+
+def _lists_page(rng: random.Random, page: int) -> str:
+    lines = [f"## Checklist {page}", ""]
+    for item in range(1, 21):
+        lines.append(f"- {_sentence(rng, 8)}")
+        if item % 5 == 0:
+            lines += [f"    - {_sentence(rng, 6)}" for _ in range(2)]
+    lines.append("")
+    lines += [f"{item}. {_sentence(rng, 10)}" for item in range(1, 16)]
+    return '\n'.join(lines)
+
+
+def _tables_page(rng: random.Random, page: int) -> str:
+    lines = [f"## Register {page}", "",
+             "| ID | Owner | Area | Status | Notes |",
+             "|----|-------|------|--------|-------|"]
+    for row in range(1, 31):
+        lines.append(f"| {page}-{row} | {rng.choice(_WORDS).title()} | {rng.choice(_WORDS)} | "
+                     f"{rng.choice(('Open', 'Closed', 'In progress'))} | {_sentence(rng, 5)} |")
+    return '\n'.join(lines)
+
+
+def _page_breaks_page(rng: random.Random, page: int) -> str:
+    return f"## Part {page}\n\n{_paragraph(rng, 2)}\n\n[CRLF]"
+
+
+def _images_page(rng: random.Random, page: int) -> str:
+    parts = [f"## Figures {page}"]
+    for figure in range(2):
+        image = (page * 2 + figure) % IMAGE_COUNT
+        parts.append(f"![Figure {page}.{figure + 1}](images/figure-{image}.png)")
+        parts.append(_paragraph(rng, 2))
+    return '\n\n'.join(parts)
+
+
+def _code_page(rng: random.Random, page: int) -> str:
+    parts = [f"## Listing {page}"]
+    for block in range(2):
+        lines = [f"def step_{page}_{block}(records):"]
+        for line in range(18):
+            lines.append(f"    {rng.choice(_WORDS)}_{line} = records.get('{rng.choice(_WORDS)}', {line})")
+        lines.append("    return records")
+        parts.append("```python\n" + '\n'.join(lines) + "\n```")
+    return '\n\n'.join(parts)
+
+
+_PAGES: Dict[str, Callable[[random.Random, int], str]] = {
+    'headings': _headings_page,
+    'lists': _lists_page,
+    'tables': _tables_page,
+    'page-breaks': _page_breaks_page,
+    'images': _images_page,
+    'code': _code_page,
+}
+
+
+def generate_document(kind: str, pages: int, seed: int = 0) -> str:
+    """Return the markdown of one synthetic document of roughly ``pages`` pages."""
+    if kind not in KINDS:
+        raise ValueError(f"Unknown document kind: {kind}")
+    rng = random.Random(f"{kind}-{pages}-{seed}")
+    page_kinds = [k for k in KINDS if k != 'mixed']
+    body = []
+    for page in range(1, pages + 1):
+        page_kind = page_kinds[page % len(page_kinds)] if kind == 'mixed' else kind
+        body.append(_PAGES[page_kind](rng, page))
+    frontmatter = (f"---\ntitle: Benchmark {kind} ({pages} pages)\nauthor: Benchmark\n"
+                   f"date: 2025-01-15\n---\n\n")
+    return frontmatter + '\n\n'.join(body) + '\n'
+
+
+def _png(width: int, height: int, seed: int) -> bytes:
+    """A deterministic RGB gradient PNG, without needing Pillow."""
+    rows = []
+    for y in range(height):
+        row = bytearray(b'\x00')
+        for x in range(width):
+            row += bytes(((x + seed * 40) % 256, (y * 2) % 256, (x + y + seed * 90) % 256))
+        rows.append(bytes(row))
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (struct.pack('>I', len(data)) + kind + data
+                + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff))
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(b''.join(rows), 6)) + chunk(b'IEND', b''))
+
+
+def write_corpus(output_dir: str, kinds: Iterable[str] = KINDS,
+                 pages: Iterable[int] = DEFAULT_PAGES, seed: int = 0) -> List[Path]:
+    """Write one document per kind and size (plus the images they use) and return their paths."""
+    output = Path(output_dir)
+    images = output / 'images'
+    images.mkdir(parents=True, exist_ok=True)
+    for index in range(IMAGE_COUNT):
+        image = images / f"figure-{index}.png"
+        if not image.exists():
+            image.write_bytes(_png(600, 400, index))
+
+    paths = []
+    for kind in kinds:
+        for count in pages:
+            path = output / f"{kind}-{count}p.md"
+            path.write_text(generate_document(kind, count, seed), encoding='utf-8')
+            paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic markdown corpus.")
+    parser.add_argument('output_dir')
+    parser.add_argument('--kinds', default=','.join(KINDS))
+    parser.add_argument('--pages', default=','.join(str(p) for p in DEFAULT_PAGES))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    paths = write_corpus(args.output_dir, args.kinds.split(','),
+                         [int(p) for p in args.pages.split(',')], args.seed)
+    for path in paths:
+        print(f"{path} ({path.stat().st_size} bytes)")
+
+
+if __name__ == '__main__':
+    main()
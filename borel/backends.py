@@ -0,0 +1,181 @@
+"""
+Lazy loading and cached probing of the rendering backends.
+
+WeasyPrint takes hundreds of milliseconds to import, and finding pandoc means
+running ``pandoc --version`` for every candidate binary. Borel imports
+WeasyPrint only when a PDF is rendered. The probe results (pandoc path and
+version, WeasyPrint version) are kept on disk and reused while the pandoc
+binaries, the WeasyPrint package and ``PATH`` are unchanged. A WeasyPrint
+that failed to load is tried again on every start, since installing its
+native libraries changes none of these.
+"""
+
+import importlib.util
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import __version__
+from .cache import _write_atomic, default_cache_dir
+
+# Bump when the probed fields change so stale results are discarded
+PROBE_VERSION = 2
+
+
+@lru_cache(maxsize=None)
+def import_weasyprint():
+    """Import WeasyPrint on first use.
+
+    Returns None if it is not installed or cannot load its native libraries
+    (Pango, HarfBuzz).
+    """
+    try:
+        import weasyprint
+    except (ImportError, OSError):
+        return None
+    return weasyprint
+
+
+@lru_cache(maxsize=None)
+def import_pypdf():
+    """Import pypdf (optional, used to stitch section PDFs) or return None if it is missing."""
+    try:
+        import pypdf
+    except ImportError:
+        return None
+    return pypdf
+
+
+@lru_cache(maxsize=None)
+def import_pypdfium2():
+    """Import pypdfium2 (optional, used to rasterize page previews) or return None if it is missing."""
+    try:
+        import pypdfium2
+    except ImportError:
+        return None
+    return pypdfium2
+
+
+def _pandoc_candidates() -> List[str]:
+    """Pandoc binaries pypandoc would consider, in its search order."""
+    if os.environ.get('PYPANDOC_PANDOC'):
+        return [os.environ['PYPANDOC_PANDOC']]
+    candidates = [shutil.which('pandoc') or '']
+    spec = importlib.util.find_spec('pypandoc')
+    if spec is not None and spec.origin:
+        candidates.append(os.path.join(os.path.dirname(os.path.realpath(spec.origin)), 'files', 'pandoc'))
+    if sys.platform == 'darwin':
+        candidates.append(os.path.expanduser('~/Applications/pandoc/pandoc'))
+    elif sys.platform.startswith('linux'):
+        candidates += [os.path.expanduser('~/bin/pandoc'), os.path.expanduser('~/.bin/pandoc')]
+    candidates.append(os.path.join(sys.exec_prefix, 'bin', 'pandoc'))
+    return [path for path in dict.fromkeys(candidates) if path]
+
+
+def _mtime(path: Optional[str]) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns if path else None
+    except OSError:
+        return None
+
+
+def _fingerprint() -> Dict[str, Any]:
+    """Everything a probe result depends on; cheap to compute (no imports, no subprocesses)."""
+    try:
+        spec = importlib.util.find_spec('weasyprint')
+    except ValueError:
+        spec = None
+    weasyprint_origin = spec.origin if spec is not None else None
+    return {
+        'probe': PROBE_VERSION,
+        'borel': __version__,
+        'python': sys.executable,
+        'path': os.environ.get('PATH', ''),
+        # Where WeasyPrint's native libraries (Pango, HarfBuzz) are loaded from
+        'libraries': [os.environ.get(name, '') for name in ('LD_LIBRARY_PATH', 'DYLD_FALLBACK_LIBRARY_PATH')],
+        'pandoc': {path: _mtime(path) for path in _pandoc_candidates()},
+        'weasyprint': [weasyprint_origin, _mtime(weasyprint_origin)],
+    }
+
+
+def _version_tuple(version: str) -> Tuple[int, ...]:
+    return tuple(int(part) for part in re.findall(r'\d+', version))
+
+
+def _probe_pandoc(candidates: Dict[str, Optional[int]]) -> Tuple[Optional[str], Optional[str]]:
+    """Pick the newest working pandoc among the candidates, like pypandoc does."""
+    best: Tuple[Optional[str], Optional[str]] = (None, None)
+    for path, mtime in candidates.items():
+        if mtime is None:
+            continue
+        try:
+            result = subprocess.run([path, '--version'], capture_output=True, text=True,
+                                    check=True, timeout=30)
+            version = result.stdout.split()[1]
+        except (OSError, subprocess.SubprocessError, IndexError):
+            continue
+        if best[1] is None or _version_tuple(version) > _version_tuple(best[1]):
+            best = (path, version)
+    return best
+
+
+def _probe() -> Dict[str, Any]:
+    fingerprint = _fingerprint()
+    pandoc_path, pandoc_version = _probe_pandoc(fingerprint['pandoc'])
+    weasyprint = import_weasyprint()
+    return {
+        'fingerprint': fingerprint,
+        'pandoc_path': pandoc_path,
+        'pandoc_version': pandoc_version,
+        'weasyprint_available': weasyprint is not None,
+        'weasyprint_version': weasyprint.__version__ if weasyprint is not None else None,
+        'cached': False,
+    }
+
+
+def probe_path() -> Path:
+    return default_cache_dir() / 'backends.json'
+
+
+@lru_cache(maxsize=None)
+def probe_backends() -> Dict[str, Any]:
+    """Return the pandoc path and version and the WeasyPrint availability and version.
+
+    Results are cached on disk and in the process; they are probed again when
+    a pandoc binary or the WeasyPrint package changes, or when WeasyPrint
+    was missing and now loads.
+    """
+    path = probe_path()
+    try:
+        with open(path, 'r') as f:
+            cached = json.load(f)
+        # Pango and HarfBuzz are not in the fingerprint, so a WeasyPrint that failed
+        # to load is tried again; it is only probed when about to render anyway
+        if cached.get('fingerprint') == _fingerprint() and (
+                cached.get('weasyprint_available') or import_weasyprint() is None):
+            return dict(cached, cached=True)
+    except (OSError, ValueError):
+        pass
+
+    result = _probe()
+    # A missing pandoc is stored too: installing one changes the fingerprint
+    try:
+        _write_atomic(path, json.dumps(result).encode('utf-8'))
+    except OSError:
+        pass
+    return result
+
+
+def clear_probe_cache() -> None:
+    """Forget probe results, in this process and on disk."""
+    probe_backends.cache_clear()
+    try:
+        probe_path().unlink()
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,146 @@
+"""
+Batch rendering of many markdown documents over a process pool.
+"""
+
+import glob
+import os
+import time
+import traceback
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from .renderer import DocumentRenderer, RenderOptions
+
+
+# Whole documents on a process pool, or the asyncio pipeline in borel.pipeline
+BATCH_PIPELINES = ('pool', 'async')
+
+
+@dataclass
+class BatchResult:
+    """Outcome of rendering a single document in a batch."""
+
+    input_file: Path
+    output_path: Optional[Path] = None
+    error: Optional[str] = None
+    traceback: Optional[str] = None
+    duration: float = 0.0
+    cached: bool = False
+    pandoc_cached: Optional[bool] = None
+    # (sections reused from the cache, sections) for split renders with the cache on
+    section_reuse: Optional[Tuple[int, int]] = None
+    # (size, seconds, baseline size, baseline seconds) with --optimize-report
+    optimization: Optional[Tuple[int, float, int, float]] = None
+    # Peak RSS in bytes while rendering, with --max-memory
+    peak_memory: Optional[int] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def collect_inputs(paths: Iterable[str]) -> Tuple[List[Path], List[str]]:
+    """Expand files, directories and glob patterns into markdown files.
+
+    Directories are searched recursively for ``*.md`` files. Returns the
+    de-duplicated list of files (in argument order) and the arguments that
+    matched nothing.
+    """
+    files: List[Path] = []
+    unmatched: List[str] = []
+    seen = set()
+
+    def add(path: Path) -> None:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            files.append(path)
+
+    for arg in paths:
+        path = Path(arg)
+        if path.is_file():
+            add(path)
+        elif path.is_dir():
+            matches = sorted(p for p in path.rglob('*.md') if p.is_file())
+            if not matches:
+                unmatched.append(arg)
+            for match in matches:
+                add(match)
+        else:
+            matches = sorted(glob.glob(arg, recursive=True))
+            matches = [Path(m) for m in matches if os.path.isfile(m)]
+            if not matches:
+                unmatched.append(arg)
+            for match in matches:
+                add(match)
+
+    return files, unmatched
+
+
+# Per-process renderer, created once by the pool initializer and reused for every job
+_worker_renderer: Optional[DocumentRenderer] = None
+
+
+def _init_worker(options: RenderOptions, preload: Iterable[Path] = ()) -> None:
+    """Pool initializer: load WeasyPrint, generators, caches and fonts once per worker."""
+    global _worker_renderer
+    _worker_renderer = DocumentRenderer(options)
+    _worker_renderer.warm_up(preload)
+
+
+def render_to_result(renderer: DocumentRenderer, input_file: Path,
+                     output_path: Optional[Path] = None) -> BatchResult:
+    """Render one document with the given renderer, capturing any failure."""
+    start = time.perf_counter()
+    try:
+        output = renderer.render(input_file, output_path)
+        return BatchResult(input_file, output, duration=time.perf_counter() - start,
+                           cached=renderer.last_cache_hit,
+                           pandoc_cached=renderer.last_pandoc_cache_hit,
+                           section_reuse=renderer.last_section_reuse,
+                           optimization=renderer.last_optimization,
+                           peak_memory=renderer.last_peak_memory)
+    except Exception as e:
+        return BatchResult(input_file, error=str(e), traceback=traceback.format_exc(),
+                           duration=time.perf_counter() - start)
+
+
+def _render_one(input_file: Path, output_path: Optional[Path] = None) -> BatchResult:
+    """Render one document in the current worker."""
+    return render_to_result(_worker_renderer, input_file, output_path)
+
+
+def run_batch(inputs: List[Path], options: RenderOptions, jobs: int = 1,
+              on_result: Optional[Callable[[BatchResult], None]] = None) -> List[BatchResult]:
+    """Render all inputs, spreading them over ``jobs`` worker processes.
+
+    Failures are recorded in the returned results rather than raised, so one
+    broken document never stops the rest of the batch. ``on_result`` is called
+    in the parent process as each document finishes.
+    """
+    results: List[BatchResult] = []
+
+    def collect(result: BatchResult) -> None:
+        results.append(result)
+        if on_result:
+            on_result(result)
+
+    if jobs <= 1 or len(inputs) <= 1:
+        _init_worker(options, inputs[:1])
+        for input_file in inputs:
+            collect(_render_one(input_file))
+        return results
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    with ProcessPoolExecutor(max_workers=min(jobs, len(inputs)),
+                             initializer=_init_worker, initargs=(options, inputs[:1])) as executor:
+        futures = {executor.submit(_render_one, input_file): input_file for input_file in inputs}
+        for future in as_completed(futures):
+            try:
+                collect(future.result())
+            except Exception as e:
+                # The worker itself died (e.g. killed by the OOM killer)
+                collect(BatchResult(futures[future], error=f"Worker failed: {e}"))
+
+    return results
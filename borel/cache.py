@@ -0,0 +1,300 @@
+"""
+Content-addressed cache of rendered PDFs.
+
+A document's cache key is a hash of everything that affects its output: the
+markdown bytes, the resolved configuration, the CSS, the logo contents, the
+HTML template and the borel, pandoc and WeasyPrint versions. Unchanged
+documents are then copied (or hard-linked) from the cache instead of being
+rendered again.
+"""
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_MAX_SIZE = 1024 * 1024 * 1024  # 1 GiB
+
+_frontmatter_pattern = re.compile(r'^---\s*\n(.*?)\n---\s*\n', re.DOTALL)
+_date_pattern = re.compile(r'^date\s*:', re.MULTILINE)
+
+
+def default_cache_dir() -> Path:
+    """Return the cache directory, honouring BOREL_CACHE_DIR and XDG_CACHE_HOME."""
+    if os.environ.get('BOREL_CACHE_DIR'):
+        return Path(os.environ['BOREL_CACHE_DIR'])
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(base) / 'borel'
+
+
+def hash_bytes(data: bytes) -> str:
+    """Hex SHA-256 digest of some bytes."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """Hex SHA-256 digest of a file's contents, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compute_key(parts: Dict[str, Any]) -> str:
+    """Combine named key components into a single cache key."""
+    return hash_bytes(json.dumps(parts, sort_keys=True, default=str).encode('utf-8'))
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    """Write a file so concurrent readers never see partial content."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=str(path.parent), prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+
+class OutputCache:
+    """Size-capped LRU cache of rendered files, safe to share between processes."""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_size: int = DEFAULT_MAX_SIZE,
+                 link: bool = True):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.objects_dir = self.cache_dir / 'objects'
+        self.stat_dir = self.cache_dir / 'stat'
+        self.max_size = max_size
+        self.link = link
+        self.hits = 0
+        self.misses = 0
+
+    def source_digest(self, path: str) -> Tuple[str, bool]:
+        """Hash a markdown file, reusing the previous hash while its mtime and size are unchanged.
+
+        Returns the digest and whether the frontmatter sets a ``date`` (documents
+        without one are stamped with today's date, which then becomes part of the key).
+        """
+        st = os.stat(path)
+        index_path = self.stat_dir / f"{hash_bytes(os.path.abspath(path).encode('utf-8'))}.json"
+        try:
+            with open(index_path, 'r') as f:
+                entry = json.load(f)
+            if entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+                return entry['digest'], entry['has_date']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hash_bytes(data)
+        match = _frontmatter_pattern.match(data.decode('utf-8', errors='replace'))
+        has_date = bool(match and _date_pattern.search(match.group(1)))
+
+        entry = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size,
+                 'digest': digest, 'has_date': has_date}
+        try:
+            _write_atomic(index_path, json.dumps(entry).encode('utf-8'))
+        except OSError:
+            pass
+        return digest, has_date
+
+    def document_key(self, path: str, parts: Dict[str, Any]) -> str:
+        """Build the cache key of a markdown file from its contents plus other components."""
+        digest, has_date = self.source_digest(path)
+        parts = dict(parts, source=digest, name=Path(path).stem)
+        if not has_date:
+            parts['today'] = date.today().isoformat()
+        return compute_key(parts)
+
+    def object_path(self, key: str, suffix: str = '.pdf') -> Path:
+        return self.objects_dir / key[:2] / f"{key}{suffix}"
+
+    def restore(self, key: str, output_path: str, suffix: str = '.pdf') -> bool:
+        """Materialize a cached object at output_path. Returns False on a miss."""
+        obj = self.object_path(key, suffix)
+        if not obj.exists():
+            self.misses += 1
+            return False
+
+        output = Path(output_path)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = output.with_name(f".{output.name}.borel-tmp")
+        try:
+            if temp_path.exists():
+                temp_path.unlink()
+            if self.link:
+                try:
+                    os.link(obj, temp_path)
+                except OSError:
+                    shutil.copyfile(obj, temp_path)
+            else:
+                shutil.copyfile(obj, temp_path)
+            os.replace(temp_path, output)
+        except FileNotFoundError:
+            # Evicted by a concurrent prune
+            self.misses += 1
+            return False
+
+        # Bump mtime so eviction is least-recently-used
+        try:
+            os.utime(obj)
+        except OSError:
+            pass
+        self.hits += 1
+        return True
+
+    def store(self, key: str, output_path: str, suffix: str = '.pdf') -> None:
+        """Copy a freshly rendered file into the cache."""
+        obj = self.object_path(key, suffix)
+        if obj.exists():
+            return
+        obj.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=str(obj.parent), prefix='.tmp-')
+        os.close(fd)
+        try:
+            shutil.copyfile(output_path, temp_path)
+            # mkstemp creates 0600 files; hard-linked outputs should keep normal permissions
+            shutil.copymode(output_path, temp_path)
+            os.replace(temp_path, obj)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def read_bytes(self, key: str, suffix: str) -> Optional[bytes]:
+        """Return a cached object's contents, or None on a miss."""
+        obj = self.object_path(key, suffix)
+        try:
+            with open(obj, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(obj)
+        except OSError:
+            pass
+        return data
+
+    def write_bytes(self, key: str, data: bytes, suffix: str) -> None:
+        """Store an object atomically."""
+        _write_atomic(self.object_path(key, suffix), data)
+
+    def read_text(self, key: str, suffix: str) -> Optional[str]:
+        """Return a cached text object, or None on a miss."""
+        data = self.read_bytes(key, suffix)
+        return data.decode('utf-8') if data is not None else None
+
+    def write_text(self, key: str, text: str, suffix: str) -> None:
+        """Store a text object atomically."""
+        self.write_bytes(key, text.encode('utf-8'), suffix)
+
+    def _entries(self):
+        """Yield (path, size, mtime) for every cached object."""
+        if not self.objects_dir.exists():
+            return
+        for shard in self.objects_dir.iterdir():
+            if not shard.is_dir():
+                continue
+            for obj in shard.iterdir():
+                if obj.name.startswith('.tmp-'):
+                    continue
+                try:
+                    st = obj.stat()
+                except FileNotFoundError:
+                    continue
+                yield obj, st.st_size, st.st_mtime
+
+    def stats(self) -> Dict[str, Any]:
+        """Summarize the cache contents."""
+        entries = list(self._entries())
+        mtimes = [mtime for _, _, mtime in entries]
+        kinds: Dict[str, int] = {}
+        for obj, _, _ in entries:
+            kinds[obj.suffix.lstrip('.')] = kinds.get(obj.suffix.lstrip('.'), 0) + 1
+        return {
+            'cache_dir': str(self.cache_dir),
+            'entries': len(entries),
+            'kinds': kinds,
+            'size': sum(size for _, size, _ in entries),
+            'max_size': self.max_size,
+            'oldest': min(mtimes) if mtimes else None,
+            'newest': max(mtimes) if mtimes else None,
+        }
+
+    def prune(self, max_size: Optional[int] = None) -> Tuple[int, int]:
+        """Evict least-recently-used objects until the cache fits in max_size.
+
+        Returns the number of removed objects and the bytes freed.
+        """
+        limit = self.max_size if max_size is None else max_size
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        removed = freed = 0
+        for obj, size, _ in entries:
+            if total <= limit:
+                break
+            try:
+                obj.unlink()
+            except FileNotFoundError:
+                pass
+            total -= size
+            freed += size
+            removed += 1
+
+        # Drop stat entries that have not been refreshed in a long time
+        if self.stat_dir.exists():
+            cutoff = time.time() - 90 * 24 * 3600
+            for entry in self.stat_dir.iterdir():
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        entry.unlink()
+                except FileNotFoundError:
+                    pass
+
+        return removed, freed
+
+    def clear(self) -> None:
+        """Remove every cached object and stat entry."""
+        for directory in (self.objects_dir, self.stat_dir):
+            if directory.exists():
+                shutil.rmtree(directory)
+
+
+class StageCache:
+    """Cache for the text output of one intermediate pipeline stage.
+
+    Stage objects share the output cache's directory and size cap, so they are
+    evicted by the same LRU policy.
+    """
+
+    def __init__(self, cache: OutputCache, stage: str):
+        self.cache = cache
+        self.stage = stage
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, parts: Dict[str, Any]) -> str:
+        return compute_key(dict(parts, stage=self.stage))
+
+    def get(self, key: str) -> Optional[str]:
+        """Look up a stage result, counting the hit or miss."""
+        text = self.cache.read_text(key, f".{self.stage}")
+        if text is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        self.cache.write_text(key, text, f".{self.stage}")
@@ -5,142 +5,484 @@ Command-line interface for Borel application.
 import os
 import sys
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, List, Optional, Tuple
 
 import click
 
-from .processor import MarkdownProcessor
-from .html_generator import HTMLGenerator
-from .pdf_generator import PDFGenerator, check_weasyprint_available
-from .config import BorelConfig, find_config_file, get_default_css
+from . import __version__
+from .pdf_generator import check_weasyprint_available
+from .html_generator import MARKDOWN_ENGINES, PANDOC_BACKENDS
+from .renderer import DocumentRenderer, RenderOptions
+from .batch import BATCH_PIPELINES, BatchResult, collect_inputs, run_batch
+from .backends import clear_probe_cache, import_pypdf, import_pypdfium2
+from .outputs import OUTPUT_FORMATS, PREVIEW_DPI, THUMBNAIL_SOURCES, THUMBNAIL_WIDTH, parse_pages
+from .profiling import PROFILE_MODES
+from .cache import DEFAULT_MAX_SIZE, OutputCache
+from .watch import WatchSession
+from .daemon import DaemonClient, RenderDaemon, parse_address
 
 
-@click.command()
-@click.argument('input_file', type=click.Path(exists=True, path_type=Path))
+class BorelGroup(click.Group):
+    """Command group that falls back to ``render`` when no subcommand is given.
+
+    This keeps ``borel notes.md`` working alongside ``borel cache stats``.
+    """
+
+    default_command = 'render'
+    group_options = ('--help', '-h', '--version', '--startup-report')
+
+    def parse_args(self, ctx, args):
+        # '--profile' and '--thumbnail' take an optional mode; a bare flag means the default mode
+        bare_flags = {'--profile': '--profile=summary', '--thumbnail': '--thumbnail=first'}
+        args = [bare_flags.get(arg, arg) for arg in args]
+        if args and args[0] not in self.commands and args[0] not in self.group_options:
+            args = [self.default_command] + list(args)
+        return super().parse_args(ctx, args)
+
+
+def _validate_pages(ctx, param, value):
+    try:
+        parse_pages(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    return value
+
+
+def _print_startup_report(ctx, param, value):
+    if not value or ctx.resilient_parsing:
+        return
+    from .startup import startup_report
+    click.echo(startup_report())
+    ctx.exit()
+
+
+@click.group(cls=BorelGroup, context_settings={'help_option_names': ['--help', '-h']})
+@click.version_option(__version__, prog_name='borel')
+@click.option('--startup-report', is_flag=True, is_eager=True, expose_value=False,
+              callback=_print_startup_report,
+              help='Show where startup time goes (imports and backend probing) and exit')
+def main():
+    """
+    Borel - generate print-ready PDFs from Markdown.
+    
+    Run 'borel INPUTS...' (short for 'borel render INPUTS...') to render documents,
+    or 'borel cache' to manage the output cache.
+    """
+
+
+@main.command()
+@click.argument('inputs', nargs=-1, required=True)
 @click.option('--css', '-c', 'css_file', type=click.Path(exists=True), 
               help='Custom CSS file for styling')
 @click.option('--logo', '-l', 'logo_file', type=click.Path(exists=True), 
               help='Company logo file')
 @click.option('--output', '-o', 'output_file', type=click.Path(), 
-              help='Output PDF file path')
+              help='Output PDF file path (single input only)')
 @click.option('--company', help='Company name for footer')
 @click.option('--author', help='Document author')
-@click.option('--keep-html', is_flag=True, help='Keep intermediate HTML file')
+@click.option('--keep-html', is_flag=True, help="Also write the self-contained HTML (same as '--format html')")
+@click.option('--format', '-f', 'formats', type=click.Choice(OUTPUT_FORMATS), multiple=True,
+              default=('pdf',), show_default=True,
+              help='Output format, repeatable: all requested formats are written from one render')
+@click.option('--preview-pages', default='1', show_default=True, callback=_validate_pages,
+              help="Pages to write PNG previews of, e.g. '1,3-5' or 'all'")
+@click.option('--preview-dpi', type=click.IntRange(min=1), default=PREVIEW_DPI, show_default=True,
+              help='Resolution of PNG previews')
+@click.option('--thumbnail', type=click.Choice(THUMBNAIL_SOURCES),
+              help="Only write a small PNG of the first page ('--thumbnail'), or of the title page "
+                   "laid out on its own ('--thumbnail=title'), as NAME.thumb.png; needs pypdfium2")
+@click.option('--thumbnail-width', type=click.IntRange(min=1), default=THUMBNAIL_WIDTH, show_default=True,
+              help='Width of thumbnails in pixels')
+@click.option('--jobs', '-j', type=click.IntRange(min=0), default=1, show_default=True,
+              help='Number of worker processes for batch rendering (0 = one per CPU)')
+@click.option('--pipeline', type=click.Choice(BATCH_PIPELINES), default='pool', show_default=True,
+              help="Render batches on a 'pool' of processes that each render whole documents, or "
+                   "through an 'async' pipeline that overlaps file reads and pandoc with layout")
+@click.option('--pandoc-backend', type=click.Choice(PANDOC_BACKENDS), default='process',
+              show_default=True,
+              help="Run pandoc once per document ('process') or keep a 'pandoc server' running ('server')")
+@click.option('--engine', type=click.Choice(MARKDOWN_ENGINES),
+              help="Markdown engine: 'pandoc' or the in-process 'native' engine "
+                   "(default: 'engine' in borel.config.json, else pandoc)")
+@click.option('--template-dir', type=click.Path(exists=True, file_okay=False),
+              help='Directory with base.html and/or title_page.html templates overriding the defaults')
+@click.option('--cache/--no-cache', 'use_cache', default=False,
+              help='Reuse previously rendered PDFs for unchanged documents')
+@click.option('--cache-dir', type=click.Path(file_okay=False), envvar='BOREL_CACHE_DIR',
+              help='Cache directory (default: ~/.cache/borel)')
+@click.option('--cache-size', type=click.IntRange(min=0), default=DEFAULT_MAX_SIZE // (1024 * 1024),
+              show_default=True, help='Maximum cache size in MB')
+@click.option('--daemon', 'daemon_address', envvar='BOREL_DAEMON',
+              help='Address of a running borel daemon (socket path or host:port)')
+@click.option('--no-daemon', is_flag=True, help='Always render in this process')
+@click.option('--font-dir', 'font_dirs', multiple=True, type=click.Path(exists=True, file_okay=False),
+              help='Only use fonts from this directory (repeatable; default: all system fonts)')
+@click.option('--watch', '-w', is_flag=True,
+              help='Keep running and re-render documents whose markdown, CSS, logo or config change')
+@click.option('--profile', type=click.Choice(PROFILE_MODES),
+              help="Report wall time, CPU time and peak memory per pipeline stage "
+                   "('--profile' or '--profile=cprofile' to also dump pstats of the slowest stage)")
+@click.option('--section-jobs', type=click.IntRange(min=0),
+              help='Split documents at [CRLF] page breaks and lay out the sections in this many '
+                   'worker processes (0 = one per CPU); needs pypdf')
+@click.option('--max-memory', type=click.IntRange(min=1),
+              help='Memory budget per rendering process in MB: documents that would exceed it are '
+                   'laid out one [CRLF] section at a time; reports peak memory per document; needs pypdf')
+@click.option('--offline', is_flag=True,
+              help='Never go to the network: remote images and stylesheets come from the cache or fail at once')
+@click.option('--fetch-timeout', type=click.FloatRange(min=0, min_open=True), default=10.0, show_default=True,
+              help='Seconds to wait for each remote image or stylesheet')
+@click.option('--max-fetch-size', type=click.IntRange(min=1), default=50, show_default=True,
+              help='Largest image or stylesheet to fetch, in MB')
+@click.option('--allow-dir', 'allowed_dirs', multiple=True, type=click.Path(exists=True, file_okay=False),
+              help="Only read local images and stylesheets from this directory and the document's own "
+                   "(repeatable; default: anywhere)")
+@click.option('--optimize', is_flag=True,
+              help='Smaller PDFs: recompress images (JPEG quality 85, at most 300 DPI unless set) '
+                   'and embed identical image files once')
+@click.option('--jpeg-quality', type=click.IntRange(1, 95), help='JPEG quality of embedded images')
+@click.option('--dpi', type=click.IntRange(min=1), help='Downsample images above this resolution')
+@click.option('--full-fonts', is_flag=True, help='Embed whole fonts instead of the used subsets')
+@click.option('--no-scale-images', is_flag=True,
+              help='Embed images at their original size instead of downscaling them to the print resolution')
+@click.option('--uncompressed', is_flag=True, help='Write uncompressed PDF streams (for debugging)')
+@click.option('--optimize-report', is_flag=True,
+              help='Also render each document without optimization and report the size and time saved')
 @click.option('--verbose', '-v', is_flag=True, help='Verbose output')
-def main(input_file: Path, css_file: Optional[str], logo_file: Optional[str], 
-         output_file: Optional[str], company: Optional[str], author: Optional[str],
-         keep_html: bool, verbose: bool):
+def render(inputs: Tuple[str, ...], css_file: Optional[str], logo_file: Optional[str], 
+           output_file: Optional[str], company: Optional[str], author: Optional[str],
+           keep_html: bool, formats: Tuple[str, ...], preview_pages: str, preview_dpi: int,
+           thumbnail: Optional[str], thumbnail_width: int, jobs: int, pipeline: str, pandoc_backend: str, engine: Optional[str],
+           template_dir: Optional[str], use_cache: bool,
+           cache_dir: Optional[str], cache_size: int, daemon_address: Optional[str],
+           no_daemon: bool, font_dirs: Tuple[str, ...], watch: bool, profile: Optional[str],
+           section_jobs: Optional[int], max_memory: Optional[int], offline: bool,
+           fetch_timeout: float, max_fetch_size: int, allowed_dirs: Tuple[str, ...], optimize: bool, jpeg_quality: Optional[int],
+           dpi: Optional[int], full_fonts: bool, no_scale_images: bool, uncompressed: bool, optimize_report: bool,
+           verbose: bool):
     """
-    Convert Markdown file to print-ready PDF with company branding.
+    Convert Markdown files to print-ready PDFs with company branding.
     
-    INPUT_FILE: Path to the markdown file to process
+    INPUTS: Markdown files, directories (searched recursively for *.md) or glob patterns
     """
-    try:
-        # Validate input file
-        if not input_file.exists():
-            click.echo(f"Error: Input file '{input_file}' does not exist.", err=True)
-            sys.exit(1)
-        
+    input_files, unmatched = collect_inputs(inputs)
+    for pattern in unmatched:
+        click.echo(f"Error: Input '{pattern}' does not match any file.", err=True)
+    if not input_files:
+        sys.exit(1)
+    
+    if output_file and len(input_files) > 1:
+        click.echo("Error: --output can only be used with a single input file.", err=True)
+        sys.exit(1)
+    
+    for input_file in input_files:
         if input_file.suffix.lower() != '.md':
             click.echo(f"Warning: Input file '{input_file}' doesn't have .md extension.", err=True)
-        
-        # Load configuration
-        config = _load_config(input_file, css_file, logo_file, company, author)
-        
+    
+    options = RenderOptions(
+        css_file=css_file,
+        logo_file=logo_file,
+        company=company,
+        author=author,
+        keep_html=keep_html,
+        formats=formats,
+        preview_pages=preview_pages,
+        preview_dpi=preview_dpi,
+        thumbnail=thumbnail,
+        thumbnail_width=thumbnail_width,
+        verbose=verbose,
+        pandoc_backend=pandoc_backend,
+        engine=engine,
+        template_dir=template_dir,
+        cache=use_cache,
+        cache_dir=cache_dir,
+        cache_size=cache_size * 1024 * 1024,
+        font_dirs=list(font_dirs) or None,
+        profile=profile,
+        section_jobs=section_jobs,
+        max_memory=max_memory * 1024 * 1024 if max_memory else None,
+        offline=offline,
+        fetch_timeout=fetch_timeout,
+        max_fetch_size=max_fetch_size * 1024 * 1024,
+        allowed_dirs=list(allowed_dirs) or None,
+        optimize=optimize,
+        jpeg_quality=jpeg_quality,
+        dpi=dpi,
+        full_fonts=full_fonts,
+        uncompressed=uncompressed,
+        scale_images=not no_scale_images,
+        optimize_report=optimize_report,
+    )
+    
+    # Hand the work to a running daemon if there is one
+    # Profiles are taken in this process so every stage is measured where it runs,
+    # split documents are laid out by this process's own section workers, and the
+    # async pipeline runs its stages here
+    try:
+        client = (None if (no_daemon or watch or profile or section_jobs is not None or pipeline == 'async')
+                  else DaemonClient.connect(daemon_address))
+    except ValueError as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    if client is not None:
         if verbose:
-            click.echo(f"Processing: {input_file}")
-            click.echo(f"CSS: {config.css_file or 'default'}")
-            click.echo(f"Logo: {config.logo_file or 'none'}")
-            click.echo(f"Company: {config.company_name}")
-        
-        # Check dependencies
-        if not check_weasyprint_available():
-            click.echo("Error: WeasyPrint is required but not installed.", err=True)
-            click.echo("Install with: pip install weasyprint", err=True)
-            sys.exit(1)
-        
-        # Process markdown
-        processor = MarkdownProcessor()
-        # Pass config to processor for fallback
-        content, metadata = processor.process_file(str(input_file), config)
-        
-        # Update metadata with CLI options (highest priority)
-        if company:
-            metadata['company_name'] = company
-        if author:
-            metadata['author'] = author
-        
-        # Load CSS
-        css_content = _load_css(config.css_file)
-        
-        # Generate HTML
-        html_generator = HTMLGenerator()
-        html_content = html_generator.generate_html(
-            content, metadata, css_content, config.logo_file
-        )
-        
-        # Determine output path
+            click.echo("Rendering on borel daemon")
+        jobs_list = [{'input': str(input_file), 'output': output_file} for input_file in input_files]
+        try:
+            results = _report_results(client.render(jobs_list, options),
+                                      single=len(input_files) == 1 and not unmatched)
+        finally:
+            client.close()
+        _summarize(results, unmatched, options, single=len(input_files) == 1 and not unmatched)
+        return
+    
+    # Check dependencies
+    if not check_weasyprint_available():
+        click.echo("Error: WeasyPrint is required but not installed.", err=True)
+        click.echo("Install with: pip install weasyprint", err=True)
+        sys.exit(1)
+    
+    if (section_jobs is not None or max_memory) and import_pypdf() is None:
+        click.echo(f"Error: {'--section-jobs' if section_jobs is not None else '--max-memory'} "
+                   "needs pypdf to stitch sections.", err=True)
+        click.echo("Install with: pip install pypdf", err=True)
+        sys.exit(1)
+    
+    if ('png' in formats or thumbnail) and import_pypdfium2() is None:
+        click.echo(f"Error: {'Thumbnails' if thumbnail else 'PNG previews'} need pypdfium2.", err=True)
+        click.echo("Install with: pip install pypdfium2", err=True)
+        sys.exit(1)
+    
+    if watch:
         if output_file:
-            output_path = Path(output_file)
+            click.echo("Error: --output cannot be used with --watch.", err=True)
+            sys.exit(1)
+        WatchSession(inputs, options).run()
+        return
+    
+    if len(input_files) == 1 and not unmatched:
+        _render_single(input_files[0], output_file, options)
+        _prune_cache(options)
+        return
+    
+    if profile:
+        jobs = 1
+    elif jobs == 0:
+        jobs = os.cpu_count() or 1
+    
+    results: List[BatchResult] = []
+    run = run_batch
+    if pipeline == 'async' and not profile:
+        from .pipeline import run_pipeline as run
+    run(input_files, options, jobs, on_result=lambda result: results.extend(_report_results([result])))
+    _summarize(results, unmatched, options)
+
+
+def _report_results(results: Iterable[BatchResult], single: bool = False) -> List[BatchResult]:
+    """Print each result as it arrives and return them all."""
+    reported = []
+    for result in results:
+        if result.ok:
+            click.echo(f"{'Cached' if result.cached else 'Generated'}: {result.output_path}")
+        elif single:
+            click.echo(f"Error: {result.error}", err=True)
         else:
-            output_path = input_file.with_suffix('.pdf')
-        
-        # Save intermediate HTML if requested
-        if keep_html:
-            html_path = input_file.with_suffix('.html')
-            html_generator.save_html(html_content, str(html_path))
-            if verbose:
-                click.echo(f"Saved HTML: {html_path}")
-        
-        # Generate PDF
-        pdf_generator = PDFGenerator()
-        pdf_generator.generate_pdf(html_content, str(output_path), css_content, config.logo_file)
+            click.echo(f"Failed: {result.input_file}: {result.error}", err=True)
+        if result.optimization:
+            click.echo(f"  {_format_optimization(*result.optimization)}")
+        if result.peak_memory:
+            click.echo(f"  Peak memory: {_format_size(result.peak_memory)}")
+        reported.append(result)
+    return reported
+
+
+def _summarize(results: List[BatchResult], unmatched: List[str], options: RenderOptions,
+               single: bool = False) -> None:
+    """Print the end-of-run summary and exit non-zero if anything failed."""
+    failures = [result for result in results if not result.ok]
+    
+    if not single:
+        click.echo(f"Rendered {len(results) - len(failures)} of {len(results)} documents.")
+        if options.cache:
+            hits = sum(1 for result in results if result.cached)
+            click.echo(f"Cache: {hits} hit(s), {len(results) - hits} miss(es).")
+            pandoc_stage = [result.pandoc_cached for result in results if result.pandoc_cached is not None]
+            if pandoc_stage:
+                pandoc_hits = sum(1 for hit in pandoc_stage if hit)
+                click.echo(f"Pandoc stage cache: {pandoc_hits} hit(s), "
+                           f"{len(pandoc_stage) - pandoc_hits} miss(es).")
+            section_reuse = [result.section_reuse for result in results if result.section_reuse]
+            if section_reuse:
+                click.echo(_format_section_reuse(sum(reused for reused, _ in section_reuse),
+                                                 sum(total for _, total in section_reuse)))
+        optimizations = [result.optimization for result in results if result.optimization]
+        if optimizations:
+            click.echo(f"Total: {_format_optimization(*(sum(values) for values in zip(*optimizations)))}")
+        peaks = [result.peak_memory for result in results if result.peak_memory]
+        if peaks:
+            click.echo(f"Peak memory: {_format_size(max(peaks))} (largest of any document)")
+    _prune_cache(options)
+    if failures or unmatched:
+        if failures and not single:
+            click.echo(f"{len(failures)} document(s) failed:", err=True)
+            for result in failures:
+                click.echo(f"  {result.input_file}: {result.error}", err=True)
+        if options.verbose:
+            for result in failures:
+                if result.traceback:
+                    click.echo(result.traceback, err=True)
+        sys.exit(1)
+
+
+def _render_single(input_file: Path, output_file: Optional[str], options: RenderOptions) -> None:
+    """Render one document in-process, exiting with an error message on failure."""
+    try:
+        renderer = DocumentRenderer(options)
+        output_path = renderer.render(input_file, Path(output_file) if output_file else None)
         
-        if verbose:
+        if renderer.last_cache_hit:
+            click.echo(f"Cached: {output_path}")
+        elif options.verbose and output_path.suffix == '.pdf':
             click.echo(f"Generated PDF: {output_path}")
         else:
             click.echo(f"Generated: {output_path}")
+
+        if renderer.last_section_reuse:
+            click.echo(_format_section_reuse(*renderer.last_section_reuse))
+        if renderer.last_optimization:
+            click.echo(_format_optimization(*renderer.last_optimization))
+        if renderer.last_peak_memory and not options.verbose:
+            click.echo(f"Peak memory: {_format_size(renderer.last_peak_memory)}")
         
     except Exception as e:
         click.echo(f"Error: {e}", err=True)
-        if verbose:
+        if options.verbose:
             import traceback
             traceback.print_exc()
         sys.exit(1)
 
 
-def _load_config(input_file: Path, css_file: Optional[str], logo_file: Optional[str],
-                company: Optional[str], author: Optional[str]) -> BorelConfig:
-    """Load configuration from file and CLI options."""
-    # Find config file
-    config_path = find_config_file(str(input_file))
-    config = BorelConfig.from_file(config_path) if config_path else BorelConfig()
-    
-    # Override with CLI options
-    if css_file:
-        config.css_file = css_file
-    if logo_file:
-        config.logo_file = logo_file
-    if company:
-        config.company_name = company
-    if author:
-        config.default_author = author
+
+def _format_section_reuse(reused: int, total: int) -> str:
+    return f"Section cache: {reused} of {total} section(s) reused, {total - reused} laid out."
+
+
+def _format_optimization(size: int, seconds: float, baseline_size: int, baseline_seconds: float) -> str:
+    saved = 1 - size / baseline_size if baseline_size else 0.0
+    return (f"Optimized: {_format_size(size)} in {seconds:.2f}s "
+            f"(unoptimized: {_format_size(baseline_size)} in {baseline_seconds:.2f}s, {saved:.0%} smaller)")
+
+
+def _prune_cache(options: RenderOptions) -> None:
+    """Keep the cache within its size cap after a run.
     
-    return config
+    Pruned even without ``--cache``: processed logos, optimized images and
+    fetched resources are always cached.
+    """
+    OutputCache(options.cache_dir, options.cache_size).prune()
 
 
-def _load_css(css_file: Optional[str]) -> str:
-    """Load CSS content from file or return default."""
-    if css_file and os.path.exists(css_file):
+@main.command()
+@click.option('--socket', 'address', help='Unix socket path or host:port to listen on '
+              '(default: $BOREL_SOCKET or a per-user socket in $XDG_RUNTIME_DIR)')
+@click.option('--workers', type=click.IntRange(min=0), default=0, show_default=True,
+              help='Number of render worker processes (0 = one per CPU)')
+@click.option('--max-queue', type=click.IntRange(min=0), default=0, show_default=True,
+              help='Maximum queued or running jobs before clients are made to wait (0 = 4 per worker)')
+@click.option('--font-dir', 'font_dirs', multiple=True, type=click.Path(exists=True, file_okay=False),
+              help='Only use fonts from this directory (repeatable; default: all system fonts)')
+@click.option('--stop', is_flag=True, help='Stop the daemon listening on the address')
+@click.option('--status', is_flag=True, help='Show statistics of the running daemon')
+def serve(address: Optional[str], workers: int, max_queue: int, font_dirs: Tuple[str, ...],
+          stop: bool, status: bool):
+    """Run a render daemon that keeps WeasyPrint, pandoc and fonts warm.
+    
+    While it runs, 'borel' commands hand their documents to it automatically.
+    """
+    try:
+        address = parse_address(address)
+    except ValueError as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+    if stop or status:
+        client = DaemonClient.connect(address)
+        if client is None:
+            click.echo("No borel daemon is running.", err=True)
+            sys.exit(1)
         try:
-            with open(css_file, 'r', encoding='utf-8') as f:
-                return f.read()
-        except Exception as e:
-            click.echo(f"Warning: Could not read CSS file '{css_file}': {e}", err=True)
-            return get_default_css()
-    else:
-        return get_default_css()
+            reply = client.call({'op': 'shutdown' if stop else 'stats'})
+        finally:
+            client.close()
+        if stop:
+            click.echo("Stopped borel daemon.")
+        else:
+            for key in ('workers', 'clients', 'in_flight', 'max_queue', 'jobs', 'failed'):
+                click.echo(f"{key.replace('_', ' ').capitalize()}: {reply[key]}")
+            click.echo(f"Uptime: {reply['uptime']:.0f}s")
+        return
+    
+    if not check_weasyprint_available():
+        click.echo("Error: WeasyPrint is required but not installed.", err=True)
+        click.echo("Install with: pip install weasyprint", err=True)
+        sys.exit(1)
+    
+    daemon = RenderDaemon(address, workers, max_queue,
+                          [os.path.abspath(font_dir) for font_dir in font_dirs] or None)
+    click.echo(f"borel daemon listening on {daemon.address} with {daemon.workers} worker(s)")
+    try:
+        daemon.serve_forever()
+    except (OSError, RuntimeError) as e:
+        click.echo(f"Error: {e}", err=True)
+        sys.exit(1)
+
+
+@main.group()
+@click.option('--cache-dir', type=click.Path(file_okay=False), envvar='BOREL_CACHE_DIR',
+              help='Cache directory (default: ~/.cache/borel)')
+@click.pass_context
+def cache(ctx, cache_dir: Optional[str]):
+    """Inspect and manage the rendered-output cache."""
+    ctx.obj = OutputCache(cache_dir)
+
+
+@cache.command('stats')
+@click.pass_obj
+def cache_stats(output_cache: OutputCache):
+    """Show cache location, entry count and size."""
+    stats = output_cache.stats()
+    click.echo(f"Cache directory: {stats['cache_dir']}")
+    click.echo(f"Entries: {stats['entries']}")
+    for kind, count in sorted(stats['kinds'].items()):
+        click.echo(f"  {kind}: {count}")
+    click.echo(f"Size: {_format_size(stats['size'])} (limit {_format_size(stats['max_size'])})")
+
+
+@cache.command('prune')
+@click.option('--max-size', type=click.IntRange(min=0), default=DEFAULT_MAX_SIZE // (1024 * 1024),
+              show_default=True, help='Target cache size in MB')
+@click.pass_obj
+def cache_prune(output_cache: OutputCache, max_size: int):
+    """Evict least-recently-used entries until the cache fits in --max-size."""
+    removed, freed = output_cache.prune(max_size * 1024 * 1024)
+    click.echo(f"Removed {removed} entries ({_format_size(freed)}).")
+
+
+@cache.command('clear')
+@click.pass_obj
+def cache_clear(output_cache: OutputCache):
+    """Remove every cached entry and the cached backend probe."""
+    output_cache.clear()
+    clear_probe_cache()
+    click.echo(f"Cleared cache: {output_cache.cache_dir}")
+
+
+def _format_size(size: int) -> str:
+    """Format a byte count for humans."""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} {unit}"
+        size /= 1024
 
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
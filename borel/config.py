@@ -4,9 +4,11 @@ Configuration management for Borel application.
 
 import json
 import os
-from pathlib import Path
-from typing import Optional, Dict, Any
-from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple
+from dataclasses import dataclass, fields, replace
+
+
+CONFIG_FILENAME = "borel.config.json"
 
 
 @dataclass
@@ -18,6 +20,19 @@ class BorelConfig:
     company_name: str = "Company Name"
     default_author: str = "Author"
     output_dir: str = "."
+    font_dirs: Optional[List[str]] = None
+    # Markdown engine: 'pandoc' or the in-process 'native' engine
+    engine: str = "pandoc"
+    # Directory with base.html and/or title_page.html overriding the packaged templates
+    template_dir: Optional[str] = None
+    # PDF output: optimize recompresses images (JPEG quality 85, at most 300 DPI unless set)
+    optimize: bool = False
+    jpeg_quality: Optional[int] = None
+    dpi: Optional[int] = None
+    full_fonts: bool = False
+    compress: bool = True
+    # Downscale embedded images to the page's print resolution before layout
+    scale_images: bool = True
     
     @classmethod
     def from_file(cls, config_path: str) -> "BorelConfig":
@@ -40,7 +55,16 @@ class BorelConfig:
             "logo_file": self.logo_file,
             "company_name": self.company_name,
             "default_author": self.default_author,
-            "output_dir": self.output_dir
+            "output_dir": self.output_dir,
+            "font_dirs": self.font_dirs,
+            "engine": self.engine,
+            "template_dir": self.template_dir,
+            "optimize": self.optimize,
+            "jpeg_quality": self.jpeg_quality,
+            "dpi": self.dpi,
+            "full_fonts": self.full_fonts,
+            "compress": self.compress,
+            "scale_images": self.scale_images
         }
     
     def save(self, config_path: str) -> None:
@@ -50,20 +74,101 @@ class BorelConfig:
 
 
 def find_config_file(input_file: str) -> Optional[str]:
-    """Find configuration file in the same directory as input file."""
-    input_path = Path(input_file)
-    config_path = input_path.parent / "borel.config.json"
+    """Find the nearest configuration file in the input file's directory or its parents."""
+    config_files = ConfigResolver().config_files(os.path.dirname(os.path.abspath(input_file)))
+    return config_files[-1] if config_files else None
+
+
+def _mtime(path: str) -> Optional[int]:
+    """Modification time of a file or directory in nanoseconds, or None if it is missing."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class ConfigResolver:
+    """Resolve the configuration of input files, memoizing lookups per directory.
     
-    if config_path.exists():
-        return str(config_path)
+    Every ``borel.config.json`` from the filesystem root down to a document's
+    directory applies to it, with keys in nested files overriding their
+    parents. Each directory is checked for a config file once and each config
+    file is parsed once; ``refresh`` drops entries whose files or directories
+    changed since.
+    """
     
-    # Check parent directories
-    for parent in input_path.parents:
-        config_path = parent / "borel.config.json"
-        if config_path.exists():
-            return str(config_path)
+    def __init__(self):
+        # Directory -> (directory mtime, config files from the root down)
+        self._dirs: Dict[str, Tuple[Optional[int], Tuple[str, ...]]] = {}
+        # Config file -> (file mtime, parsed settings)
+        self._files: Dict[str, Tuple[Optional[int], Dict[str, Any]]] = {}
+        self._merged: Dict[Tuple[str, ...], BorelConfig] = {}
+    
+    def config_files(self, directory: str) -> Tuple[str, ...]:
+        """Config files that apply to a directory, outermost first."""
+        entry = self._dirs.get(directory)
+        if entry is None:
+            parent = os.path.dirname(directory)
+            inherited = self.config_files(parent) if parent != directory else ()
+            config_path = os.path.join(directory, CONFIG_FILENAME)
+            entry = (_mtime(directory),
+                     inherited + (config_path,) if os.path.isfile(config_path) else inherited)
+            self._dirs[directory] = entry
+        return entry[1]
+    
+    def resolve(self, input_file: str) -> BorelConfig:
+        """Merged configuration for an input file; a copy the caller may modify."""
+        config_files = self.config_files(os.path.dirname(os.path.abspath(input_file)))
+        if config_files not in self._merged:
+            settings: Dict[str, Any] = {}
+            for config_path in config_files:
+                settings.update(self._load(config_path))
+            self._merged[config_files] = BorelConfig(**settings)
+        return replace(self._merged[config_files])
+    
+    def _load(self, config_path: str) -> Dict[str, Any]:
+        if config_path not in self._files:
+            mtime = _mtime(config_path)
+            try:
+                with open(config_path, 'r') as f:
+                    data = json.load(f)
+                if not isinstance(data, dict):
+                    raise ValueError("expected a JSON object")
+            except (OSError, ValueError) as e:
+                print(f"Warning: Invalid config file {config_path}: {e}")
+                data = {}
+            known = {field.name for field in fields(BorelConfig)}
+            for key in set(data) - known:
+                print(f"Warning: Unknown setting '{key}' in config file {config_path}")
+            self._files[config_path] = (mtime, {k: v for k, v in data.items() if k in known})
+        return self._files[config_path][1]
+    
+    def loaded_files(self) -> List[str]:
+        """Config files parsed so far."""
+        return list(self._files)
+    
+    def refresh(self) -> bool:
+        """Drop entries whose config file or directory changed on disk.
+        
+        Returns True when something changed.
+        """
+        stale_files = [path for path, (mtime, _) in self._files.items() if _mtime(path) != mtime]
+        dirs_changed = any(_mtime(directory) != mtime for directory, (mtime, _) in self._dirs.items())
+        for path in stale_files:
+            del self._files[path]
+        if dirs_changed:
+            # A config file appeared or disappeared; a directory's chain depends on its parents
+            self._dirs.clear()
+        if stale_files or dirs_changed:
+            self._merged.clear()
+            return True
+        return False
     
-    return None
+    def clear(self) -> None:
+        """Forget every directory lookup and parsed config file."""
+        self._dirs.clear()
+        self._files.clear()
+        self._merged.clear()
 
 
 def get_default_css() -> str:
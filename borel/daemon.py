@@ -0,0 +1,347 @@
+"""
+Long-running render daemon and the client the CLI uses to reach it.
+
+``borel serve`` keeps WeasyPrint, pandoc, Jinja, YAML and fontconfig loaded in
+a pool of worker processes and accepts render jobs over a Unix socket or a
+localhost TCP port. The daemon reads and writes any path a client names, so
+it only listens on loopback addresses and its Unix socket is private to the
+user. The protocol is newline-delimited JSON: the client sends
+one request per line and the server answers with one JSON object per line.
+"""
+
+import ipaddress
+import json
+import os
+import queue
+import signal
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from dataclasses import asdict, replace
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional
+
+
+from . import __version__
+from .batch import BatchResult, render_to_result
+from .renderer import DocumentRenderer, RenderOptions
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+
+def default_socket_path() -> str:
+    """Default Unix socket path, overridable with BOREL_SOCKET."""
+    if os.environ.get('BOREL_SOCKET'):
+        return os.environ['BOREL_SOCKET']
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return os.path.join(runtime_dir, f"borel-{os.getuid()}.sock")
+
+
+def parse_address(address: Optional[str]) -> Any:
+    """Turn 'host:port', ':port' or a socket path into a socket address.
+
+    Raises ValueError for hosts other than loopback addresses.
+    """
+    if not address:
+        return default_socket_path()
+    host, sep, port = address.rpartition(':')
+    if sep and port.isdigit() and '/' not in address:
+        host = host or '127.0.0.1'
+        check_loopback(host)
+        return (host, int(port))
+    return address
+
+
+def check_loopback(host: str) -> None:
+    """Refuse TCP hosts other than localhost: the daemon has no authentication."""
+    try:
+        loopback = host == 'localhost' or ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        loopback = False
+    if not loopback:
+        raise ValueError(f"The borel daemon only listens on loopback addresses, not {host!r}")
+
+
+def _result_to_dict(result: BatchResult) -> Dict[str, Any]:
+    data = asdict(result)
+    data['input_file'] = str(result.input_file)
+    data['output_path'] = str(result.output_path) if result.output_path else None
+    return data
+
+
+def _result_from_dict(data: Dict[str, Any]) -> BatchResult:
+    data = dict(data)
+    data['input_file'] = Path(data['input_file'])
+    if data.get('output_path'):
+        data['output_path'] = Path(data['output_path'])
+    return BatchResult(**data)
+
+
+# Warm renderers in each daemon worker, one per distinct set of options, least recently used first
+_worker_renderers: Dict[str, DocumentRenderer] = {}
+MAX_WORKER_RENDERERS = 8
+
+
+def _init_daemon_worker(font_dirs: Optional[List[str]] = None) -> None:
+    """Load the heavy rendering stack and fonts as soon as the worker starts."""
+    renderer = DocumentRenderer(RenderOptions())
+    renderer.warm_up(font_dirs=font_dirs)
+    _worker_renderers[repr(RenderOptions())] = renderer
+
+
+def _daemon_render(input_file: str, output_path: Optional[str], options: RenderOptions,
+                   cwd: str) -> BatchResult:
+    """Render a job in a daemon worker, hot-reloading changed configs and CSS."""
+    # Relative CSS and logo paths in configs resolve against the client's directory
+    os.chdir(cwd)
+    key = repr(options)
+    renderer = _worker_renderers.pop(key, None)
+    if renderer is None:
+        renderer = DocumentRenderer(options)
+        while len(_worker_renderers) >= MAX_WORKER_RENDERERS:
+            _worker_renderers.pop(next(iter(_worker_renderers))).close()
+    else:
+        renderer.refresh()
+    _worker_renderers[key] = renderer
+    return render_to_result(renderer, Path(input_file), Path(output_path) if output_path else None)
+
+
+class RenderDaemon:
+    """Accept render jobs from concurrent clients and run them on a worker pool.
+
+    At most ``max_queue`` jobs are queued or running at once; beyond that,
+    connection handlers block before submitting, which pushes back on clients.
+    """
+
+    def __init__(self, address: Any, workers: int = 0, max_queue: int = 0,
+                 font_dirs: Optional[List[str]] = None):
+        if isinstance(address, tuple):
+            check_loopback(address[0])
+        self.address = address
+        self.font_dirs = font_dirs
+        self.workers = workers or os.cpu_count() or 1
+        self.max_queue = max_queue or self.workers * 4
+        # The worker process pool, started by serve_forever() unless one is set
+        self.executor: Optional["Executor"] = None
+        self.server: Optional[socketserver.BaseServer] = None
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self._lock = threading.Lock()
+        self.stats = {'jobs': 0, 'failed': 0, 'in_flight': 0, 'clients': 0}
+        self.started = time.time()
+
+    def submit(self, input_file: str, output_path: Optional[str], options: RenderOptions,
+               cwd: str, on_done: Callable[[BatchResult], None]) -> None:
+        """Queue a job, blocking while the queue is full."""
+        self._slots.acquire()
+        with self._lock:
+            self.stats['in_flight'] += 1
+        future = self.executor.submit(_daemon_render, input_file, output_path, options, cwd)
+
+        def done(finished) -> None:
+            try:
+                result = finished.result()
+            except Exception as e:
+                result = BatchResult(Path(input_file), error=f"Worker failed: {e}")
+            with self._lock:
+                self.stats['in_flight'] -= 1
+                self.stats['jobs'] += 1
+                if not result.ok:
+                    self.stats['failed'] += 1
+            self._slots.release()
+            on_done(result)
+
+        future.add_done_callback(done)
+
+    def handle_request(self, request: Dict[str, Any], send: Callable[[Dict[str, Any]], None]) -> None:
+        op = request.get('op')
+        if op == 'ping':
+            send({'ok': True, 'version': __version__, 'workers': self.workers})
+        elif op == 'stats':
+            with self._lock:
+                send(dict(self.stats, ok=True, workers=self.workers, max_queue=self.max_queue,
+                          uptime=time.time() - self.started))
+        elif op == 'render':
+            self._handle_render(request, send)
+        elif op == 'shutdown':
+            send({'ok': True})
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+        else:
+            send({'ok': False, 'error': f"Unknown operation: {op}"})
+
+    def _handle_render(self, request: Dict[str, Any], send: Callable[[Dict[str, Any]], None]) -> None:
+        """Fan a list of jobs out to the pool, streaming results back as they finish."""
+        try:
+            options = RenderOptions(**request.get('options', {}))
+            jobs = [(str(job['input']), job.get('output')) for job in request.get('jobs', [])]
+        except (TypeError, KeyError, AttributeError) as e:
+            send({'ok': False, 'error': f"Invalid render request: {e!r}"})
+            return
+        cwd = request.get('cwd') or os.getcwd()
+        results: "queue.Queue[BatchResult]" = queue.Queue()
+        streamed = 0
+
+        for input_file, output_path in jobs:
+            self.submit(input_file, output_path, options, cwd, results.put)
+            # Stream whatever has finished while later jobs wait for queue slots
+            while True:
+                try:
+                    result = results.get_nowait()
+                except queue.Empty:
+                    break
+                send({'ok': True, 'result': _result_to_dict(result)})
+                streamed += 1
+        while streamed < len(jobs):
+            send({'ok': True, 'result': _result_to_dict(results.get())})
+            streamed += 1
+        send({'ok': True, 'done': True})
+
+    def serve_forever(self) -> None:
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                with daemon._lock:
+                    daemon.stats['clients'] += 1
+                try:
+                    for line in self.rfile:
+                        if not line.strip():
+                            continue
+                        try:
+                            request = json.loads(line)
+                        except ValueError as e:
+                            self._send({'ok': False, 'error': f"Invalid request: {e}"})
+                            continue
+                        daemon.handle_request(request, self._send)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with daemon._lock:
+                        daemon.stats['clients'] -= 1
+
+            def _send(self, message: Dict[str, Any]) -> None:
+                self.wfile.write(json.dumps(message).encode('utf-8') + b'\n')
+                self.wfile.flush()
+
+        if isinstance(self.address, tuple):
+            class Server(socketserver.ThreadingTCPServer):
+                daemon_threads = True
+                allow_reuse_address = True
+        else:
+            if os.path.exists(self.address):
+                if DaemonClient.connect(self.address) is not None:
+                    raise RuntimeError(f"A borel daemon is already listening on {self.address}")
+                os.unlink(self.address)
+
+            class Server(socketserver.ThreadingUnixStreamServer):
+                daemon_threads = True
+
+        if self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self.executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                initializer=_init_daemon_worker,
+                                                initargs=(self.font_dirs,))
+        if isinstance(self.address, tuple):
+            self.server = Server(self.address, Handler)
+        else:
+            # Create the socket private, so no other user can connect before the chmod
+            umask = os.umask(0o077)
+            try:
+                self.server = Server(self.address, Handler)
+            finally:
+                os.umask(umask)
+            os.chmod(self.address, 0o600)
+
+        def stop(signum, frame):
+            threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, stop)
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server.server_close()
+            self.executor.shutdown(wait=True)
+            if not isinstance(self.address, tuple) and os.path.exists(self.address):
+                os.unlink(self.address)
+
+
+class DaemonClient:
+    """Connection to a running render daemon."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self._file = sock.makefile('rwb')
+
+    @classmethod
+    def connect(cls, address: Any = None, timeout: float = 1.0) -> Optional["DaemonClient"]:
+        """Connect and ping the daemon. Returns None if none is reachable or compatible."""
+        address = parse_address(address) if not isinstance(address, tuple) else address
+        family = socket.AF_INET if isinstance(address, tuple) else socket.AF_UNIX
+        if family == socket.AF_UNIX and not os.path.exists(address):
+            return None
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(address)
+            client = cls(sock)
+            reply = client.call({'op': 'ping'})
+        except (OSError, ValueError):
+            sock.close()
+            return None
+        if not reply.get('ok') or reply.get('version') != __version__:
+            client.close()
+            return None
+        # Renders can take a long time; only the handshake is time-limited
+        sock.settimeout(None)
+        return client
+
+    def _send(self, message: Dict[str, Any]) -> None:
+        self._file.write(json.dumps(message).encode('utf-8') + b'\n')
+        self._file.flush()
+
+    def _receive(self) -> Dict[str, Any]:
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("borel daemon closed the connection")
+        return json.loads(line)
+
+    def call(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        self._send(message)
+        return self._receive()
+
+    def render(self, jobs: List[Dict[str, Optional[str]]], options: RenderOptions) -> Iterator[BatchResult]:
+        """Submit jobs ({'input': ..., 'output': ...}) and yield results as they complete."""
+        # Verbose output would go to the daemon's terminal, not the client's
+        options_dict = asdict(replace(options, verbose=False))
+        for key in ('css_file', 'logo_file', 'cache_dir', 'template_dir'):
+            if options_dict.get(key):
+                options_dict[key] = os.path.abspath(options_dict[key])
+        for key in ('font_dirs', 'allowed_dirs'):
+            if options_dict.get(key):
+                options_dict[key] = [os.path.abspath(d) for d in options_dict[key]]
+        self._send({
+            'op': 'render',
+            'jobs': [{'input': os.path.abspath(job['input']),
+                      'output': os.path.abspath(job['output']) if job.get('output') else None}
+                     for job in jobs],
+            'options': options_dict,
+            'cwd': os.getcwd(),
+        })
+        while True:
+            reply = self._receive()
+            if not reply.get('ok'):
+                raise RuntimeError(reply.get('error', 'borel daemon error'))
+            if reply.get('done'):
+                return
+            yield _result_from_dict(reply['result'])
+
+    def close(self) -> None:
+        try:
+            self._file.close()
+        finally:
+            self.sock.close()
@@ -0,0 +1,270 @@
+"""
+URL fetcher for the images and stylesheets a document references.
+
+WeasyPrint fetches every resource itself, one at a time during layout, with
+no cache. ``URLFetcher`` takes its place:
+
+* all resources of a document are prefetched in parallel before layout starts
+* remote resources are kept in a content-addressed disk cache and reused for
+  ``max_age`` seconds; with ``offline`` only the cache is used, so a missing
+  resource fails at once instead of waiting on the network
+* every fetch has a timeout and a size limit
+* with ``allowed_dirs``, local files are only read from those directories
+  and the document's own directory
+"""
+
+import json
+import mimetypes
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import unquote, urljoin, urlparse
+from urllib.request import Request, urlopen
+
+from . import __version__
+from .cache import OutputCache, compute_key, hash_bytes
+
+FETCH_TIMEOUT = 10.0
+MAX_FETCH_SIZE = 50 * 1024 * 1024
+# Cached remote resources are fetched again after a day
+FETCH_MAX_AGE = 24 * 60 * 60
+PREFETCH_WORKERS = 8
+
+_RESOURCE_URLS = (
+    re.compile(r'<(?:img|source|input|video|audio|embed)\b[^>]*?\s(?:src|poster)\s*=\s*["\']([^"\']+)["\']',
+               re.IGNORECASE),
+    re.compile(r'<link\b[^>]*?\shref\s*=\s*["\']([^"\']+)["\']', re.IGNORECASE),
+    re.compile(r'url\(\s*["\']?([^"\')]+?)["\']?\s*\)', re.IGNORECASE),
+)
+
+
+class FetchError(IOError):
+    """A resource could not be fetched (refused, offline, too large, timed out...)."""
+
+
+@dataclass
+class Resource:
+    url: str
+    data: bytes
+    mime_type: Optional[str] = None
+    encoding: Optional[str] = None
+
+    @property
+    def digest(self) -> str:
+        return hash_bytes(self.data)
+
+
+def resource_urls(html_content: str, base_url: str) -> List[str]:
+    """Absolute URLs of the images, stylesheets and CSS ``url()`` resources an HTML document uses."""
+    urls = []
+    for pattern in _RESOURCE_URLS:
+        for match in pattern.finditer(html_content):
+            url = match.group(1).strip()
+            if url and not url.startswith(('data:', '#')):
+                url = urljoin(base_url, url)
+                if url not in urls:
+                    urls.append(url)
+    return urls
+
+
+def local_path(url: str) -> Optional[str]:
+    """Filesystem path of a plain path or ``file:`` URL, or None for other URLs."""
+    parsed = urlparse(url)
+    if parsed.scheme not in ('', 'file'):
+        return None
+    return unquote(parsed.path)
+
+
+def _resource_key(url: str) -> str:
+    # WeasyPrint asks for file: URLs where the HTML has plain paths
+    path = local_path(url)
+    return os.path.abspath(path) if path is not None else url
+
+
+@lru_cache(maxsize=1)
+def _response_class():
+    """WeasyPrint 68+ takes ``URLFetcherResponse`` objects; earlier versions take dicts."""
+    from weasyprint import urls
+    return getattr(urls, 'URLFetcherResponse', None)
+
+
+@lru_cache(maxsize=1)
+def _default_fetcher():
+    """WeasyPrint's own fetcher, for ``data:`` and other URLs that need no caching."""
+    from weasyprint import urls
+    if hasattr(urls, 'default_url_fetcher'):
+        return urls.default_url_fetcher
+    return urls.URLFetcher()
+
+
+class URLFetcher:
+    """Caching, size- and time-limited ``url_fetcher`` for WeasyPrint."""
+
+    # Read by WeasyPrint 68+: fetch errors are warnings, not fatal
+    _fail_on_errors = False
+
+    def __init__(self, cache: Optional[OutputCache] = None, timeout: float = FETCH_TIMEOUT,
+                 max_size: int = MAX_FETCH_SIZE, allowed_dirs: Optional[List[str]] = None,
+                 offline: bool = False, max_age: float = FETCH_MAX_AGE):
+        self.cache = cache
+        self.timeout = timeout
+        self.max_size = max_size
+        self.allowed_dirs = ([os.path.realpath(directory) for directory in allowed_dirs]
+                             if allowed_dirs is not None else None)
+        self.offline = offline
+        self.max_age = max_age
+        self._init_state()
+
+    def _init_state(self) -> None:
+        self._document_dir: Optional[str] = None
+        # Resources (or errors) of the current document, from prefetch()
+        self._fetched: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Sent to layout worker processes; per-document state stays here
+        state = dict(self.__dict__)
+        for name in ('_document_dir', '_fetched', '_lock'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_state()
+
+    def __call__(self, url: str):
+        """The WeasyPrint ``url_fetcher`` protocol."""
+        if urlparse(url).scheme not in ('', 'file', 'http', 'https'):
+            return _default_fetcher()(url)
+        with self._lock:
+            resource = self._fetched.get(_resource_key(url))
+        if resource is None:
+            resource = self.fetch(url)
+        elif isinstance(resource, Exception):
+            raise resource
+        response_class = _response_class()
+        if response_class is None:
+            return {'string': resource.data, 'mime_type': resource.mime_type,
+                    'encoding': resource.encoding, 'redirected_url': resource.url}
+        content_type = resource.mime_type or 'application/octet-stream'
+        if resource.encoding:
+            content_type += f'; charset={resource.encoding}'
+        return response_class(resource.url, body=resource.data, headers={'Content-Type': content_type})
+
+    def prefetch(self, urls: Iterable[str], base_url: Optional[str] = None) -> Dict[str, Resource]:
+        """Fetch a document's resources in parallel, to be served from memory during layout.
+
+        Replaces the resources of the previous document. Files in the
+        directory of ``base_url`` are always allowed. Failures are reported
+        once here and raised again when WeasyPrint asks for the resource.
+        Returns the resources fetched.
+        """
+        document_dir = local_path(base_url) if base_url else None
+        self._document_dir = os.path.realpath(document_dir) if document_dir else None
+        urls = list(dict.fromkeys(urls))
+        results = []
+        if urls:
+            with ThreadPoolExecutor(min(PREFETCH_WORKERS, len(urls)),
+                                    thread_name_prefix='borel-fetch') as executor:
+                results = list(executor.map(self._try_fetch, urls))
+        with self._lock:
+            self._fetched = {_resource_key(url): result for url, result in zip(urls, results)}
+        for url, result in zip(urls, results):
+            if isinstance(result, Exception):
+                print(f"Warning: Could not fetch {url}: {result}")
+        return {url: result for url, result in zip(urls, results) if isinstance(result, Resource)}
+
+    def _try_fetch(self, url: str):
+        try:
+            return self.fetch(url)
+        except Exception as e:
+            return e
+
+    def fetch(self, url: str) -> Resource:
+        """Fetch one resource, from the disk cache where possible."""
+        path = local_path(url)
+        if path is not None:
+            return self._read_file(path, url)
+        parsed = urlparse(url)
+        if parsed.scheme not in ('http', 'https'):
+            raise FetchError(f"unsupported URL scheme '{parsed.scheme}'")
+        return self._fetch_remote(url)
+
+    def _read_file(self, path: str, url: str) -> Resource:
+        real_path = os.path.realpath(path)
+        if self.allowed_dirs is not None:
+            allowed = self.allowed_dirs + ([self._document_dir] if self._document_dir else [])
+            if not any(os.path.commonpath([real_path, directory]) == directory for directory in allowed):
+                raise FetchError(f"{path} is outside the allowed directories")
+        size = os.path.getsize(real_path)
+        if size > self.max_size:
+            raise FetchError(f"{path} is larger than {self.max_size} bytes")
+        with open(real_path, 'rb') as f:
+            data = f.read()
+        mime_type, _ = mimetypes.guess_type(path)
+        return Resource(url, data, mime_type, 'utf-8' if mime_type == 'text/css' else None)
+
+    def _fetch_remote(self, url: str) -> Resource:
+        key = compute_key({'stage': 'fetch', 'url': url})
+        cached = self._cached(url, key)
+        if cached is not None and (self.offline or time.time() - cached[1] < self.max_age):
+            return cached[0]
+        if self.offline:
+            raise FetchError("not in the cache and running offline")
+        try:
+            resource = self._download(url)
+        except Exception as e:
+            if cached is not None:
+                print(f"Warning: Could not refresh {url} ({e}); using the cached copy")
+                return cached[0]
+            raise
+        if self.cache is not None:
+            self.cache.write_bytes(resource.digest, resource.data, '.blob')
+            self.cache.write_text(key, json.dumps({
+                'url': resource.url, 'digest': resource.digest,
+                'mime_type': resource.mime_type, 'encoding': resource.encoding,
+                'fetched_at': time.time(),
+            }), '.fetch')
+        return resource
+
+    def _cached(self, url: str, key: str):
+        """The cached resource of a URL and the time it was fetched, or None."""
+        if self.cache is None:
+            return None
+        text = self.cache.read_text(key, '.fetch')
+        if text is None:
+            return None
+        entry = json.loads(text)
+        data = self.cache.read_bytes(entry['digest'], '.blob')
+        if data is None:
+            return None
+        # Not the index file's mtime, which every read refreshes for the LRU pruning
+        fetched_at = entry.get('fetched_at', 0.0)
+        return Resource(entry['url'], data, entry['mime_type'], entry['encoding']), fetched_at
+
+    def _download(self, url: str) -> Resource:
+        deadline = time.monotonic() + self.timeout
+        request = Request(url, headers={'User-Agent': f'borel/{__version__}'})
+        with urlopen(request, timeout=self.timeout) as response:
+            length = response.headers.get('Content-Length')
+            if length and length.isdigit() and int(length) > self.max_size:
+                raise FetchError(f"larger than {self.max_size} bytes")
+            chunks = []
+            size = 0
+            while True:
+                chunk = response.read(64 * 1024)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > self.max_size:
+                    raise FetchError(f"larger than {self.max_size} bytes")
+                if time.monotonic() > deadline:
+                    raise FetchError(f"timed out after {self.timeout:g}s")
+                chunks.append(chunk)
+            return Resource(response.geturl(), b''.join(chunks), response.headers.get_content_type(),
+                            response.headers.get_content_charset())
@@ -0,0 +1,105 @@
+"""
+Process-wide font configuration shared by every render.
+
+Without a shared ``FontConfiguration`` WeasyPrint creates a new one for each
+document, which reloads the fontconfig configuration and font list and
+re-registers every ``@font-face`` font. Borel creates one per process, can
+restrict fontconfig to a set of font directories, and preloads branding
+fonts when a worker starts.
+"""
+
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+from html import escape
+
+from .cache import default_cache_dir, hash_bytes
+
+if TYPE_CHECKING:
+    from weasyprint.text.fonts import FontConfiguration
+
+_font_config: Optional["FontConfiguration"] = None
+_font_dirs: Optional[List[str]] = None
+_lock = threading.Lock()
+
+# Startup metrics of the process font setup
+font_setup_stats: Dict[str, float] = {}
+
+
+def write_fontconfig_file(font_dirs: Sequence[str], cache_dir: Optional[str] = None) -> str:
+    """Write a fonts.conf that only scans ``font_dirs`` and return its path.
+
+    The generated file keeps the system's alias rules (``conf.d``) so generic
+    families such as ``serif`` still resolve, and stores fontconfig's own cache
+    under borel's cache directory so it survives between runs.
+    """
+    base = os.path.join(cache_dir or str(default_cache_dir()), 'fontconfig')
+    dirs = [os.path.abspath(directory) for directory in font_dirs]
+    lines = [
+        '<?xml version="1.0"?>',
+        '<!DOCTYPE fontconfig SYSTEM "urn:fontconfig:fonts.dtd">',
+        '<fontconfig>',
+    ]
+    lines += [f'  <dir>{escape(directory)}</dir>' for directory in dirs]
+    lines += [
+        f'  <cachedir>{escape(os.path.join(base, "cache"))}</cachedir>',
+        '  <include ignore_missing="yes">/etc/fonts/conf.d</include>',
+        '</fontconfig>',
+        '',
+    ]
+    content = '\n'.join(lines)
+    path = os.path.join(base, f"fonts-{hash_bytes(content.encode('utf-8'))[:16]}.conf")
+    if not os.path.exists(path):
+        os.makedirs(base, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+    return path
+
+
+def get_font_config(font_dirs: Optional[Sequence[str]] = None) -> "FontConfiguration":
+    """Return the font configuration shared by all renders in this process.
+
+    ``font_dirs`` restricts fontconfig to those directories. It only takes
+    effect on the first call in a process; later calls reuse the existing
+    configuration.
+    """
+    global _font_config, _font_dirs
+    with _lock:
+        if _font_config is not None:
+            if font_dirs and list(font_dirs) != _font_dirs:
+                print("Warning: Font directories are already configured for this process; "
+                      "ignoring the new ones")
+            return _font_config
+
+        from weasyprint.text.fonts import FontConfiguration
+
+        start = time.perf_counter()
+        if font_dirs:
+            # Read by fontconfig whenever a configuration is loaded
+            os.environ['FONTCONFIG_FILE'] = write_fontconfig_file(font_dirs)
+        _font_config = FontConfiguration()
+        _font_dirs = list(font_dirs) if font_dirs else None
+        font_setup_stats['font_config_seconds'] = time.perf_counter() - start
+        return _font_config
+
+
+def preload_fonts(stylesheets: Iterable[Tuple[str, Optional[str]]]) -> float:
+    """Register the ``@font-face`` fonts of branding stylesheets ahead of the first render.
+
+    ``stylesheets`` are (CSS content, base URL) pairs. Returns the seconds
+    spent; the compiled stylesheets stay in the process stylesheet cache.
+    """
+    from .stylesheets import get_stylesheet_manager
+
+    start = time.perf_counter()
+    font_config = get_font_config()
+    manager = get_stylesheet_manager()
+    for css_content, base_url in stylesheets:
+        if '@font-face' in css_content:
+            manager.get(css_content, base_url, font_config=font_config)
+    elapsed = time.perf_counter() - start
+    font_setup_stats['preload_seconds'] = font_setup_stats.get('preload_seconds', 0.0) + elapsed
+    return elapsed
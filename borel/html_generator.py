@@ -5,85 +5,117 @@ HTML generation from markdown content using pandoc.
 import os
 import tempfile
 import subprocess
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional
-from jinja2 import Template
+from typing import Optional, Tuple
 
-try:
-    import pypandoc
-    PYPANDOC_AVAILABLE = True
-except ImportError:
-    PYPANDOC_AVAILABLE = False
+from .backends import probe_backends
+from .cache import StageCache, default_cache_dir, hash_bytes
+from .markdown_engine import markdown_to_html
+
+
+PANDOC_BACKENDS = ('process', 'server')
+MARKDOWN_ENGINES = ('pandoc', 'native')
+
+# Packaged default templates; a template directory can override either file
+TEMPLATES_DIR = Path(__file__).parent / 'templates'
+TEMPLATE_NAMES = ('base.html', 'title_page.html')
+
+PANDOC_ARGS = [
+    '--standalone',
+    '--from=markdown',
+    '--to=html',
+    '--wrap=none'
+]
+
+
+@dataclass
+class Conversion:
+    """Markdown converted to HTML, and how it was converted."""
+
+    html: str
+    # Whether pandoc's output came from the stage cache; None when it is not cached
+    cache_hit: Optional[bool] = None
+    # Pandoc failed and the degraded native fallback was used
+    fallback: bool = False
+
+
+def get_pandoc_version() -> Optional[str]:
+    """Return the pandoc version from the cached backend probe, or None if pandoc is missing."""
+    return probe_backends()['pandoc_version']
+
+
+@lru_cache(maxsize=None)
+def get_template_environment(template_dir: Optional[str] = None, cache_dir: Optional[str] = None):
+    """Return the Jinja environment for a template directory, created once per process.
+    
+    Templates in ``template_dir`` take precedence over the packaged defaults.
+    Compiled templates stay in the environment (and are recompiled when their
+    file changes); their bytecode is also cached on disk, so new worker
+    processes skip compilation.
+    """
+    from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+    
+    search_path = ([template_dir] if template_dir else []) + [str(TEMPLATES_DIR)]
+    bytecode_dir = (Path(cache_dir) if cache_dir else default_cache_dir()) / 'templates'
+    try:
+        bytecode_dir.mkdir(parents=True, exist_ok=True)
+        bytecode_cache = FileSystemBytecodeCache(str(bytecode_dir))
+    except OSError:
+        bytecode_cache = None
+    return Environment(loader=FileSystemLoader(search_path), bytecode_cache=bytecode_cache,
+                       auto_reload=True)
 
 
 class HTMLGenerator:
     """Generate HTML from markdown content."""
     
-    def __init__(self):
-        self.base_template = """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{{ title }}</title>
-    <style>
-        {{ css_content }}
-        /* Footer styling for PDF */
-        @media print {
-            footer.borel-footer {
-                position: fixed;
-                bottom: 1cm;
-                left: 0;
-                right: 0;
-                width: 100%;
-                text-align: center;
-                font-size: 10pt;
-                color: #666;
-                z-index: 1001;
-            }
-        }
-        footer.borel-footer {
-            position: fixed;
-            bottom: 1cm;
-            left: 0;
-            right: 0;
-            width: 100%;
-            text-align: center;
-            font-size: 10pt;
-            color: #666;
-            z-index: 1001;
-        }
-        .title-page + footer.borel-footer {
-            display: none;
-        }
-    </style>
-</head>
-<body data-company="{{ company_name }}" data-year="{{ year }}">
-    {{ title_page }}
-    
-    {% if logo_file %}
-    <img src="{{ logo_file }}" alt="Company Logo" class="letterhead">
-    {% endif %}
+    def __init__(self, pandoc_backend: str = 'process', pandoc_servers: int = 1,
+                 stage_cache: Optional[StageCache] = None, engine: str = 'pandoc',
+                 cache_dir: Optional[str] = None):
+        if pandoc_backend not in PANDOC_BACKENDS:
+            raise ValueError(f"Unknown pandoc backend: {pandoc_backend}")
+        if engine not in MARKDOWN_ENGINES:
+            raise ValueError(f"Unknown markdown engine: {engine}")
+        self.pandoc_backend = pandoc_backend
+        self.engine = engine
+        self.pandoc_servers = pandoc_servers
+        self.stage_cache = stage_cache
+        # Directory for compiled template bytecode (default: the borel cache directory)
+        self.cache_dir = cache_dir
     
-    {{ content }}
+    def load_templates(self, template_dir: Optional[str] = None):
+        """Return the compiled document template, compiling it on first use in this process."""
+        environment = get_template_environment(template_dir, self.cache_dir)
+        for name in TEMPLATE_NAMES[1:]:
+            environment.get_template(name)
+        return environment.get_template(TEMPLATE_NAMES[0])
     
-    <footer class="borel-footer">{{ company_name }} &copy; {{ year }}</footer>
-</body>
-</html>
-"""
+    def template_digest(self, template_dir: Optional[str] = None) -> str:
+        """Hash of the template sources in use, for output cache keys."""
+        environment = get_template_environment(template_dir, self.cache_dir)
+        sources = [environment.loader.get_source(environment, name)[0] for name in TEMPLATE_NAMES]
+        return hash_bytes('\0'.join(sources).encode('utf-8'))
     
     def generate_html(self, markdown_content: str, metadata: dict, css_content: str, 
-                     logo_file: Optional[str] = None) -> str:
+                     logo_file: Optional[str] = None, template_dir: Optional[str] = None) -> str:
         """Generate complete HTML document from markdown."""
         # Convert markdown to HTML
         html_content = self._markdown_to_html(markdown_content)
+        return self.render_template(html_content, metadata, css_content, logo_file,
+                                    template_dir=template_dir)
+    
+    def render_template(self, html_content: str, metadata: dict, css_content: str,
+                        logo_file: Optional[str] = None, title_page: bool = True,
+                        template_dir: Optional[str] = None) -> str:
+        """Wrap converted HTML in the document template with title page, CSS and logo.
         
-        # Create title page
-        title_page = self._create_title_page(metadata)
-        
-        # Render template
-        template = Template(self.base_template)
+        Sections of a split document after the first are rendered with
+        ``title_page=False``. ``template_dir`` holds templates that override
+        the packaged base.html and title_page.html.
+        """
+        template = self.load_templates(template_dir)
         
         # Handle date extraction for year
         date_value = metadata.get('date', '')
@@ -94,7 +126,10 @@ class HTMLGenerator:
         
         # Handle logo file path - convert to relative path if it's a file
         logo_path = None
-        if logo_file and os.path.exists(logo_file):
+        if logo_file and logo_file.startswith('data:'):
+            # Already processed and embedded by the logo pipeline
+            logo_path = logo_file
+        elif logo_file and os.path.exists(logo_file):
             # Use absolute path for the HTML src attribute to work with WeasyPrint
             logo_path = os.path.abspath(logo_file)
         
@@ -105,101 +140,132 @@ class HTMLGenerator:
             year=year,
             logo_file=logo_path,
             title_page=title_page,
+            metadata=metadata,
             content=html_content
         )
     
-    def _markdown_to_html(self, markdown_content: str) -> str:
-        """Convert markdown to HTML using pandoc."""
-        if PYPANDOC_AVAILABLE:
+    def _markdown_to_html(self, markdown_content: str, engine: Optional[str] = None) -> str:
+        """Convert markdown to HTML, reusing cached pandoc output when available."""
+        return self.convert(markdown_content, engine).html
+    
+    def convert(self, markdown_content: str, engine: Optional[str] = None) -> Conversion:
+        """Convert markdown to HTML, reusing cached pandoc output when available.
+        
+        ``engine`` overrides the generator's engine for this document. The
+        native engine runs in-process and is fast enough not to be cached.
+        Safe to call from several threads at once: how the document was
+        converted is returned, not kept on the generator.
+        """
+        engine = engine or self.engine
+        if engine == 'native':
+            return Conversion(markdown_to_html(markdown_content))
+        if engine not in MARKDOWN_ENGINES:
+            raise ValueError(f"Unknown markdown engine: {engine}")
+        key = self.pandoc_stage_key(markdown_content)
+        if key is None:
+            html, fallback = self._convert_markdown(markdown_content)
+            return Conversion(html, fallback=fallback)
+        
+        html = self.stage_cache.get(key)
+        if html is not None:
+            return Conversion(html, cache_hit=True)
+        
+        html, fallback = self._convert_markdown(markdown_content)
+        # Only pandoc output is cached; the native fallback is a degraded result
+        if not fallback:
+            self.stage_cache.put(key, html)
+        return Conversion(html, cache_hit=False, fallback=fallback)
+    
+    def pandoc_stage_key(self, markdown_content: str) -> Optional[str]:
+        """Stage cache key of pandoc's output for the markdown, or None if it is not cached."""
+        if self.stage_cache is None:
+            return None
+        pandoc_version = get_pandoc_version()
+        if pandoc_version is None:
+            return None
+        return self.stage_cache.key({
+            'markdown': hash_bytes(markdown_content.encode('utf-8')),
+            'pandoc': pandoc_version,
+            'args': PANDOC_ARGS,
+        })
+    
+    def _convert_markdown(self, markdown_content: str) -> Tuple[str, bool]:
+        """Convert markdown to HTML using pandoc.
+        
+        Returns the HTML and whether the native fallback was used.
+        """
+        if self.pandoc_backend == 'server':
+            from .pandoc_server import PandocServerError, get_server_pool
+            pool = get_server_pool(self.pandoc_servers)
+            if pool is not None:
+                try:
+                    return pool.convert(markdown_content), False
+                except PandocServerError as e:
+                    print(f"Warning: Pandoc server conversion failed: {e}")
+        
+        pandoc_path = probe_backends()['pandoc_path']
+        if pandoc_path:
+            try:
+                return self._run_pandoc(pandoc_path, markdown_content), False
+            except (subprocess.CalledProcessError, OSError) as e:
+                print(f"Warning: Pandoc conversion failed: {e}")
+                return self._simple_markdown_to_html(markdown_content), True
+        
+        try:
+            import pypandoc
+        except ImportError:
+            pypandoc = None
+        if pypandoc is not None:
             try:
                 return pypandoc.convert_text(
                     markdown_content,
                     'html',
                     format='markdown',
-                    extra_args=[
-                        '--standalone',
-                        '--from=markdown',
-                        '--to=html',
-                        '--wrap=none'
-                    ]
-                )
+                    extra_args=PANDOC_ARGS
+                ), False
             except Exception as e:
                 print(f"Warning: Pandoc conversion failed: {e}")
                 return self._fallback_markdown_to_html(markdown_content)
         else:
             return self._fallback_markdown_to_html(markdown_content)
     
-    def _fallback_markdown_to_html(self, markdown_content: str) -> str:
-        """Fallback markdown to HTML conversion using subprocess pandoc."""
+    def _run_pandoc(self, pandoc_path: str, markdown_content: str) -> str:
+        """Convert markdown by piping it through the probed pandoc binary.
+        
+        Equivalent to ``pypandoc.convert_text``, without the format listing it
+        runs pandoc for on every call.
+        """
+        result = subprocess.run(
+            [pandoc_path] + PANDOC_ARGS,
+            input=markdown_content, capture_output=True, text=True, encoding='utf-8', check=True
+        )
+        return result.stdout
+    
+    def _fallback_markdown_to_html(self, markdown_content: str) -> Tuple[str, bool]:
+        """Fallback markdown to HTML conversion using subprocess pandoc.
+        
+        Returns the HTML and whether the native fallback was used.
+        """
         try:
             with tempfile.NamedTemporaryFile(mode='w', suffix='.md', delete=False) as f:
                 f.write(markdown_content)
                 temp_file = f.name
             
-            result = subprocess.run([
-                'pandoc',
-                '--standalone',
-                '--from=markdown',
-                '--to=html',
-                '--wrap=none',
-                temp_file
-            ], capture_output=True, text=True, check=True)
+            result = subprocess.run(
+                ['pandoc'] + PANDOC_ARGS + [temp_file],
+                capture_output=True, text=True, check=True
+            )
             
             os.unlink(temp_file)
-            return result.stdout
+            return result.stdout, False
             
         except (subprocess.CalledProcessError, FileNotFoundError) as e:
             print(f"Warning: Pandoc not available: {e}")
-            return self._simple_markdown_to_html(markdown_content)
+            return self._simple_markdown_to_html(markdown_content), True
     
     def _simple_markdown_to_html(self, markdown_content: str) -> str:
-        """Simple markdown to HTML conversion without external dependencies."""
-        import re
-        
-        # Basic markdown to HTML conversion
-        html = markdown_content
-        
-        # Headers
-        html = re.sub(r'^### (.*$)', r'<h3>\1</h3>', html, flags=re.MULTILINE)
-        html = re.sub(r'^## (.*$)', r'<h2>\1</h2>', html, flags=re.MULTILINE)
-        html = re.sub(r'^# (.*$)', r'<h1>\1</h1>', html, flags=re.MULTILINE)
-        
-        # Bold and italic
-        html = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', html)
-        html = re.sub(r'\*(.*?)\*', r'<em>\1</em>', html)
-        
-        # Lists
-        html = re.sub(r'^\- (.*$)', r'<li>\1</li>', html, flags=re.MULTILINE)
-        html = re.sub(r'^(\d+)\. (.*$)', r'<li>\2</li>', html, flags=re.MULTILINE)
-        
-        # Paragraphs
-        html = re.sub(r'^([^<].*)$', r'<p>\1</p>', html, flags=re.MULTILINE)
-        
-        # Remove empty paragraphs
-        html = re.sub(r'<p>\s*</p>', '', html)
-        
-        # Wrap lists
-        html = re.sub(r'(<li>.*?</li>)', r'<ul>\1</ul>', html, flags=re.DOTALL)
-        
-        return html
-    
-    def _create_title_page(self, metadata: dict) -> str:
-        """Create title page HTML."""
-        title = metadata.get('title', 'Document Title')
-        subtitle = metadata.get('subtitle', '')
-        author = metadata.get('author', 'Author')
-        date = metadata.get('date', '')
-        
-        title_html = f'<div class="title-page"><h1>{title}</h1>'
-        
-        if subtitle:
-            title_html += f'<div class="subtitle">{subtitle}</div>'
-        
-        title_html += f'<div class="author">{author}</div>'
-        title_html += f'<div class="date">{date}</div>'
-        title_html += '</div>'
-        
-        return title_html
+        """Convert markdown without pandoc, using the native engine."""
+        return markdown_to_html(markdown_content)
     
     def save_html(self, html_content: str, output_path: str) -> None:
         """Save HTML content to file."""
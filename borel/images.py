@@ -0,0 +1,201 @@
+"""
+Image pipeline: downscale the images a document embeds before layout.
+
+Every local raster image referenced by the converted HTML is downsampled to
+the print resolution of the page's content width and recompressed, in
+parallel. The results are cached on disk by content hash, and the ``<img>``
+references are rewritten to the cached copies, so WeasyPrint never decodes
+the full-size originals and every PDF embeds the small versions.
+"""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .cache import OutputCache, compute_key, hash_file
+from .logo import DEFAULT_DPI, UNITS_PER_INCH, pil_image, scale_raster
+from .pdf_generator import IMG_SRC, local_file
+
+JPEG_QUALITY = 90
+# Bump when the processing changes so cached images are rebuilt
+PIPELINE_VERSION = 2
+
+# Page sizes in inches (portrait), and WeasyPrint's default page margin of 75px
+PAGE_SIZES = {
+    'a3': (297 / 25.4, 420 / 25.4), 'a4': (210 / 25.4, 297 / 25.4), 'a5': (148 / 25.4, 210 / 25.4),
+    'b4': (250 / 25.4, 353 / 25.4), 'b5': (176 / 25.4, 250 / 25.4),
+    'letter': (8.5, 11.0), 'legal': (8.5, 14.0), 'ledger': (11.0, 17.0),
+}
+DEFAULT_MARGIN = 75 / 96
+
+# Vector and animated formats are left alone
+_SKIPPED_SUFFIXES = {'.svg', '.gif'}
+_PAGE_RULE = re.compile(r'@page\s*\{')
+_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+_LENGTH = re.compile(r'^([\d.]+)(in|cm|mm|pt|pc|px)$')
+
+
+def _page_declarations(css_content: str) -> Dict[str, str]:
+    """Declarations of the ``@page`` rules without a selector, the last one winning."""
+    declarations: Dict[str, str] = {}
+    css_content = _COMMENT.sub('', css_content)
+    for match in _PAGE_RULE.finditer(css_content):
+        depth = 1
+        text = []
+        for char in css_content[match.end():]:
+            depth += {'{': 1, '}': -1}.get(char, 0)
+            if depth == 0:
+                break
+            # Skip the nested margin boxes (@top-right { ... })
+            if depth == 1 and char != '}':
+                text.append(char)
+        for declaration in ''.join(text).split(';'):
+            name, _, value = declaration.partition(':')
+            name = name.strip().split()[-1].lower() if name.strip() else ''
+            if name and value.strip():
+                declarations[name] = value.strip().lower()
+    return declarations
+
+
+def _length(value: str) -> Optional[float]:
+    match = _LENGTH.match(value)
+    return float(match.group(1)) / UNITS_PER_INCH[match.group(2)] if match else None
+
+
+def content_width(css_content: str) -> float:
+    """Width of the page's content box in inches, from the ``@page`` size and margins."""
+    declarations = _page_declarations(css_content)
+    size = declarations.get('size', 'a4').split()
+    named = [PAGE_SIZES[part] for part in size if part in PAGE_SIZES]
+    lengths = [_length(part) for part in size if _length(part) is not None]
+    if lengths:
+        width = lengths[0]
+    else:
+        width, height = named[0] if named else PAGE_SIZES['a4']
+        if 'landscape' in size:
+            width = height
+
+    margins = [_length(part) for part in declarations.get('margin', '').split()]
+    margins = [margin if margin is not None else DEFAULT_MARGIN for margin in margins] or [DEFAULT_MARGIN]
+    right = margins[1] if len(margins) > 1 else margins[0]
+    left = margins[3] if len(margins) > 3 else right
+    right = _length(declarations.get('margin-right', '')) or right
+    left = _length(declarations.get('margin-left', '')) or left
+    return max(1.0, width - left - right)
+
+
+def process_image(data: bytes, suffix: str, width_px: int, dpi: int = DEFAULT_DPI,
+                  quality: int = JPEG_QUALITY) -> Tuple[bytes, str]:
+    """Downscale and recompress image bytes. Returns the original when that is smaller."""
+    processed, processed_suffix = scale_raster(data, width_px, dpi, quality)
+    if len(processed) >= len(data):
+        return data, suffix
+    return processed, processed_suffix
+
+
+class ImageOptimizer:
+    """Optimize each distinct image once and cache the result on disk by content hash."""
+
+    def __init__(self, cache: OutputCache, workers: Optional[int] = None):
+        self.cache = cache
+        self.workers = workers or os.cpu_count() or 1
+        # (path, mtime, size, width, dpi, quality) -> optimized copy, or None to keep the original
+        self._paths: Dict[Tuple, Optional[str]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def optimize(self, html_content: str, base_url: str, css_content: str, dpi: int = DEFAULT_DPI,
+                 quality: int = JPEG_QUALITY) -> str:
+        """Point the HTML's local images at optimized copies sized for the page's content width."""
+        if pil_image() is None:
+            return html_content
+        width_px = max(1, round(content_width(css_content) * dpi))
+        paths: List[str] = []
+        for match in IMG_SRC.finditer(html_content):
+            path = local_file(match.group(2), base_url)
+            if (path is not None and path not in paths and os.path.isfile(path)
+                    and os.path.splitext(path)[1].lower() not in _SKIPPED_SUFFIXES):
+                paths.append(path)
+        if not paths:
+            return html_content
+
+        optimized: Dict[str, str] = {}
+        pending: List[Tuple[str, Tuple]] = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removed since the HTML was scanned; the reference is left alone
+                continue
+            memo_key = (path, stat.st_mtime_ns, stat.st_size, width_px, dpi, quality)
+            # A long-running process may have pruned the cached copy since
+            if memo_key in self._paths and (self._paths[memo_key] is None
+                                            or os.path.exists(self._paths[memo_key])):
+                if self._paths[memo_key]:
+                    optimized[path] = self._paths[memo_key]
+            else:
+                pending.append((path, memo_key))
+
+        def lookup(path: str) -> Tuple[Optional[str], bool]:
+            return self._optimized_path(path, width_px, dpi, quality)
+
+        if len(pending) <= 1 or self.workers <= 1:
+            results = [lookup(path) for path, _ in pending]
+        else:
+            with ThreadPoolExecutor(min(self.workers, len(pending)),
+                                    thread_name_prefix='borel-images') as executor:
+                results = list(executor.map(lookup, [path for path, _ in pending]))
+        # Counted and memoized here, not in the worker threads
+        for (path, memo_key), (result, hit) in zip(pending, results):
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._paths[memo_key] = result
+            if result:
+                optimized[path] = result
+
+        def rewrite(match):
+            path = local_file(match.group(2), base_url)
+            if path not in optimized:
+                return match.group(0)
+            return match.group(1) + optimized[path] + match.group(3)
+
+        return IMG_SRC.sub(rewrite, html_content)
+
+    def _optimized_path(self, path: str, width_px: int, dpi: int, quality: int) -> Tuple[Optional[str], bool]:
+        """The optimized copy of an image (None to keep the original) and whether it was cached.
+
+        Runs in worker threads, so it only touches the disk cache.
+        """
+        key = compute_key({'image': hash_file(path), 'suffix': os.path.splitext(path)[1].lower(),
+                           'width': width_px, 'dpi': dpi, 'quality': quality,
+                           'pipeline': PIPELINE_VERSION})
+        # The index holds the suffix of the optimized copy, or '' when the original is smaller
+        suffix = self.cache.read_text(key, '.image')
+        hit = suffix is not None and (not suffix or self.cache.object_path(key, suffix).exists())
+        if not hit:
+            suffix = self._process(path, key, width_px, dpi, quality)
+        return (str(self.cache.object_path(key, suffix)) if suffix else None), hit
+
+    def _process(self, path: str, key: str, width_px: int, dpi: int, quality: int) -> str:
+        with open(path, 'rb') as f:
+            data = f.read()
+        try:
+            processed, suffix = process_image(data, os.path.splitext(path)[1].lower(), width_px, dpi, quality)
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not optimize image {path}: {e}")
+            return ''
+        if processed is data:
+            suffix = ''
+        try:
+            if suffix:
+                self.cache.write_bytes(key, processed, suffix)
+            self.cache.write_text(key, suffix, '.image')
+        except OSError:
+            return ''
+        return suffix
+
+    def clear(self) -> None:
+        self._paths.clear()
@@ -0,0 +1,190 @@
+"""
+Logo asset pipeline: prepare the letterhead logo once for every render.
+
+Raster logos are downsampled to the print resolution of the ``.letterhead``
+box and SVG logos are stripped of editor metadata, comments and scripts. The
+result is cached on disk by content hash and embedded in the HTML as a data
+URI, so WeasyPrint never decodes the full-size original and every PDF embeds
+the small version.
+"""
+
+import base64
+import re
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .cache import OutputCache, compute_key, hash_file
+
+DEFAULT_DPI = 300
+# Width of the .letterhead box in the default CSS
+DEFAULT_LOGO_WIDTH = 3 / 2.54
+# Bump when the processing changes so cached assets are rebuilt
+PIPELINE_VERSION = 2
+
+UNITS_PER_INCH = {'in': 1.0, 'cm': 2.54, 'mm': 25.4, 'pt': 72.0, 'pc': 6.0, 'px': 96.0}
+_letterhead_rule = re.compile(r'\.letterhead\s*\{([^}]*)\}')
+_width_declaration = re.compile(r'(?:^|;)\s*width\s*:\s*([\d.]+)\s*(in|cm|mm|pt|pc|px)\b')
+
+_MIME_TYPES = {'.svg': 'image/svg+xml', '.png': 'image/png', '.jpg': 'image/jpeg',
+               '.jpeg': 'image/jpeg', '.gif': 'image/gif'}
+
+_SVG_NAMESPACE = 'http://www.w3.org/2000/svg'
+# Editor namespaces whose elements and attributes never affect rendering
+_EDITOR_NAMESPACES = (
+    'http://www.inkscape.org/namespaces/inkscape',
+    'http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd',
+    'http://ns.adobe.com/',
+    'http://www.bohemiancoding.com/sketch/ns',
+)
+_DROPPED_ELEMENTS = {'metadata', 'script', 'title', 'desc'}
+
+
+@lru_cache(maxsize=None)
+def pil_image():
+    """Import Pillow's Image module on first use, or return None if Pillow is missing."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def image_to_data_uri(data: bytes, suffix: str) -> str:
+    """Encode image bytes as a data URI, picking the MIME type from a file suffix."""
+    mime_type = _MIME_TYPES.get(suffix.lower(), 'image/png')
+    return f"data:{mime_type};base64,{base64.b64encode(data).decode('utf-8')}"
+
+
+def letterhead_width(css_content: str) -> float:
+    """Width of the ``.letterhead`` box in inches, as set by the last rule that sets one."""
+    width = None
+    for block in _letterhead_rule.findall(css_content):
+        for value, unit in _width_declaration.findall(block):
+            width = float(value) / UNITS_PER_INCH[unit]
+    return width or DEFAULT_LOGO_WIDTH
+
+
+def sanitize_svg(data: bytes) -> bytes:
+    """Strip comments, metadata, scripts and editor data from an SVG.
+
+    Returns the input unchanged if it cannot be parsed.
+    """
+    import xml.etree.ElementTree as ET
+    try:
+        root = ET.fromstring(data)
+    except ET.ParseError:
+        return data
+
+    def is_editor(name: str) -> bool:
+        return name.startswith('{') and name[1:].startswith(_EDITOR_NAMESPACES)
+
+    for parent in root.iter():
+        for child in list(parent):
+            # Comments and processing instructions have a function as tag
+            if not isinstance(child.tag, str):
+                parent.remove(child)
+                continue
+            local_name = child.tag.rsplit('}', 1)[-1]
+            if local_name in _DROPPED_ELEMENTS or is_editor(child.tag):
+                parent.remove(child)
+        for name in list(parent.attrib):
+            if is_editor(name) or name.lower().startswith('on'):
+                del parent.attrib[name]
+
+    ET.register_namespace('', _SVG_NAMESPACE)
+    ET.register_namespace('xlink', 'http://www.w3.org/1999/xlink')
+    return ET.tostring(root, encoding='utf-8')
+
+
+def scale_raster(data: bytes, width_px: int, dpi: int, quality: int = 90) -> Tuple[bytes, str]:
+    """Downsample a raster image to at most ``width_px`` pixels wide.
+
+    JPEGs stay JPEGs; everything else becomes a PNG. Returns the image bytes
+    and their file suffix.
+    """
+    Image = pil_image()
+    from PIL import ImageOps
+    with Image.open(BytesIO(data)) as image:
+        image.load()
+        is_jpeg = image.format == 'JPEG'
+        icc_profile = image.info.get('icc_profile')
+        # The EXIF orientation is not saved with the copy, so apply it to the pixels
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA', 'L', 'LA', 'CMYK'):
+            image = image.convert('RGBA')
+        if image.width > width_px:
+            height = max(1, round(image.height * width_px / image.width))
+            image = image.resize((width_px, height), Image.LANCZOS)
+
+        out = BytesIO()
+        save_options = {'dpi': (dpi, dpi), 'optimize': True}
+        if icc_profile:
+            save_options['icc_profile'] = icc_profile
+        if is_jpeg:
+            image.save(out, 'JPEG', quality=quality, **save_options)
+            return out.getvalue(), '.jpg'
+        image.save(out, 'PNG', **save_options)
+        return out.getvalue(), '.png'
+
+
+def process_logo(data: bytes, suffix: str, width: float, dpi: int = DEFAULT_DPI) -> Tuple[bytes, str]:
+    """Prepare logo bytes for a box ``width`` inches wide. Returns bytes and suffix."""
+    suffix = suffix.lower()
+    if suffix == '.svg':
+        return sanitize_svg(data), suffix
+    if pil_image() is None:
+        return data, suffix
+    try:
+        processed, processed_suffix = scale_raster(data, max(1, round(width * dpi)), dpi)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Could not process logo image: {e}")
+        return data, suffix
+    # Already-small logos can grow when re-encoded
+    if len(processed) >= len(data):
+        return data, suffix
+    return processed, processed_suffix
+
+
+class LogoProcessor:
+    """Process each distinct logo once and cache the result on disk by content hash."""
+
+    def __init__(self, cache: Optional[OutputCache] = None, dpi: int = DEFAULT_DPI):
+        self.cache = cache
+        self.dpi = dpi
+        self._data_uris: Dict[Tuple[str, float], str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def data_uri(self, logo_file: str, css_content: str, digest: Optional[str] = None) -> str:
+        """Return the processed logo as a data URI sized for the CSS's letterhead box."""
+        width = letterhead_width(css_content)
+        digest = digest or hash_file(logo_file)
+        memo_key = (digest, width)
+        if memo_key in self._data_uris:
+            return self._data_uris[memo_key]
+
+        key = compute_key({'logo': digest, 'suffix': Path(logo_file).suffix.lower(),
+                           'width': width, 'dpi': self.dpi, 'pipeline': PIPELINE_VERSION,
+                           'pil': pil_image() is not None})
+        data_uri = self.cache.read_text(key, '.logo') if self.cache is not None else None
+        if data_uri is None:
+            self.misses += 1
+            with open(logo_file, 'rb') as f:
+                data = f.read()
+            processed, suffix = process_logo(data, Path(logo_file).suffix, width, self.dpi)
+            data_uri = image_to_data_uri(processed, suffix)
+            if self.cache is not None:
+                try:
+                    self.cache.write_text(key, data_uri, '.logo')
+                except OSError:
+                    pass
+        else:
+            self.hits += 1
+
+        self._data_uris[memo_key] = data_uri
+        return data_uri
+
+    def clear(self) -> None:
+        self._data_uris.clear()
@@ -0,0 +1,870 @@
+"""
+Native markdown engine: converts markdown to HTML in-process, without pandoc.
+
+The parser follows CommonMark, and pandoc's markdown where the two differ, so
+the output matches ``pandoc --from=markdown --to=html --wrap=none`` for the
+features borel documents use: headings (with pandoc's identifiers), emphasis,
+strikeout, sub/superscript, code, links, images and figures, lists, block
+quotes, pipe tables, thematic breaks, raw HTML (page-break divs) and smart
+punctuation. Code blocks are not syntax highlighted.
+
+Blocks are parsed in one pass over the lines (nested containers re-parse
+only their own lines), then each leaf block is scanned once for inlines.
+Block quotes and lists nested deeper than ``MAX_NESTING`` are kept as text.
+"""
+
+import re
+from html import escape, unescape
+from typing import Dict, List, Optional, Set, Tuple
+
+_ATX_HEADING = re.compile(r'^ {0,3}(#{1,6})(?:[ \t]+|$)(.*?)(?:[ \t]+#+)?[ \t]*$')
+_SETEXT_UNDERLINE = re.compile(r'^ {0,3}(=+|-+)[ \t]*$')
+_THEMATIC_BREAK = re.compile(r'^ {0,3}(?:(?:\*[ \t]*){3,}|(?:-[ \t]*){3,}|(?:_[ \t]*){3,})$')
+_FENCE = re.compile(r'^( {0,3})(`{3,}|~{3,})[ \t]*([^`]*?)[ \t]*$')
+_BLOCKQUOTE = re.compile(r'^ {0,3}> ?')
+_LIST_MARKER = re.compile(r'^( {0,3})([-+*]|(\d{1,9})([.)]))(?=[ \t]|$)')
+_TABLE_DELIMITER = re.compile(r'^ {0,3}\|?[ \t]*:?-+:?[ \t]*(?:\|[ \t]*:?-+:?[ \t]*)*\|?[ \t]*$')
+_REFERENCE = re.compile(r'^ {0,3}\[((?:[^\[\]\\]|\\.){1,999})\]:[ \t]*<?([^\s>]*)>?'
+                        r'(?:[ \t]+(?:"([^"]*)"|\'([^\']*)\'|\(([^)]*)\)))?[ \t]*$')
+# Containers (block quotes, list items) nested deeper are parsed as paragraph text, which
+# keeps the recursive parser and renderer well within Python's recursion limit
+MAX_NESTING = 64
+
+_HEADING_ATTRIBUTES = re.compile(r'[ \t]*\{([^{}]*)\}[ \t]*$')
+
+_HTML_BLOCK_TAGS = frozenset((
+    'address', 'article', 'aside', 'base', 'basefont', 'blockquote', 'body', 'caption', 'center',
+    'col', 'colgroup', 'dd', 'details', 'dialog', 'dir', 'div', 'dl', 'dt', 'fieldset',
+    'figcaption', 'figure', 'footer', 'form', 'frame', 'frameset', 'h1', 'h2', 'h3', 'h4', 'h5',
+    'h6', 'head', 'header', 'hr', 'html', 'iframe', 'legend', 'li', 'link', 'main', 'menu',
+    'menuitem', 'nav', 'noframes', 'ol', 'optgroup', 'option', 'p', 'param', 'section', 'source',
+    'summary', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'title', 'tr', 'track', 'ul',
+))
+_HTML_RAW_BLOCK = re.compile(r'^ {0,3}<(script|pre|style|textarea)(?:[\s>]|$)', re.IGNORECASE)
+_HTML_TAG_BLOCK = re.compile(r'^ {0,3}</?([A-Za-z][A-Za-z0-9-]*)(?:[\s/>]|$)')
+_HTML_COMMENT_BLOCK = re.compile(r'^ {0,3}<!--')
+
+_ATTRIBUTE = r'(?:\s+[A-Za-z_:][\w.:-]*(?:\s*=\s*(?:[^\s"\'=<>`]+|\'[^\']*\'|"[^"]*"))?)'
+_INLINE_HTML = re.compile(r'<[A-Za-z][A-Za-z0-9-]*' + _ATTRIBUTE + r'*\s*/?>|</[A-Za-z][A-Za-z0-9-]*\s*>'
+                          r'|<!--.*?-->|<\?.*?\?>|<![A-Z]+\s[^>]*>|<!\[CDATA\[.*?\]\]>', re.DOTALL)
+_COMPLETE_TAG_LINE = re.compile(r'^ {0,3}(?:<[A-Za-z][A-Za-z0-9-]*' + _ATTRIBUTE
+                                + r'*\s*/?>|</[A-Za-z][A-Za-z0-9-]*\s*>)[ \t]*$')
+_AUTOLINK = re.compile(r'<([A-Za-z][A-Za-z0-9+.-]{1,31}:[^\s<>]*)>')
+_EMAIL_AUTOLINK = re.compile(r'<([A-Za-z0-9.!#$%&\'*+/=?^_`{|}~-]+@[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}'
+                             r'[A-Za-z0-9])?(?:\.[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?)*)>')
+_ENTITY = re.compile(r'&(?:#[xX][0-9a-fA-F]{1,6}|#[0-9]{1,7}|[A-Za-z][A-Za-z0-9]{1,31});')
+_ESCAPABLE = set('!"#$%&\'()*+,-./:;<=>?@[\\]^_`{|}~')
+_PUNCTUATION = _ESCAPABLE | set('\u2018\u2019\u201c\u201d\u2013\u2014\u2026')
+_TAG = re.compile(r'<[^>]*>')
+_SPECIAL = re.compile(r'[\\`<&\[!\]\n*_~^"\'\-.>]')
+
+
+class _Block:
+    """A parsed block: its kind, raw text or child blocks, and attributes."""
+
+    __slots__ = ('kind', 'text', 'children', 'attrs', 'blank_before')
+
+    def __init__(self, kind: str, text: str = '', children: Optional[list] = None, **attrs):
+        self.kind = kind
+        self.text = text
+        self.children = children or []
+        self.attrs = attrs
+        self.blank_before = False
+
+
+def markdown_to_html(text: str) -> str:
+    """Convert a markdown document to an HTML fragment."""
+    return _Renderer().render(text)
+
+
+def _indent(line: str) -> int:
+    return len(line) - len(line.lstrip(' '))
+
+
+def _is_blank(line: str) -> bool:
+    return not line.strip()
+
+
+def _marker_kind(line: str) -> Optional[str]:
+    """The bullet character or ordered delimiter of a list item line; items of a list share it."""
+    match = _LIST_MARKER.match(line)
+    if not match:
+        return None
+    return match.group(4) if match.group(3) is not None else match.group(2)
+
+
+def _normalize_label(label: str) -> str:
+    return ' '.join(label.split()).casefold()
+
+
+def _split_row(line: str) -> List[str]:
+    """Split a pipe table row at unescaped pipes outside code spans."""
+    line = line.strip()
+    if line.startswith('|'):
+        line = line[1:]
+    if line.endswith('|') and not line.endswith('\\|'):
+        line = line[:-1]
+    if '`' not in line and '\\' not in line:
+        return [cell.strip() for cell in line.split('|')]
+    cells, current, i = [], [], 0
+    while i < len(line):
+        char = line[i]
+        if char == '\\' and i + 1 < len(line):
+            current.append(line[i:i + 2])
+            i += 2
+            continue
+        if char == '`':
+            run = len(line[i:]) - len(line[i:].lstrip('`'))
+            end = line.find('`' * run, i + run)
+            if end != -1:
+                current.append(line[i:end + run])
+                i = end + run
+                continue
+        if char == '|':
+            cells.append(''.join(current).strip())
+            current = []
+        else:
+            current.append(char)
+        i += 1
+    cells.append(''.join(current).strip())
+    return [cell.replace('\\|', '|') for cell in cells]
+
+
+class _Renderer:
+    """Parses one document; holds its link references and heading identifiers."""
+
+    def __init__(self):
+        self.references: Dict[str, Tuple[str, Optional[str]]] = {}
+        self.identifiers: Set[str] = set()
+        # Inside list items, a list interrupts a paragraph (a sublist needs no blank line)
+        self._list_depth = 0
+        self._nesting = 0
+
+    def render(self, text: str) -> str:
+        lines = text.replace('\r\n', '\n').replace('\r', '\n').expandtabs(4).split('\n')
+        blocks = self.parse_blocks(lines)
+        return self.render_blocks(blocks) + '\n' if blocks else ''
+
+    # Block parsing
+
+    def _starts_block(self, line: str) -> bool:
+        """Whether a line starts a block that interrupts a paragraph."""
+        if _ATX_HEADING.match(line) or _THEMATIC_BREAK.match(line) or _FENCE.match(line):
+            return True
+        if _BLOCKQUOTE.match(line) or _HTML_RAW_BLOCK.match(line) or _HTML_COMMENT_BLOCK.match(line):
+            return True
+        match = _HTML_TAG_BLOCK.match(line)
+        return bool(match and match.group(1).lower() in _HTML_BLOCK_TAGS)
+
+    def parse_blocks(self, lines: List[str]) -> List[_Block]:
+        blocks: List[_Block] = []
+        blank = False
+        i = 0
+        while i < len(lines):
+            line = lines[i]
+            if _is_blank(line):
+                blank = True
+                i += 1
+                continue
+            block, i = self._parse_block(lines, i, blocks)
+            if block is not None:
+                block.blank_before = blank and bool(blocks)
+                blocks.append(block)
+            blank = False
+        return blocks
+
+    def _parse_block(self, lines: List[str], i: int,
+                     previous: List[_Block]) -> Tuple[Optional[_Block], int]:
+        line = lines[i]
+
+        if _indent(line) >= 4:
+            return self._parse_indented_code(lines, i)
+
+        match = _FENCE.match(line)
+        if match:
+            return self._parse_fenced_code(lines, i, match)
+
+        match = _ATX_HEADING.match(line)
+        if match:
+            return self._heading(len(match.group(1)), match.group(2)), i + 1
+
+        if _THEMATIC_BREAK.match(line):
+            return _Block('hr'), i + 1
+
+        if self._nesting >= MAX_NESTING and (_BLOCKQUOTE.match(line) or _LIST_MARKER.match(line)):
+            return self._parse_text(lines, i)
+
+        if _BLOCKQUOTE.match(line):
+            return self._parse_blockquote(lines, i)
+
+        match = _LIST_MARKER.match(line)
+        if match:
+            return self._parse_list(lines, i)
+
+        if _HTML_RAW_BLOCK.match(line) or _HTML_COMMENT_BLOCK.match(line) or _COMPLETE_TAG_LINE.match(line):
+            return self._parse_html(lines, i)
+        match = _HTML_TAG_BLOCK.match(line)
+        if match and match.group(1).lower() in _HTML_BLOCK_TAGS:
+            return self._parse_html(lines, i)
+
+        if ('|' in line and i + 1 < len(lines) and '|' in lines[i + 1]
+                and _TABLE_DELIMITER.match(lines[i + 1])):
+            table = self._parse_table(lines, i)
+            if table[0] is not None:
+                return table
+
+        return self._parse_paragraph(lines, i)
+
+    def _parse_indented_code(self, lines: List[str], i: int) -> Tuple[_Block, int]:
+        code = []
+        while i < len(lines) and (_indent(lines[i]) >= 4 or _is_blank(lines[i])):
+            code.append(lines[i][4:])
+            i += 1
+        while code and _is_blank(code[-1]):
+            code.pop()
+        return _Block('code', '\n'.join(code)), i
+
+    def _parse_fenced_code(self, lines: List[str], i: int, match) -> Tuple[_Block, int]:
+        indent, fence, info = len(match.group(1)), match.group(2), match.group(3)
+        closing = re.compile(r'^ {0,3}' + re.escape(fence[0]) + '{' + str(len(fence)) + r',}[ \t]*$')
+        code = []
+        i += 1
+        while i < len(lines) and not closing.match(lines[i]):
+            line = lines[i]
+            code.append(line[min(indent, _indent(line)):])
+            i += 1
+        language = info.split()[0].lstrip('{.').rstrip('}') if info else ''
+        return _Block('code', '\n'.join(code), language=language), i + 1
+
+    def _heading(self, level: int, text: str) -> _Block:
+        identifier, classes = None, []
+        match = _HEADING_ATTRIBUTES.search(text)
+        if match and all(part[0] in '#.' or '=' in part for part in match.group(1).split()):
+            for part in match.group(1).split():
+                if part.startswith('#'):
+                    identifier = part[1:]
+                elif part.startswith('.'):
+                    classes.append(part[1:])
+            text = text[:match.start()]
+        return _Block('heading', text.strip(), level=level, id=identifier, classes=classes)
+
+    def _parse_blockquote(self, lines: List[str], i: int) -> Tuple[_Block, int]:
+        inner = []
+        while i < len(lines):
+            line = lines[i]
+            match = _BLOCKQUOTE.match(line)
+            if match:
+                inner.append(line[match.end():])
+            elif (inner and not _is_blank(line) and not _is_blank(inner[-1])
+                  and not self._starts_block(line) and not _LIST_MARKER.match(line)):
+                # Lazy continuation of a quoted paragraph
+                inner.append(line)
+            else:
+                break
+            i += 1
+        return _Block('blockquote', children=self._parse_nested(inner)), i
+
+    def _parse_nested(self, lines: List[str]) -> List[_Block]:
+        """Parse the lines of a container one nesting level down."""
+        self._nesting += 1
+        try:
+            return self.parse_blocks(lines)
+        finally:
+            self._nesting -= 1
+
+    def _parse_list(self, lines: List[str], i: int) -> Tuple[_Block, int]:
+        first = _LIST_MARKER.match(lines[i])
+        ordered = first.group(3) is not None
+        kind = _marker_kind(lines[i])
+        items: List[List[_Block]] = []
+        loose = False
+
+        while i < len(lines):
+            match = _LIST_MARKER.match(lines[i])
+            if not match or _THEMATIC_BREAK.match(lines[i]) or _marker_kind(lines[i]) != kind:
+                break
+            line = lines[i]
+            rest = line[match.end():]
+            spaces = _indent(rest)
+            if _is_blank(rest):
+                content_indent = match.end() + 1
+            elif spaces > 4:
+                content_indent = match.end() + 1
+            else:
+                content_indent = match.end() + spaces
+            item_lines = ['' if _is_blank(rest) else line[content_indent:]]
+            i += 1
+            while i < len(lines):
+                line = lines[i]
+                if _is_blank(line):
+                    item_lines.append('')
+                elif _indent(line) >= content_indent:
+                    item_lines.append(line[content_indent:])
+                elif (item_lines and not _is_blank(item_lines[-1]) and not self._starts_block(line)
+                      and not _LIST_MARKER.match(line) and not _FENCE.match(item_lines[-1])):
+                    # Lazy continuation of the item's paragraph
+                    item_lines.append(line.lstrip())
+                else:
+                    break
+                i += 1
+            trailing_blank = bool(item_lines) and _is_blank(item_lines[-1])
+            while item_lines and _is_blank(item_lines[-1]):
+                item_lines.pop()
+            self._list_depth += 1
+            children = self._parse_nested(item_lines)
+            self._list_depth -= 1
+            if any(child.blank_before for child in children):
+                loose = True
+            items.append(children)
+            if trailing_blank:
+                if i < len(lines) and _marker_kind(lines[i]) == kind:
+                    loose = True
+                else:
+                    break
+
+        start = int(first.group(3)) if ordered else None
+        return _Block('list', children=items, ordered=ordered, start=start, loose=loose), i
+
+    def _parse_html(self, lines: List[str], i: int) -> Tuple[_Block, int]:
+        line = lines[i]
+        raw = _HTML_RAW_BLOCK.match(line)
+        if raw or _HTML_COMMENT_BLOCK.match(line):
+            end = re.compile(r'</' + raw.group(1) + r'>', re.IGNORECASE) if raw else re.compile('-->')
+            html = []
+            while i < len(lines):
+                html.append(lines[i])
+                i += 1
+                if end.search(html[-1]) and (len(html) > 1 or end.search(line[4:])):
+                    break
+            return _Block('html', '\n'.join(html)), i
+        html = []
+        while i < len(lines) and not _is_blank(lines[i]):
+            html.append(lines[i])
+            i += 1
+        return _Block('html', '\n'.join(html)), i
+
+    def _parse_table(self, lines: List[str], i: int) -> Tuple[Optional[_Block], int]:
+        header = _split_row(lines[i])
+        delimiters = _split_row(lines[i + 1])
+        if len(header) != len(delimiters):
+            return None, i
+        # Like pandoc, tables with a line wider than 72 columns get relative column widths
+        widths = None
+        if any(len(line) > 72 for line in lines[i:i + 2]):
+            total = sum(len(cell) for cell in delimiters)
+            widths = [len(cell) / total for cell in delimiters]
+        aligns = []
+        for cell in delimiters:
+            left, right = cell.startswith(':'), cell.endswith(':')
+            aligns.append('center' if left and right else 'left' if left else 'right' if right else None)
+        rows = []
+        i += 2
+        while i < len(lines) and not _is_blank(lines[i]) and '|' in lines[i]:
+            if widths is None and len(lines[i]) > 72:
+                total = sum(len(cell) for cell in delimiters)
+                widths = [len(cell) / total for cell in delimiters]
+            cells = _split_row(lines[i])
+            rows.append((cells + [''] * len(header))[:len(header)])
+            i += 1
+        return _Block('table', children=[header] + rows, aligns=aligns, widths=widths), i
+
+    def _parse_text(self, lines: List[str], i: int) -> Tuple[_Block, int]:
+        """The lines up to the next blank line as one paragraph, whatever blocks they start."""
+        start = i
+        while i < len(lines) and not _is_blank(lines[i]):
+            i += 1
+        return _Block('paragraph', '\n'.join(line.strip() for line in lines[start:i])), i
+
+    def _parse_paragraph(self, lines: List[str], i: int) -> Tuple[Optional[_Block], int]:
+        text = [lines[i]]
+        i += 1
+        while i < len(lines):
+            line = lines[i]
+            underline = _SETEXT_UNDERLINE.match(line)
+            if underline:
+                level = 1 if underline.group(1)[0] == '=' else 2
+                return self._heading(level, '\n'.join(part.strip() for part in text)), i + 1
+            if _is_blank(line) or self._starts_block(line):
+                break
+            if self._list_depth and _LIST_MARKER.match(line):
+                break
+            text.append(line)
+            i += 1
+
+        # Link reference definitions at the start of a paragraph
+        while text:
+            match = _REFERENCE.match(text[0])
+            if not match:
+                break
+            label = _normalize_label(match.group(1))
+            title = match.group(3) or match.group(4) or match.group(5)
+            self.references.setdefault(label, (match.group(2), title))
+            text.pop(0)
+        if not text:
+            return None, i
+        return _Block('paragraph', '\n'.join(line.lstrip() for line in text).rstrip()), i
+
+    # Rendering
+
+    def render_blocks(self, blocks: List[_Block], tight: bool = False) -> str:
+        return '\n'.join(self.render_block(block, tight) for block in blocks)
+
+    def render_block(self, block: _Block, tight: bool = False) -> str:
+        kind = block.kind
+        if kind == 'paragraph':
+            figure = self._figure(block.text)
+            if figure is not None:
+                return figure
+            inline = self.inline(block.text)
+            return inline if tight else f'<p>{inline}</p>'
+        if kind == 'heading':
+            level = block.attrs['level']
+            inline = self.inline(block.text)
+            identifier = self._identifier(block.attrs['id'] or _identifier_for(inline))
+            classes = block.attrs['classes']
+            class_attr = f' class="{escape(" ".join(classes))}"' if classes else ''
+            return f'<h{level}{class_attr} id="{escape(identifier)}">{inline}</h{level}>'
+        if kind == 'code':
+            language = block.attrs.get('language')
+            class_attr = f' class="{escape(language)}"' if language else ''
+            code = escape(block.text, quote=False).replace('"', '&quot;').replace("'", '&#39;')
+            return f'<pre{class_attr}><code>{code}</code></pre>'
+        if kind == 'hr':
+            return '<hr />'
+        if kind == 'html':
+            return block.text
+        if kind == 'blockquote':
+            inner = self.render_blocks(block.children)
+            return f'<blockquote>\n{inner}\n</blockquote>' if inner else '<blockquote>\n</blockquote>'
+        if kind == 'list':
+            return self._render_list(block)
+        if kind == 'table':
+            return self._render_table(block)
+        raise ValueError(f"Unknown block kind: {kind}")
+
+    def _render_list(self, block: _Block) -> str:
+        if block.attrs['ordered']:
+            start = block.attrs['start']
+            tag = 'ol'
+            opening = f'<ol start="{start}" type="1">' if start != 1 else '<ol type="1">'
+        else:
+            tag, opening = 'ul', '<ul>'
+        tight = not block.attrs['loose']
+        items = [f'<li>{self.render_blocks(item, tight)}</li>' for item in block.children]
+        return '\n'.join([opening] + items + [f'</{tag}>'])
+
+    def _render_table(self, block: _Block) -> str:
+        aligns = block.attrs['aligns']
+
+        def cell(tag: str, text: str, align: Optional[str]) -> str:
+            style = f' style="text-align: {align};"' if align else ''
+            return f'<{tag}{style}>{self.inline(text)}</{tag}>'
+
+        header, rows = block.children[0], block.children[1:]
+        parts = ['<table>']
+        if block.attrs['widths']:
+            parts.append('<colgroup>')
+            parts += [f'<col style="width: {int(width * 100)}%" />' for width in block.attrs['widths']]
+            parts.append('</colgroup>')
+        parts += ['<thead>', '<tr>']
+        parts += [cell('th', text, align) for text, align in zip(header, aligns)]
+        parts += ['</tr>', '</thead>']
+        if rows:
+            parts.append('<tbody>')
+            for row in rows:
+                parts.append('<tr>')
+                parts += [cell('td', text, align) for text, align in zip(row, aligns)]
+                parts.append('</tr>')
+            parts.append('</tbody>')
+        parts.append('</table>')
+        return '\n'.join(parts)
+
+    def _figure(self, text: str) -> Optional[str]:
+        """Pandoc renders a paragraph holding only a captioned image as a figure."""
+        if not text.startswith('![') or '\n' in text:
+            return None
+        inline = self.inline(text)
+        match = re.fullmatch(r'<img src="[^"]*"(?: title="[^"]*")? alt="([^"]+)" />', inline)
+        if not match:
+            return None
+        caption = self.inline(text[2:text.index('](')]) if '](' in text else escape(match.group(1))
+        return f'<figure>\n{inline}\n<figcaption aria-hidden="true">{caption}</figcaption>\n</figure>'
+
+    def _identifier(self, base: str) -> str:
+        """Make a heading identifier unique within the document, like pandoc."""
+        identifier, n = base, 0
+        while identifier in self.identifiers:
+            n += 1
+            identifier = f"{base}-{n}"
+        self.identifiers.add(identifier)
+        return identifier
+
+    # Inline parsing
+
+    def inline(self, text: str) -> str:
+        return _InlineParser(self, text).parse()
+
+
+def _identifier_for(inline_html: str) -> str:
+    """Pandoc's auto identifier: lowercase words of the plain text, joined with hyphens."""
+    plain = unescape(_TAG.sub('', inline_html)).lower()
+    kept = ''.join(char for char in plain if char.isalnum() or char in '_-. \n')
+    identifier = '-'.join(kept.split())
+    while identifier and not identifier[0].isalpha():
+        identifier = identifier[1:]
+    return identifier or 'section'
+
+
+class _Delimiter:
+    """A run of emphasis characters that may open or close emphasis."""
+
+    __slots__ = ('char', 'count', 'original', 'can_open', 'can_close', 'active')
+
+    def __init__(self, char: str, count: int, can_open: bool, can_close: bool):
+        self.char = char
+        self.count = count
+        self.original = count
+        self.can_open = can_open
+        self.can_close = can_close
+        self.active = True
+
+    def __str__(self) -> str:
+        return self.char * self.count
+
+
+class _Bracket:
+    """An opening ``[`` or ``![`` that may start a link or image."""
+
+    __slots__ = ('image', 'active', 'position')
+
+    def __init__(self, image: bool, position: int):
+        self.image = image
+        self.active = True
+        self.position = position
+
+    def __str__(self) -> str:
+        return '![' if self.image else '['
+
+
+_TAGS = {('*', 1): 'em', ('_', 1): 'em', ('*', 2): 'strong', ('_', 2): 'strong',
+         ('~', 2): 'del', ('~', 1): 'sub', ('^', 1): 'sup'}
+
+
+def _process_emphasis(tokens: list) -> str:
+    """Match delimiter runs into emphasis tags and return the HTML of the tokens."""
+    i = 0
+    while i < len(tokens):
+        closer = tokens[i]
+        if not (isinstance(closer, _Delimiter) and closer.can_close and closer.active
+                and closer.count):
+            i += 1
+            continue
+        j = i - 1
+        while j >= 0:
+            opener = tokens[j]
+            if (isinstance(opener, _Delimiter) and opener.char == closer.char and opener.can_open
+                    and opener.active and opener.count):
+                if closer.char in '~^':
+                    if opener.count == closer.count:
+                        break
+                elif not ((opener.can_close or closer.can_open)
+                          and (opener.original + closer.original) % 3 == 0
+                          and not (opener.original % 3 == 0 and closer.original % 3 == 0)):
+                    break
+            j -= 1
+        if j < 0:
+            i += 1
+            continue
+        if closer.char in '~^':
+            use = closer.count
+        else:
+            # Pandoc nests ***text*** as <strong><em>: the inner match takes one character
+            both = min(opener.count, closer.count)
+            use = 1 if both >= 3 or both == 1 else 2
+        tag = _TAGS[(closer.char, use)]
+        opener.count -= use
+        closer.count -= use
+        for token in tokens[j + 1:i]:
+            if isinstance(token, _Delimiter):
+                token.active = False
+        tokens.insert(j + 1, f'<{tag}>')
+        tokens.insert(i + 1, f'</{tag}>')
+        i += 2
+    return ''.join(str(token) for token in tokens)
+
+
+class _InlineParser:
+    """Single left-to-right scan of one block's text into HTML."""
+
+    def __init__(self, renderer: _Renderer, text: str):
+        self.renderer = renderer
+        self.text = text
+        self.pos = 0
+        self.tokens: list = []
+        self.brackets: List[int] = []
+        self.buffer: List[str] = []
+
+    def _flush(self) -> None:
+        if self.buffer:
+            self.tokens.append(''.join(self.buffer))
+            self.buffer = []
+
+    def _emit(self, token) -> None:
+        self._flush()
+        self.tokens.append(token)
+
+    def parse(self) -> str:
+        text = self.text
+        handlers = {
+            '\\': self._backslash, '`': self._code_span, '<': self._angle, '&': self._entity,
+            '[': self._open_bracket, '!': self._bang, ']': self._close_bracket, '\n': self._newline,
+            '*': self._delimiter, '_': self._delimiter, '~': self._delimiter, '^': self._delimiter,
+            '"': self._double_quote, "'": self._single_quote, '-': self._dash, '.': self._ellipsis,
+            '>': self._escaped,
+        }
+        while self.pos < len(text):
+            # Copy plain text up to the next character that may start markup
+            match = _SPECIAL.search(text, self.pos)
+            if match is None:
+                self.buffer.append(text[self.pos:])
+                break
+            if match.start() > self.pos:
+                self.buffer.append(text[self.pos:match.start()])
+                self.pos = match.start()
+            char = text[self.pos]
+            if not handlers[char]():
+                self.buffer.append(char)
+                self.pos += 1
+        self._flush()
+        return _process_emphasis(self.tokens)
+
+    def _prev(self) -> str:
+        return self.text[self.pos - 1] if self.pos > 0 else ' '
+
+    def _escaped(self) -> bool:
+        char = self.text[self.pos]
+        self.buffer.append('&gt;' if char == '>' else char)
+        self.pos += 1
+        return True
+
+    def _backslash(self) -> bool:
+        following = self.text[self.pos + 1:self.pos + 2]
+        if following == '\n':
+            self._emit('<br />\n')
+            self.pos += 2
+            return True
+        if following in _ESCAPABLE and following:
+            self.buffer.append(escape(following, quote=False))
+            self.pos += 2
+            return True
+        return False
+
+    def _code_span(self) -> bool:
+        text = self.text
+        run = len(text[self.pos:]) - len(text[self.pos:].lstrip('`'))
+        fence = '`' * run
+        search = self.pos + run
+        while True:
+            end = text.find(fence, search)
+            if end == -1:
+                self.buffer.append(fence)
+                self.pos += run
+                return True
+            if text[end + run:end + run + 1] != '`':
+                break
+            search = end + run + len(text[end + run:]) - len(text[end + run:].lstrip('`'))
+        code = text[self.pos + run:end].replace('\n', ' ')
+        if code.startswith(' ') and code.endswith(' ') and code.strip():
+            code = code[1:-1]
+        self._emit(f'<code>{escape(code, quote=False)}</code>')
+        self.pos = end + run
+        return True
+
+    def _angle(self) -> bool:
+        rest = self.text[self.pos:]
+        match = _AUTOLINK.match(rest)
+        if match:
+            url = match.group(1)
+            self._emit(f'<a href="{escape(url)}" class="uri">{escape(url, quote=False)}</a>')
+            self.pos += match.end()
+            return True
+        match = _EMAIL_AUTOLINK.match(rest)
+        if match:
+            email = match.group(1)
+            self._emit(f'<a href="mailto:{escape(email)}" class="email">{escape(email, quote=False)}</a>')
+            self.pos += match.end()
+            return True
+        match = _INLINE_HTML.match(rest)
+        if match:
+            self._emit(match.group(0))
+            self.pos += match.end()
+            return True
+        self.buffer.append('&lt;')
+        self.pos += 1
+        return True
+
+    def _entity(self) -> bool:
+        match = _ENTITY.match(self.text, self.pos)
+        if match and unescape(match.group(0)) != match.group(0):
+            self.buffer.append(escape(unescape(match.group(0)), quote=False))
+            self.pos = match.end()
+        else:
+            self.buffer.append('&amp;')
+            self.pos += 1
+        return True
+
+    def _newline(self) -> bool:
+        # Two trailing spaces make a hard break; other line breaks become spaces (--wrap=none)
+        hard = self.text[self.pos - 2:self.pos] == '  '
+        while self.buffer and not self.buffer[-1].rstrip(' '):
+            self.buffer.pop()
+        if self.buffer:
+            self.buffer[-1] = self.buffer[-1].rstrip(' ')
+        self._emit('<br />\n' if hard else ' ')
+        self.pos += 1
+        while self.pos < len(self.text) and self.text[self.pos] == ' ':
+            self.pos += 1
+        return True
+
+    def _delimiter(self) -> bool:
+        text = self.text
+        char = text[self.pos]
+        end = self.pos
+        while end < len(text) and text[end] == char:
+            end += 1
+        count = end - self.pos
+        before = self._prev()
+        after = text[end] if end < len(text) else ' '
+        if char in '~^':
+            if count > (2 if char == '~' else 1):
+                return False
+            # Pandoc's strikeout, sub- and superscript: no spaces inside
+            delimiter = _Delimiter(char, count, not after.isspace(), not before.isspace())
+        else:
+            left = not after.isspace() and (after not in _PUNCTUATION or before.isspace()
+                                            or before in _PUNCTUATION)
+            right = not before.isspace() and (before not in _PUNCTUATION or after.isspace()
+                                              or after in _PUNCTUATION)
+            if char == '*':
+                delimiter = _Delimiter(char, count, left, right)
+            else:
+                delimiter = _Delimiter(char, count, left and (not right or before in _PUNCTUATION),
+                                       right and (not left or after in _PUNCTUATION))
+        self._emit(delimiter)
+        self.pos = end
+        return True
+
+    def _double_quote(self) -> bool:
+        before = self._prev()
+        after = self.text[self.pos + 1:self.pos + 2] or ' '
+        opening = (before.isspace() or before in '([{-\u2014\u2013') and not after.isspace()
+        self.buffer.append('\u201c' if opening else '\u201d')
+        self.pos += 1
+        return True
+
+    def _single_quote(self) -> bool:
+        before = self._prev()
+        after = self.text[self.pos + 1:self.pos + 2] or ' '
+        opening = (before.isspace() or before in '([{-\u2014\u2013"\u201c') and not after.isspace()
+        self.buffer.append('\u2018' if opening else '\u2019')
+        self.pos += 1
+        return True
+
+    def _dash(self) -> bool:
+        if self.text.startswith('---', self.pos):
+            self.buffer.append('\u2014')
+            self.pos += 3
+            return True
+        if self.text.startswith('--', self.pos):
+            self.buffer.append('\u2013')
+            self.pos += 2
+            return True
+        return False
+
+    def _ellipsis(self) -> bool:
+        if self.text.startswith('...', self.pos):
+            self.buffer.append('\u2026')
+            self.pos += 3
+            return True
+        return False
+
+    def _bang(self) -> bool:
+        if self.text.startswith('![', self.pos):
+            self._flush()
+            self.brackets.append(len(self.tokens))
+            self.tokens.append(_Bracket(True, self.pos))
+            self.pos += 2
+            return True
+        return False
+
+    def _open_bracket(self) -> bool:
+        self._flush()
+        self.brackets.append(len(self.tokens))
+        self.tokens.append(_Bracket(False, self.pos))
+        self.pos += 1
+        return True
+
+    def _close_bracket(self) -> bool:
+        if not self.brackets:
+            return False
+        self._flush()
+        index = self.brackets.pop()
+        bracket = self.tokens[index]
+        if not bracket.active:
+            self.buffer.append(']')
+            self.pos += 1
+            return True
+
+        label_text = self.text[bracket.position + (2 if bracket.image else 1):self.pos]
+        target, end = self._link_target(self.pos + 1, label_text)
+        if target is None:
+            self.buffer.append(']')
+            self.pos += 1
+            return True
+
+        url, title = target
+        inner = _process_emphasis(self.tokens[index + 1:])
+        del self.tokens[index:]
+        title_attr = f' title="{escape(title)}"' if title else ''
+        if bracket.image:
+            alt = escape(unescape(_TAG.sub('', inner)))
+            self.tokens.append(f'<img src="{escape(url)}"{title_attr} alt="{alt}" />')
+        else:
+            self.tokens.append(f'<a href="{escape(url)}"{title_attr}>{inner}</a>')
+            # No links inside links
+            for earlier in self.brackets:
+                if not self.tokens[earlier].image:
+                    self.tokens[earlier].active = False
+        self.pos = end
+        return True
+
+    def _link_target(self, pos: int, label_text: str) -> Tuple[Optional[Tuple[str, Optional[str]]], int]:
+        """Parse ``(url "title")``, ``[ref]``, ``[]`` or nothing after a ``]``."""
+        text = self.text
+        if text.startswith('(', pos):
+            match = re.compile(
+                r'\(\s*(?:<([^<>\n]*)>|((?:[^\s()\\]|\\.|\((?:[^\s()\\]|\\.)*\))*))'
+                r'(?:\s+(?:"((?:[^"\\]|\\.)*)"|\'((?:[^\'\\]|\\.)*)\'|\(((?:[^()\\]|\\.)*)\)))?\s*\)',
+                re.DOTALL).match(text, pos)
+            if match:
+                url = match.group(1) if match.group(1) is not None else match.group(2)
+                title = next((group for group in match.group(3, 4, 5) if group is not None), None)
+                return (_unescape_text(url), _unescape_text(title) if title is not None else None), \
+                    match.end()
+        references = self.renderer.references
+        if text.startswith('[', pos):
+            close = text.find(']', pos + 1)
+            if close != -1:
+                label = text[pos + 1:close] or label_text
+                reference = references.get(_normalize_label(label))
+                if reference is not None:
+                    return reference, close + 1
+        reference = references.get(_normalize_label(label_text))
+        if reference is not None:
+            return reference, pos
+        return None, pos
+
+
+def _unescape_text(text: str) -> str:
+    """Resolve backslash escapes and entities in link destinations and titles."""
+    return unescape(re.sub(r'\\([!-/:-@\[-`{-~])', r'\1', text))
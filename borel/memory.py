@@ -0,0 +1,147 @@
+"""
+Memory-bounded rendering (``borel --max-memory``).
+
+WeasyPrint keeps a document's whole box tree and every laid-out page in
+memory until the PDF is written, so peak memory grows with document size.
+While a renderer has a memory budget, a ``MemoryMonitor`` samples the
+process RSS during each render, and traces Python allocations during layout:
+once earlier renders have raised RSS to its high-water mark, later layouts
+reuse the freed memory and barely grow it. A ``MemoryBudget`` estimates each
+document's peak before layout, from the HTML size and the peaks seen so
+far. Documents that would exceed the budget are laid out one ``[CRLF]``
+section at a time instead.
+"""
+
+import os
+import sys
+import threading
+import tracemalloc
+from typing import Optional
+
+# Memory growth per byte of document HTML assumed before any render was measured
+DEFAULT_BYTES_PER_HTML_BYTE = 600
+# Weight of the newest measurement in the running estimate of growth per HTML byte
+SMOOTHING = 0.3
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes.
+
+    Falls back to the peak RSS where the current one cannot be read.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return peak_rss()
+
+
+def peak_rss() -> int:
+    """Peak resident set size of this process so far, in bytes."""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class MemoryMonitor:
+    """Sample the process RSS in a background thread while the ``with`` block runs.
+
+    ``start`` is the RSS on entry and ``peak`` the highest sample. ``begin()``
+    opens a window, e.g. around layout, whose memory growth ``growth()``
+    reports. Python allocations are traced with ``tracemalloc`` in the window.
+    """
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.start = 0
+        self.peak = 0
+        self._window_start = self._window_peak = 0
+        self._traced_start = 0
+        self._started_tracing = False
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __enter__(self) -> "MemoryMonitor":
+        self.start = self.peak = self._window_start = self._window_peak = current_rss()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, name='borel-memory', daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+
+    def sample(self) -> int:
+        """Take a sample now and return it."""
+        rss = current_rss()
+        self.peak = max(self.peak, rss)
+        self._window_peak = max(self._window_peak, rss)
+        return rss
+
+    def begin(self) -> int:
+        """Start a measurement window and return the RSS now."""
+        self._started_tracing = not tracemalloc.is_tracing()
+        if self._started_tracing:
+            tracemalloc.start()
+        elif hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        self._traced_start = tracemalloc.get_traced_memory()[0]
+        self._window_start = self._window_peak = self.sample()
+        return self._window_start
+
+    def growth(self) -> int:
+        """Peak memory growth since ``begin()``, and end the window.
+
+        The larger of the traced Python allocations' peak and the RSS growth;
+        the latter also counts C allocations (Pango, cairo) when RSS grows.
+        """
+        self.sample()
+        traced_peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return max(traced_peak - self._traced_start, self._window_peak - self._window_start)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+
+class MemoryBudget:
+    """Decide which documents to lay out in sections to stay within ``limit`` bytes of RSS.
+
+    Layout memory is estimated as the document's HTML size times the memory
+    growth per HTML byte seen in this process's renders, smoothed with an
+    exponential moving average.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.bytes_per_html_byte: Optional[float] = None
+        self.observations = 0
+
+    def estimate(self, html_size: int, rss: Optional[int] = None) -> int:
+        """Estimated peak RSS of laying out ``html_size`` bytes of HTML in one piece."""
+        factor = self.bytes_per_html_byte or DEFAULT_BYTES_PER_HTML_BYTE
+        return (current_rss() if rss is None else rss) + int(html_size * factor)
+
+    def fits(self, html_size: int, rss: Optional[int] = None) -> bool:
+        return self.estimate(html_size, rss) <= self.limit
+
+    def observe(self, html_size: int, growth: int) -> None:
+        """Learn from a measured layout: ``growth`` bytes of memory for ``html_size`` bytes of HTML."""
+        if html_size <= 0 or growth <= 0:
+            return
+        factor = growth / html_size
+        self.observations += 1
+        if self.observations <= 2:
+            # The first layout also grows RSS by one-off warm-up (fonts, caches), which
+            # would skew a small first document's factor; it stands in until the next one
+            self.bytes_per_html_byte = factor
+        else:
+            self.bytes_per_html_byte += SMOOTHING * (factor - self.bytes_per_html_byte)
@@ -0,0 +1,111 @@
+"""
+Output formats written from a single render: the PDF, a self-contained HTML
+copy and PNG previews of selected pages, plus first-page thumbnails.
+"""
+
+import re
+from pathlib import Path
+from typing import List, Optional, Set, Union
+
+from .backends import import_pypdfium2
+from .logo import image_to_data_uri
+from .pdf_generator import IMG_SRC, local_file
+
+
+OUTPUT_FORMATS = ('pdf', 'html', 'png')
+PREVIEW_DPI = 96
+# Thumbnails show the first page, or just the title page laid out on its own
+THUMBNAIL_SOURCES = ('first', 'title')
+THUMBNAIL_WIDTH = 240
+
+_PAGE_RANGE = re.compile(r'^(\d+)(?:-(\d+))?$')
+
+
+def parse_pages(spec: str) -> Optional[Set[int]]:
+    """Parse a page selection such as ``1,3-5`` (1-based); ``all`` selects every page (None)."""
+    if spec.strip().lower() == 'all':
+        return None
+    pages: Set[int] = set()
+    for part in spec.split(','):
+        match = _PAGE_RANGE.match(part.strip())
+        if not match or int(match.group(1)) < 1:
+            raise ValueError(f"Invalid page selection: {spec!r} (expected e.g. '1,3-5' or 'all')")
+        first = int(match.group(1))
+        last = int(match.group(2) or first)
+        if last < first:
+            raise ValueError(f"Invalid page range: {part.strip()!r} (ranges run from low to high, e.g. '1-3')")
+        pages.update(range(first, last + 1))
+    return pages
+
+
+def self_contained_html(html_content: str, base_url: str) -> str:
+    """Embed local images as data URIs, so the HTML shows correctly wherever it is copied."""
+    def inline(match):
+        path = local_file(match.group(2), base_url)
+        if path is None:
+            return match.group(0)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return match.group(0)
+        return match.group(1) + image_to_data_uri(data, Path(path).suffix) + match.group(3)
+
+    return IMG_SRC.sub(inline, html_content)
+
+
+def preview_path(output_path: Path, page: int) -> Path:
+    """Path of the PNG preview of a page, next to the PDF: ``notes-1.png``."""
+    return output_path.with_name(f"{output_path.stem}-{page}.png")
+
+
+def thumbnail_path(output_path: Path) -> Path:
+    """Path of a document's thumbnail: ``notes.thumb.png``, or ``output_path`` itself if a PNG."""
+    if output_path.suffix.lower() == '.png':
+        return output_path
+    return output_path.with_suffix('.thumb.png')
+
+
+def _open_pdf(pdf: Union[bytes, str], purpose: str):
+    pdfium = import_pypdfium2()
+    if pdfium is None:
+        raise ImportError(f"pypdfium2 is required for {purpose}. Install with: pip install pypdfium2")
+    return pdfium.PdfDocument(pdf)
+
+
+def write_thumbnail(pdf: Union[bytes, str], path: Path, width: int = THUMBNAIL_WIDTH) -> Path:
+    """Rasterize the first page of a PDF to a PNG ``width`` pixels wide."""
+    document = _open_pdf(pdf, 'thumbnails')
+    try:
+        page = document[0]
+        try:
+            page.render(scale=width / page.get_width()).to_pil().save(path)
+        finally:
+            page.close()
+    finally:
+        document.close()
+    return path
+
+
+def write_previews(pdf: Union[bytes, str], output_path: Path, pages: Optional[Set[int]] = None,
+                   dpi: int = PREVIEW_DPI) -> List[Path]:
+    """Rasterize the selected pages (all when None) of a rendered PDF to PNG files.
+
+    Only the selected pages are rasterized. ``pdf`` is the PDF's bytes or path.
+    """
+    document = _open_pdf(pdf, 'PNG previews')
+    paths = []
+    try:
+        for number in range(1, len(document) + 1):
+            if pages is not None and number not in pages:
+                continue
+            page = document[number - 1]
+            try:
+                path = preview_path(output_path, number)
+                page.render(scale=dpi / 72).to_pil().save(path)
+                paths.append(path)
+            finally:
+                page.close()
+    finally:
+        document.close()
+    return paths
@@ -0,0 +1,234 @@
+"""
+Persistent pandoc backend using pandoc's built-in HTTP server mode.
+
+Starting pandoc for every document costs a fork/exec plus the Haskell runtime
+startup. ``pandoc server`` keeps one process alive and accepts conversions as
+JSON over HTTP, so each conversion is a single request on a reused local
+connection.
+"""
+
+import atexit
+import base64
+import http.client
+import json
+import os
+import queue
+import socket
+import subprocess
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import click
+
+
+class PandocServerError(Exception):
+    """Raised when a pandoc server cannot be started or a conversion fails."""
+
+
+def find_pandoc() -> Optional[str]:
+    """Locate the pandoc binary pypandoc would use, from the cached backend probe."""
+    from .backends import probe_backends
+    return probe_backends()['pandoc_path']
+
+
+def _free_port() -> int:
+    """Ask the OS for an unused localhost port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class PandocServer:
+    """A single ``pandoc server`` process with a persistent HTTP connection."""
+
+    def __init__(self, pandoc_path: str, timeout: int = 60, startup_timeout: float = 10.0):
+        self.pandoc_path = pandoc_path
+        self.timeout = timeout
+        self.startup_timeout = startup_timeout
+        self.port: Optional[int] = None
+        self.process: Optional[subprocess.Popen] = None
+        self.restarts = 0
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def start(self) -> None:
+        """Start the server and wait until it answers health checks."""
+        self.stop()
+        self.port = _free_port()
+        try:
+            self.process = subprocess.Popen(
+                [self.pandoc_path, 'server', '--port', str(self.port),
+                 '--timeout', str(self.timeout)],
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        except OSError as e:
+            raise PandocServerError(f"Could not start pandoc server: {e}")
+
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise PandocServerError(
+                    f"pandoc server exited with code {self.process.returncode}; "
+                    "server mode is probably not supported by this pandoc build"
+                )
+            if self.is_healthy():
+                return
+            time.sleep(0.05)
+
+        self.stop()
+        raise PandocServerError("pandoc server did not become ready in time")
+
+    def stop(self) -> None:
+        """Close the connection and terminate the server process."""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+        if self.process is not None:
+            if self.process.poll() is None:
+                self.process.terminate()
+                try:
+                    self.process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self.process.kill()
+                    self.process.wait()
+            self.process = None
+
+    def is_running(self) -> bool:
+        """Check whether the server process is still alive."""
+        return self.process is not None and self.process.poll() is None
+
+    def is_healthy(self) -> bool:
+        """Health check: the server is alive and answers ``GET /version``."""
+        if not self.is_running():
+            return False
+        try:
+            status, _ = self._request('GET', '/version')
+            return status == 200
+        except (OSError, http.client.HTTPException):
+            self._reset_connection()
+            return False
+
+    def convert(self, text: str, options: Dict[str, Any]) -> str:
+        """Convert ``text`` with the given pandoc server options.
+
+        A dead server is restarted once before giving up.
+        """
+        body = dict(options, text=text)
+        for attempt in range(2):
+            if not self.is_running():
+                self.restarts += 1
+                self.start()
+            try:
+                status, data = self._request('POST', '/', json.dumps(body))
+            except (OSError, http.client.HTTPException) as e:
+                self._reset_connection()
+                if attempt == 0 and not self.is_healthy():
+                    # The server crashed mid-request: restart it and retry once
+                    self.restarts += 1
+                    self.start()
+                    continue
+                raise PandocServerError(f"pandoc server request failed: {e}")
+
+            try:
+                result = json.loads(data)
+            except ValueError:
+                # Errors are reported as plain text
+                result = {'error': data.strip() or status}
+            if status != 200 or result.get('error'):
+                raise PandocServerError(
+                    f"pandoc server conversion failed: {result.get('error', status)}")
+            output = result['output']
+            if result.get('base64'):
+                output = base64.b64decode(output).decode('utf-8')
+            return output
+
+        raise PandocServerError("pandoc server crashed and could not be restarted")
+
+    def _request(self, method: str, path: str, body: Optional[str] = None):
+        """Send a request over the persistent connection, returning (status, body)."""
+        if self._connection is None:
+            self._connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=self.timeout)
+        headers = {'Accept': 'application/json'}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        self._connection.request(method, path, body=body.encode('utf-8') if body else None,
+                                 headers=headers)
+        response = self._connection.getresponse()
+        return response.status, response.read().decode('utf-8')
+
+    def _reset_connection(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class PandocServerPool:
+    """A small, thread-safe pool of pandoc servers."""
+
+    def __init__(self, size: int = 1, pandoc_path: Optional[str] = None):
+        pandoc_path = pandoc_path or find_pandoc()
+        if not pandoc_path:
+            raise PandocServerError("pandoc binary not found")
+
+        self.servers: List[PandocServer] = []
+        self._idle: "queue.Queue[PandocServer]" = queue.Queue()
+        try:
+            for _ in range(max(1, size)):
+                server = PandocServer(pandoc_path)
+                server.start()
+                self.servers.append(server)
+                self._idle.put(server)
+        except PandocServerError:
+            self.close()
+            raise
+
+    def convert(self, text: str, from_format: str = 'markdown', to_format: str = 'html',
+                standalone: bool = True, wrap: str = 'none') -> str:
+        """Convert text on the next idle server."""
+        options = {
+            'from': from_format,
+            'to': to_format,
+            'standalone': standalone,
+            'wrap': wrap,
+        }
+        server = self._idle.get()
+        try:
+            return server.convert(text, options)
+        finally:
+            self._idle.put(server)
+
+    def close(self) -> None:
+        """Stop every server in the pool."""
+        for server in self.servers:
+            server.stop()
+        self.servers = []
+
+
+_pool: Optional[PandocServerPool] = None
+_pool_pid: Optional[int] = None
+_pool_error: Optional[str] = None
+_pool_lock = threading.Lock()
+
+
+def get_server_pool(size: int = 1) -> Optional[PandocServerPool]:
+    """Return the process-wide pandoc server pool, starting it on first use.
+
+    Returns None when server mode is unavailable; the failure is remembered so
+    it is only probed once per process.
+    """
+    global _pool, _pool_pid, _pool_error
+    with _pool_lock:
+        # A forked child must not share its parent's connections
+        if _pool is not None and _pool_pid != os.getpid():
+            _pool = None
+        if _pool is None and _pool_error is None:
+            try:
+                _pool = PandocServerPool(size)
+                _pool_pid = os.getpid()
+                atexit.register(_pool.close)
+            except PandocServerError as e:
+                _pool_error = str(e)
+                click.echo(f"Warning: pandoc server unavailable, using pandoc subprocess: {e}", err=True)
+        return _pool
@@ -2,84 +2,217 @@
 PDF generation from HTML content using WeasyPrint.
 """
 
+import hashlib
 import os
-import tempfile
+import re
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
-import base64
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, List, Optional, Union
+from urllib.parse import unquote, urljoin, urlparse
 
-try:
-    from weasyprint import HTML, CSS
-    WEASYPRINT_AVAILABLE = True
-except ImportError:
-    WEASYPRINT_AVAILABLE = False
+from .backends import import_weasyprint, probe_backends
+from .fetcher import URLFetcher, resource_urls
+from .fonts import get_font_config
+from .logo import image_to_data_uri
+from .profiling import StageProfiler, stage
+from .stylesheets import get_stylesheet_manager
+
+if TYPE_CHECKING:
+    # WeasyPrint is imported lazily, when a PDF is rendered
+    from weasyprint import CSS, HTML, Document
+    from weasyprint.text.fonts import FontConfiguration
+
+
+# Applied by --optimize unless a JPEG quality or DPI cap is set explicitly
+OPTIMIZE_JPEG_QUALITY = 85
+OPTIMIZE_DPI = 300
+
+# Decoded images kept between documents; a cache is emptied beyond this many entries
+IMAGE_CACHE_SIZE = 512
+
+IMG_SRC = re.compile(r'(<img\b[^>]*?\bsrc=")([^"]+)(")', re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class PDFOptions:
+    """WeasyPrint output options that trade render time for PDF size."""
+    
+    # Recompress images and share identical image files
+    optimize_images: bool = False
+    jpeg_quality: Optional[int] = None
+    # Downsample images above this resolution
+    dpi: Optional[int] = None
+    # Embed whole fonts instead of the used subsets
+    full_fonts: bool = False
+    compress: bool = True
+    
+    def weasyprint_options(self) -> Dict[str, Any]:
+        """Keyword options for WeasyPrint's ``render`` and ``write_pdf``."""
+        return {
+            'optimize_images': self.optimize_images,
+            'jpeg_quality': self.jpeg_quality,
+            'dpi': self.dpi,
+            'full_fonts': self.full_fonts,
+            'uncompressed_pdf': not self.compress,
+        }
+
+
+def dedupe_images(html_content: str, base_url: str) -> str:
+    """Point ``<img>`` tags whose local files have identical contents at one URL.
+    
+    WeasyPrint embeds an image once per URL, so copies of the same picture
+    under different names are then embedded once too.
+    """
+    first_url: Dict[str, str] = {}
+    
+    def replace(match):
+        url = match.group(2)
+        path = local_file(url, base_url)
+        if path is None:
+            return match.group(0)
+        try:
+            with open(path, 'rb') as f:
+                digest = hashlib.sha256(f.read()).hexdigest()
+        except OSError:
+            return match.group(0)
+        return match.group(1) + first_url.setdefault(digest, url) + match.group(3)
+    
+    return IMG_SRC.sub(replace, html_content)
+
+
+def local_file(url: str, base_url: str) -> Optional[str]:
+    """Filesystem path of a relative or ``file:`` URL, or None for other URLs."""
+    parsed = urlparse(urljoin(base_url, url))
+    if parsed.scheme not in ('', 'file'):
+        return None
+    return unquote(parsed.path)
 
 
 class PDFGenerator:
     """Generate PDF from HTML content."""
     
-    def __init__(self):
-        if not WEASYPRINT_AVAILABLE:
+    def __init__(self, font_config: Optional["FontConfiguration"] = None,
+                 url_fetcher: Optional[URLFetcher] = None):
+        if import_weasyprint() is None:
             raise ImportError("WeasyPrint is required for PDF generation. Install with: pip install weasyprint")
+        self._font_config = font_config
+        # Resources are fetched by WeasyPrint's own fetcher when None
+        self.url_fetcher = url_fetcher
+        # WeasyPrint's image caches, shared by every document so common images are
+        # decoded once; images are kept as processed for the options, so one per PDFOptions
+        self.image_caches: Dict[PDFOptions, Dict[str, Any]] = {}
+        self._resource_digests: Dict[str, str] = {}
+        # Set by the renderer while profiling, to time layout and PDF write separately
+        self.profiler: Optional["StageProfiler"] = None
+
+    @property
+    def font_config(self) -> "FontConfiguration":
+        """Font configuration for every render, the process-wide one unless given."""
+        # Shared so fonts are discovered and loaded once per process, not per document
+        return self._font_config or get_font_config()
     
-    def generate_pdf(self, html_content: str, output_path: str, css_content: str = "", 
-                    logo_file: Optional[str] = None) -> None:
-        """Generate PDF from HTML content."""
-        # Create temporary HTML file
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-            f.write(html_content)
-            temp_html = f.name
+    def generate_pdf(self, html_content: str, output_path: Union[str, Path, BinaryIO, None],
+                    css_content: str = "", logo_file: Optional[str] = None,
+                    base_url: Optional[str] = None,
+                    pdf_options: Optional[PDFOptions] = None) -> Optional[bytes]:
+        """Generate PDF from HTML content.
         
-        try:
-            # Create temporary CSS file if needed
-            temp_css = None
-            if css_content:
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.css', delete=False, encoding='utf-8') as f:
-                    f.write(css_content)
-                    temp_css = f.name
-            
-            # Generate PDF
-            self._create_pdf(temp_html, output_path, temp_css, logo_file)
-            
-        finally:
-            # Clean up temporary files
-            if os.path.exists(temp_html):
-                os.unlink(temp_html)
-            if temp_css and os.path.exists(temp_css):
-                os.unlink(temp_css)
-    
-    def _create_pdf(self, html_file: str, output_path: str, css_file: Optional[str] = None, 
-                   logo_file: Optional[str] = None) -> None:
-        """Create PDF using WeasyPrint."""
-        # Prepare CSS
-        css_list = []
+        The HTML and CSS are rendered from memory. ``output_path`` may be a file
+        path, any writable binary stream, or None to get the PDF as bytes.
+        Relative URLs in the HTML resolve against ``base_url`` (defaults to the
+        current directory).
         
-        if css_file:
-            css_list.append(CSS(filename=css_file))
+        ``css_content`` is applied as an extra user stylesheet, compiled once per
+        process. Leave it empty when the CSS is already inlined in the HTML.
+        """
+        stylesheets = [parse_css(css_content, base_url)] if css_content else []
+        return self.render_pdf(html_content, output_path, stylesheets, base_url, pdf_options)
+    
+    def render_pdf(self, html_content: str, target: Union[str, Path, BinaryIO, None] = None,
+                   stylesheets: Optional[List["CSS"]] = None,
+                   base_url: Optional[str] = None,
+                   pdf_options: Optional[PDFOptions] = None,
+                   image_cache: Optional[Dict[str, Any]] = None) -> Optional[bytes]:
+        """Render an HTML string with already-parsed stylesheets.
         
-        # Generate PDF
-        HTML(filename=html_file).write_pdf(
-            output_path,
-            stylesheets=css_list
-        )
+        Writes to ``target`` (a path or writable binary stream) or returns the
+        PDF bytes when ``target`` is None. ``image_cache`` replaces the shared
+        image cache for this render, e.g. an empty dict to measure a cold render.
+        """
+        pdf_options = pdf_options or PDFOptions()
+        html = self._html(html_content, base_url, pdf_options)
+        if image_cache is None:
+            image_cache = self.image_cache(pdf_options)
+        return self._create_pdf(html, target, stylesheets or [], pdf_options, image_cache)
+    
+    def render_document(self, html_content: str, stylesheets: Optional[List["CSS"]] = None,
+                        base_url: Optional[str] = None,
+                        pdf_options: Optional[PDFOptions] = None) -> "Document":
+        """Lay out an HTML string and return the WeasyPrint document, without writing a PDF."""
+        pdf_options = pdf_options or PDFOptions()
+        html = self._html(html_content, base_url, pdf_options)
+        return html.render(stylesheets=stylesheets or [], font_config=self.font_config,
+                           cache=self.image_cache(pdf_options), **pdf_options.weasyprint_options())
+    
+    def render_first_page(self, html_content: str, base_url: Optional[str] = None,
+                          pdf_options: Optional[PDFOptions] = None,
+                          stylesheets: Optional[List["CSS"]] = None) -> bytes:
+        """Lay out an HTML string and return a PDF of its first page only."""
+        pdf_options = pdf_options or PDFOptions()
+        with stage(self.profiler, 'layout'):
+            document = self.render_document(html_content, stylesheets, base_url, pdf_options)
+        with stage(self.profiler, 'write'):
+            return document.copy(document.pages[:1]).write_pdf(**pdf_options.weasyprint_options())
+    
+    def image_cache(self, pdf_options: PDFOptions) -> Dict[str, Any]:
+        """The shared image cache for renders with ``pdf_options``."""
+        return self.image_caches.setdefault(pdf_options, {})
+    
+    def _html(self, html_content: str, base_url: Optional[str], pdf_options: PDFOptions) -> "HTML":
+        from weasyprint import HTML
+        base_url = base_url or _cwd_base_url()
+        if pdf_options.optimize_images:
+            html_content = dedupe_images(html_content, base_url)
+        if self.url_fetcher is None:
+            return HTML(string=html_content, base_url=base_url)
+        self._prefetch(html_content, base_url)
+        return HTML(string=html_content, base_url=base_url, url_fetcher=self.url_fetcher)
+    
+    def _prefetch(self, html_content: str, base_url: str) -> None:
+        """Fetch the document's resources before layout and drop decoded images that changed."""
+        resources = self.url_fetcher.prefetch(resource_urls(html_content, base_url), base_url)
+        digests = {url: resource.digest for url, resource in resources.items()}
+        changed = any(self._resource_digests.get(url, digest) != digest for url, digest in digests.items())
+        for image_cache in self.image_caches.values():
+            if changed or len(image_cache) > IMAGE_CACHE_SIZE:
+                image_cache.clear()
+        self._resource_digests.update(digests)
+    
+    def _create_pdf(self, html: "HTML", target: Union[str, Path, BinaryIO, None],
+                   stylesheets: List["CSS"], pdf_options: PDFOptions,
+                   image_cache: Dict[str, Any]) -> Optional[bytes]:
+        """Create PDF using WeasyPrint."""
+        if isinstance(target, Path):
+            target = str(target)
+        options = pdf_options.weasyprint_options()
+        with stage(self.profiler, 'layout'):
+            document = html.render(
+                stylesheets=stylesheets,
+                font_config=self.font_config,
+                cache=image_cache,
+                **options
+            )
+        with stage(self.profiler, 'write'):
+            pdf = document.write_pdf(target, **options)
+        if self.profiler is not None:
+            self.profiler.record(pages=len(document.pages))
+        return pdf
     
     def _image_to_base64(self, image_path: str) -> str:
         """Convert image file to base64 string."""
         try:
             with open(image_path, 'rb') as f:
-                image_data = f.read()
-                base64_data = base64.b64encode(image_data).decode('utf-8')
-                
-                # Determine MIME type based on file extension
-                ext = Path(image_path).suffix.lower()
-                if ext == '.svg':
-                    mime_type = 'image/svg+xml'
-                elif ext in ['.png', '.jpg', '.jpeg', '.gif']:
-                    mime_type = f'image/{ext[1:]}'
-                else:
-                    mime_type = 'image/png'  # default
-                
-                return f"data:{mime_type};base64,{base64_data}"
+                return image_to_data_uri(f.read(), Path(image_path).suffix)
         except Exception as e:
             print(f"Warning: Could not convert image to base64: {e}")
             return ""
@@ -92,14 +225,26 @@ class PDFGenerator:
         
         css_list = []
         if css_file and os.path.exists(css_file):
-            css_list.append(CSS(filename=css_file))
+            css_list.append(get_stylesheet_manager().get_file(css_file))
         
+        from weasyprint import HTML
         HTML(filename=html_file).write_pdf(
             output_path,
-            stylesheets=css_list
+            stylesheets=css_list,
+            font_config=self.font_config
         )
 
 
+def parse_css(css_content: str, base_url: Optional[str] = None) -> "CSS":
+    """Return the compiled WeasyPrint stylesheet for a CSS string."""
+    return get_stylesheet_manager().get(css_content, base_url or _cwd_base_url())
+
+
+def _cwd_base_url() -> str:
+    """Base URL for the current directory (the trailing separator matters)."""
+    return os.path.join(os.getcwd(), '')
+
+
 def check_weasyprint_available() -> bool:
-    """Check if WeasyPrint is available."""
-    return WEASYPRINT_AVAILABLE 
\ No newline at end of file
+    """Check if WeasyPrint is available, without importing it when a cached probe says so."""
+    return probe_backends()['weasyprint_available'] 
\ No newline at end of file
@@ -0,0 +1,320 @@
+"""
+Asyncio render pipeline that overlaps file and pandoc I/O with layout.
+
+Documents flow through four stages joined by bounded queues:
+
+* prepare: config, output-cache check and markdown processing, in threads
+* convert: pandoc as an asyncio subprocess (the native engine and the pandoc
+  server in threads), then template rendering
+* layout: WeasyPrint layout in a process pool, returning the PDF bytes
+* write: the PDF is written and cached in a thread while the worker lays out
+  the next document
+
+A full queue makes the stage before it wait, so only a bounded number of
+documents is held in memory however many are submitted.
+"""
+
+import asyncio
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional
+
+import click
+
+from .backends import probe_backends
+from .batch import BatchResult
+from .html_generator import PANDOC_ARGS
+from .pdf_generator import PDFOptions
+from .renderer import DocumentRenderer, PreparedDocument, RenderOptions
+
+
+# Per-process renderer of the layout workers
+_worker_renderer: Optional[DocumentRenderer] = None
+
+
+def _init_worker(options: RenderOptions) -> None:
+    """Pool initializer: load WeasyPrint and fonts once per layout worker."""
+    global _worker_renderer
+    _worker_renderer = DocumentRenderer(options)
+    _worker_renderer.warm_up()
+
+
+def _layout_pdf(html_content: str, base_url: str, pdf_options: PDFOptions) -> bytes:
+    """Lay out a composed document in a worker and return the PDF."""
+    return _worker_renderer.pdf_generator.render_pdf(html_content, None, base_url=base_url,
+                                                     pdf_options=pdf_options)
+
+
+def _render_whole(input_file: Path, output_path: Path) -> Dict[str, Any]:
+    """Render a document start to finish in a worker, for modes the stages do not cover.
+
+    Returns the outcome as ``BatchResult`` fields.
+    """
+    return {
+        'output_path': _worker_renderer.render(input_file, output_path),
+        'cached': _worker_renderer.last_cache_hit,
+        'pandoc_cached': _worker_renderer.last_pandoc_cache_hit,
+        'section_reuse': _worker_renderer.last_section_reuse,
+        'optimization': _worker_renderer.last_optimization,
+        'peak_memory': _worker_renderer.last_peak_memory,
+    }
+
+
+@dataclass
+class _Job:
+    input_file: Path
+    output_path: Path
+    future: "asyncio.Future[BatchResult]"
+    start: float
+    document: Optional[PreparedDocument] = None
+    pdf: Optional[bytes] = None
+
+
+class AsyncRenderer:
+    """Render documents from asyncio code without blocking the event loop.
+
+    ``jobs`` worker processes lay out PDFs (0 = one per CPU). Up to ``readers``
+    documents are read and processed and up to ``conversions`` are converted
+    at once; each queue between stages holds at most ``queue_size`` documents.
+    Use as ``async with AsyncRenderer(options) as renderer: ...``.
+    """
+
+    def __init__(self, options: Optional[RenderOptions] = None, jobs: int = 0,
+                 readers: int = 4, conversions: Optional[int] = None,
+                 queue_size: Optional[int] = None):
+        self.options = options or RenderOptions()
+        self.jobs = jobs or os.cpu_count() or 1
+        self.readers = readers
+        self.conversions = conversions or max(2, self.jobs)
+        self.queue_size = queue_size or self.jobs * 2
+        # Configs, caches, markdown processing and templates live in this process
+        self.renderer = DocumentRenderer(self.options)
+        # Split, profiled, baseline-compared, memory-bounded, thumbnail and non-PDF renders
+        # run whole in a worker, not through the stages
+        self.whole_documents = (self.options.section_jobs is not None or bool(self.options.profile)
+                                or self.options.optimize_report or bool(self.options.max_memory)
+                                or bool(self.options.thumbnail)
+                                or self.renderer.output_formats != {'pdf'})
+        self._threads: Optional[ThreadPoolExecutor] = None
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._tasks: List["asyncio.Task[None]"] = []
+        # Created on first use, inside the running event loop
+        self._prepare_queue: Optional["asyncio.Queue[_Job]"] = None
+        self._convert_queue: Optional["asyncio.Queue[_Job]"] = None
+        self._layout_queue: Optional["asyncio.Queue[_Job]"] = None
+        self._write_queue: Optional["asyncio.Queue[_Job]"] = None
+
+    async def __aenter__(self) -> "AsyncRenderer":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def render(self, input_file: Path, output_path: Optional[Path] = None) -> Path:
+        """Render one document and return the path of its output; failures are raised."""
+        return (await self._submit(Path(input_file), output_path)).output_path
+
+    async def render_result(self, input_file: Path, output_path: Optional[Path] = None) -> BatchResult:
+        """Render one document, capturing any failure in the result."""
+        start = time.perf_counter()
+        try:
+            return await self._submit(Path(input_file), output_path)
+        except Exception as e:
+            return BatchResult(Path(input_file), error=str(e), traceback=traceback.format_exc(),
+                               duration=time.perf_counter() - start)
+
+    async def render_many(self, inputs: Iterable[Path]) -> AsyncIterator[BatchResult]:
+        """Render all inputs, yielding each result as its document finishes."""
+        for result in asyncio.as_completed([self.render_result(input_file) for input_file in inputs]):
+            yield await result
+
+    async def close(self) -> None:
+        """Stop the stage tasks and shut the worker pools down."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.get_running_loop().run_in_executor(None, self._shutdown)
+
+    def _shutdown(self, wait: bool = True) -> None:
+        """Shut the worker pools down; usable after the event loop has closed."""
+        self._tasks = []
+        for executor in (self._processes, self._threads):
+            if executor is not None:
+                executor.shutdown(wait)
+        self._processes = self._threads = None
+        self.renderer.close()
+
+    async def _submit(self, input_file: Path, output_path: Optional[Path]) -> BatchResult:
+        self._start()
+        job = _Job(input_file, Path(output_path) if output_path else input_file.with_suffix('.pdf'),
+                   asyncio.get_running_loop().create_future(), time.perf_counter())
+        # Waits here while the pipeline is full
+        await self._prepare_queue.put(job)
+        return await job.future
+
+    def _start(self) -> None:
+        if self._tasks:
+            return
+        self._threads = ThreadPoolExecutor(self.readers + self.conversions + self.jobs,
+                                           thread_name_prefix='borel-pipeline')
+        self._processes = ProcessPoolExecutor(self.jobs, initializer=_init_worker,
+                                              initargs=(self.options,))
+        self._prepare_queue = asyncio.Queue(self.queue_size)
+        self._convert_queue = asyncio.Queue(self.queue_size)
+        self._layout_queue = asyncio.Queue(self.queue_size)
+        self._write_queue = asyncio.Queue(self.queue_size)
+        stages = [
+            (self._prepare_queue, self._prepare, self.readers),
+            (self._convert_queue, self._convert, self.conversions),
+            (self._layout_queue, self._layout, self.jobs),
+            (self._write_queue, self._write, self.jobs),
+        ]
+        self._tasks = [asyncio.ensure_future(self._run_stage(queue, handler))
+                       for queue, handler, count in stages for _ in range(count)]
+
+    async def _run_stage(self, queue: "asyncio.Queue[_Job]",
+                         handler: Callable[[_Job], Awaitable[None]]) -> None:
+        while True:
+            job = await queue.get()
+            try:
+                if not job.future.done():
+                    await handler(job)
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            finally:
+                queue.task_done()
+
+    def _in_thread(self, func, *args) -> Awaitable:
+        return asyncio.get_running_loop().run_in_executor(self._threads, func, *args)
+
+    def _finish(self, job: _Job, **fields: Any) -> None:
+        job.future.set_result(BatchResult(job.input_file, job.output_path,
+                                          duration=time.perf_counter() - job.start, **fields))
+
+    async def _prepare(self, job: _Job) -> None:
+        if self.whole_documents:
+            await self._layout_queue.put(job)
+            return
+        job.document = await self._in_thread(self.renderer.prepare, job.input_file, job.output_path)
+        if job.document is None:
+            self._finish(job, cached=True)
+        else:
+            await self._convert_queue.put(job)
+
+    async def _convert(self, job: _Job) -> None:
+        document = job.document
+        if not await self._run_pandoc(document):
+            await self._in_thread(self.renderer.convert, document)
+        await self._in_thread(self.renderer.compose, document)
+        await self._layout_queue.put(job)
+
+    async def _run_pandoc(self, document: PreparedDocument) -> bool:
+        """Convert with pandoc as an asyncio subprocess.
+
+        Returns False when the document needs another engine or backend, or
+        pandoc failed, so the renderer's own conversion (with its fallbacks)
+        should run instead.
+        """
+        generator = self.renderer.html_generator
+        pandoc_path = probe_backends()['pandoc_path']
+        if document.config.engine != 'pandoc' or generator.pandoc_backend != 'process' or not pandoc_path:
+            return False
+        key = generator.pandoc_stage_key(document.content)
+        html = await self._in_thread(generator.stage_cache.get, key) if key else None
+        if key:
+            document.pandoc_cache_hit = html is not None
+        if html is None:
+            process = await asyncio.create_subprocess_exec(
+                pandoc_path, *PANDOC_ARGS, stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            stdout, stderr = await process.communicate(document.content.encode('utf-8'))
+            if process.returncode != 0:
+                click.echo(f"Warning: Pandoc conversion failed: {stderr.decode('utf-8', 'replace').strip()}",
+                           err=True)
+                return False
+            html = stdout.decode('utf-8')
+            if key:
+                await self._in_thread(generator.stage_cache.put, key, html)
+        document.body_html = html
+        return True
+
+    async def _layout(self, job: _Job) -> None:
+        loop = asyncio.get_running_loop()
+        if self.whole_documents:
+            fields = await loop.run_in_executor(self._processes, _render_whole, job.input_file,
+                                                job.output_path)
+            job.output_path = fields.pop('output_path')
+            self._finish(job, **fields)
+            return
+        document = job.document
+        job.pdf = await loop.run_in_executor(self._processes, _layout_pdf, document.html_content,
+                                             document.base_url, document.pdf_options)
+        await self._write_queue.put(job)
+
+    async def _write(self, job: _Job) -> None:
+        await self._in_thread(self.renderer.write_output, job.document, job.pdf)
+        self._finish(job, pandoc_cached=job.document.pandoc_cache_hit)
+
+
+# Shared renderers of the module-level render(), per event loop and options.
+# Keyed by the loop itself, not its id, which a later loop can reuse.
+_renderers: Dict[asyncio.AbstractEventLoop, Dict[str, AsyncRenderer]] = {}
+
+
+async def render(input_file: Path, output_path: Optional[Path] = None,
+                 options: Optional[RenderOptions] = None) -> Path:
+    """Render one document to PDF from async code and return the PDF's path.
+
+    Calls with the same options share one pipeline and worker pool, kept
+    for the life of the event loop and closed when it shuts down (when
+    ``asyncio.run()`` cancels the tasks left over, or else on the next
+    call from another loop). For explicit control use ``AsyncRenderer``
+    as an async context manager.
+    """
+    options = options or RenderOptions()
+    loop = asyncio.get_running_loop()
+    _release_closed_loops()
+    renderers = _renderers.get(loop)
+    if renderers is None:
+        renderers = _renderers[loop] = {}
+        loop.create_task(_close_on_shutdown(loop))
+    key = repr(options)
+    if key not in renderers:
+        renderers[key] = AsyncRenderer(options)
+    return await renderers[key].render(input_file, output_path)
+
+
+async def _close_on_shutdown(loop: asyncio.AbstractEventLoop) -> None:
+    """Wait until cancelled with the loop's other tasks, then close its shared renderers."""
+    try:
+        await loop.create_future()
+    finally:
+        for renderer in _renderers.pop(loop, {}).values():
+            await renderer.close()
+
+
+def _release_closed_loops() -> None:
+    """Shut down the shared renderers of loops closed without cancelling their tasks."""
+    for loop in [loop for loop in _renderers if loop.is_closed()]:
+        for renderer in _renderers.pop(loop).values():
+            renderer._shutdown(wait=False)
+
+
+def run_pipeline(inputs: List[Path], options: RenderOptions, jobs: int = 1,
+                 on_result: Optional[Callable[[BatchResult], None]] = None) -> List[BatchResult]:
+    """Render all inputs through the asyncio pipeline; the counterpart of ``run_batch``."""
+    async def run() -> List[BatchResult]:
+        results = []
+        async with AsyncRenderer(options, jobs) as renderer:
+            async for result in renderer.render_many(inputs):
+                results.append(result)
+                if on_result:
+                    on_result(result)
+        return results
+
+    return asyncio.run(run())
@@ -3,7 +3,6 @@ Markdown processing and metadata extraction for Borel.
 """
 
 import re
-import yaml
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Tuple, Optional
@@ -41,6 +40,7 @@ class MarkdownProcessor:
         if not match:
             return {}
         
+        import yaml
         try:
             metadata = yaml.safe_load(match.group(1))
             return metadata or {}
@@ -0,0 +1,128 @@
+"""
+Per-stage profiling of the rendering pipeline (``borel --profile``).
+"""
+
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+
+if TYPE_CHECKING:
+    import cProfile
+
+PROFILE_MODES = ('summary', 'cprofile')
+
+
+class StageProfiler:
+    """Record wall time, CPU time and tracemalloc peak for each named pipeline stage.
+
+    With ``use_cprofile`` every stage also runs under its own ``cProfile``
+    profiler, so the statistics of the slowest stage can be dumped afterwards.
+    """
+
+    def __init__(self, use_cprofile: bool = False):
+        self.use_cprofile = use_cprofile
+        self.stages: List[Dict[str, Any]] = []
+        self.info: Dict[str, Any] = {}
+        self._profiles: Dict[str, "cProfile.Profile"] = {}
+        self._started_tracemalloc = False
+
+    def __enter__(self) -> "StageProfiler":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        self._start = time.perf_counter()
+        self._cpu_start = time.process_time()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.info['wall_time'] = time.perf_counter() - self._start
+        self.info['cpu_time'] = time.process_time() - self._cpu_start
+        if self._started_tracemalloc:
+            self.info['peak_memory'] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Measure the code run inside the ``with`` block as one stage."""
+        base_memory = tracemalloc.get_traced_memory()[0]
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+        profile = None
+        if self.use_cprofile:
+            import cProfile
+            profile = cProfile.Profile()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._profiles[name] = profile
+            self.stages.append({
+                'stage': name,
+                'wall_time': time.perf_counter() - wall_start,
+                'cpu_time': time.process_time() - cpu_start,
+                'peak_memory': max(0, tracemalloc.get_traced_memory()[1] - base_memory),
+            })
+
+    def record(self, **info: Any) -> None:
+        """Attach extra facts to the report (page count, output size, ...)."""
+        self.info.update(info)
+
+    def slowest_stage(self) -> Optional[str]:
+        if not self.stages:
+            return None
+        return max(self.stages, key=lambda stage: stage['wall_time'])['stage']
+
+    def dump_cprofile(self, path: str) -> Optional[str]:
+        """Write the pstats file of the slowest stage. Returns its stage name."""
+        name = self.slowest_stage()
+        if name is None or name not in self._profiles:
+            return None
+        self._profiles[name].dump_stats(path)
+        return name
+
+    def report(self) -> Dict[str, Any]:
+        return dict(self.info, stages=self.stages)
+
+    def write_json(self, path: str) -> None:
+        Path(path).write_text(json.dumps(self.report(), indent=2, default=str) + '\n',
+                              encoding='utf-8')
+
+    def summary(self) -> str:
+        """Human-readable table of the stages."""
+        lines = [f"  {'stage':<14}{'wall':>10}{'cpu':>10}{'peak mem':>12}"]
+        for stage in self.stages:
+            lines.append(f"  {stage['stage']:<14}{stage['wall_time'] * 1000:>7.1f} ms"
+                         f"{stage['cpu_time'] * 1000:>7.1f} ms"
+                         f"{stage['peak_memory'] / (1024 * 1024):>9.1f} MB")
+        if 'wall_time' in self.info:
+            lines.append(f"  {'total':<14}{self.info['wall_time'] * 1000:>7.1f} ms"
+                         f"{self.info['cpu_time'] * 1000:>7.1f} ms"
+                         f"{self.info.get('peak_memory', 0) / (1024 * 1024):>9.1f} MB")
+        facts = []
+        if self.info.get('pages') is not None:
+            facts.append(f"{self.info['pages']} page(s)")
+        if self.info.get('sections') is not None:
+            facts.append(f"{self.info['sections']} section(s), {self.info.get('sections_reused', 0)} reused")
+        if self.info.get('output_size') is not None:
+            facts.append(f"{self.info['output_size'] / 1024:.1f} KB")
+        if facts:
+            lines.append(f"  output: {', '.join(facts)}")
+        return '\n'.join(lines)
+
+
+@contextmanager
+def stage(profiler: Optional[StageProfiler], name: str) -> Iterator[None]:
+    """Profile a stage if a profiler is active, otherwise do nothing."""
+    if profiler is None:
+        yield
+    else:
+        with profiler.stage(name):
+            yield
@@ -0,0 +1,659 @@
+"""
+Document rendering pipeline shared by the CLI and batch workers.
+"""
+
+import io
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, List, Optional, Dict, Set, Tuple
+
+import click
+
+from . import __version__
+from .processor import MarkdownProcessor
+from .html_generator import HTMLGenerator
+from .pdf_generator import OPTIMIZE_DPI, OPTIMIZE_JPEG_QUALITY, PDFGenerator, PDFOptions
+from .config import BorelConfig, ConfigResolver, get_default_css
+from .backends import import_pypdf, probe_backends
+from .cache import DEFAULT_MAX_SIZE, OutputCache, StageCache, hash_bytes, hash_file
+from .fonts import get_font_config, preload_fonts
+from .fetcher import FETCH_TIMEOUT, MAX_FETCH_SIZE, URLFetcher
+from .images import JPEG_QUALITY, ImageOptimizer
+from .logo import DEFAULT_DPI, LogoProcessor
+from .memory import MemoryBudget, MemoryMonitor
+from .outputs import (PREVIEW_DPI, THUMBNAIL_WIDTH, parse_pages, self_contained_html,
+                      thumbnail_path, write_previews, write_thumbnail)
+from .profiling import StageProfiler, stage
+from .sections import SectionRenderer, split_sections
+
+
+@dataclass
+class RenderOptions:
+    """Command-line overrides applied on top of the discovered configuration."""
+
+    css_file: Optional[str] = None
+    logo_file: Optional[str] = None
+    company: Optional[str] = None
+    author: Optional[str] = None
+    # Also write the self-contained HTML copy (same as 'html' in formats)
+    keep_html: bool = False
+    # Any of 'pdf', 'html' and 'png', all written from one render
+    formats: Tuple[str, ...] = ('pdf',)
+    # Pages to rasterize for 'png' previews, e.g. '1,3-5' or 'all'
+    preview_pages: str = '1'
+    preview_dpi: int = PREVIEW_DPI
+    # Write only a PNG thumbnail of the 'first' page or the 'title' page, instead of the outputs
+    thumbnail: Optional[str] = None
+    thumbnail_width: int = THUMBNAIL_WIDTH
+    # RSS budget in bytes; documents that would exceed it are laid out one section at a time
+    max_memory: Optional[int] = None
+    # Resources referenced by documents: only use cached remote resources when offline,
+    # per-fetch limits, and the only directories local files may be read from (None = any)
+    offline: bool = False
+    fetch_timeout: float = FETCH_TIMEOUT
+    max_fetch_size: int = MAX_FETCH_SIZE
+    allowed_dirs: Optional[List[str]] = None
+    verbose: bool = False
+    pandoc_backend: str = 'process'
+    cache: bool = False
+    cache_dir: Optional[str] = None
+    cache_size: int = DEFAULT_MAX_SIZE
+    font_dirs: Optional[List[str]] = None
+    profile: Optional[str] = None
+    # Split documents at [CRLF] page breaks and lay sections out over this many processes
+    section_jobs: Optional[int] = None
+    engine: Optional[str] = None
+    template_dir: Optional[str] = None
+    optimize: bool = False
+    jpeg_quality: Optional[int] = None
+    dpi: Optional[int] = None
+    full_fonts: bool = False
+    uncompressed: bool = False
+    # False leaves embedded images at their original size
+    scale_images: bool = True
+    # Also render an unoptimized baseline and report the size and time saved
+    optimize_report: bool = False
+
+
+@dataclass
+class PreparedDocument:
+    """A document on its way through the pipeline stages."""
+
+    input_file: Path
+    output_path: Path
+    config: BorelConfig
+    css_content: str
+    cache_key: Optional[str]
+    content: str
+    metadata: Dict[str, Any]
+    body_html: str = ''
+    pandoc_cache_hit: Optional[bool] = None
+    # The full document, or the documents of each section for split renders
+    html_content: Optional[str] = None
+    section_documents: List[str] = field(default_factory=list)
+
+    @property
+    def pdf_options(self) -> PDFOptions:
+        return pdf_options_for(self.config)
+
+    @property
+    def base_url(self) -> str:
+        """Relative image and link URLs resolve against the markdown file's directory."""
+        # The CSS is inlined by the template at author origin, so it is not passed again
+        return os.path.join(os.path.abspath(self.input_file.parent), '')
+
+
+class DocumentRenderer:
+    """Render markdown files to PDF, keeping generators, configs and CSS loaded between documents."""
+
+    def __init__(self, options: Optional[RenderOptions] = None):
+        self.options = options or RenderOptions()
+        self.processor = MarkdownProcessor()
+        self.cache = (
+            OutputCache(self.options.cache_dir, self.options.cache_size)
+            if self.options.cache else None
+        )
+        self.pandoc_cache = StageCache(self.cache, 'pandoc') if self.cache is not None else None
+        self.html_generator = HTMLGenerator(pandoc_backend=self.options.pandoc_backend,
+                                            stage_cache=self.pandoc_cache,
+                                            cache_dir=self.options.cache_dir)
+        # Processed logos and fetched resources are always cached on disk; they are shared by every render
+        resource_cache = self.cache or OutputCache(self.options.cache_dir, self.options.cache_size)
+        allowed_dirs = self.options.allowed_dirs
+        if allowed_dirs is not None:
+            # Optimized images are read from the cache
+            allowed_dirs = list(allowed_dirs) + [str(resource_cache.objects_dir)]
+        self.url_fetcher = URLFetcher(resource_cache, timeout=self.options.fetch_timeout,
+                                      max_size=self.options.max_fetch_size,
+                                      allowed_dirs=allowed_dirs, offline=self.options.offline)
+        self.pdf_generator = PDFGenerator(url_fetcher=self.url_fetcher)
+        self.logo_processor = LogoProcessor(resource_cache)
+        self.image_optimizer = ImageOptimizer(resource_cache)
+        self.config_resolver = ConfigResolver()
+        self._css_cache: Dict[Optional[str], str] = {}
+        self._logo_digests: Dict[str, str] = {}
+        # Files behind the loaded CSS and logos, with their mtimes when loaded
+        self._loaded_files: Dict[str, Optional[int]] = {}
+        self.last_cache_hit = False
+        self.last_pandoc_cache_hit: Optional[bool] = None
+        # (sections reused from the cache, sections) of the last split render
+        self.last_section_reuse: Optional[Tuple[int, int]] = None
+        # (size, seconds, baseline size, baseline seconds) of the last render with --optimize-report
+        self.last_optimization: Optional[Tuple[int, float, int, float]] = None
+        # PNG previews written by the last render
+        self.last_previews: List[Path] = []
+        self.memory_budget = MemoryBudget(self.options.max_memory) if self.options.max_memory else None
+        self._memory_monitor: Optional[MemoryMonitor] = None
+        # Peak RSS of the last render, with a memory budget
+        self.last_peak_memory: Optional[int] = None
+        self.font_setup_time: Optional[float] = None
+        self.font_dirs: Optional[List[str]] = None
+        self._section_renderer: Optional[SectionRenderer] = None
+
+    def warm_up(self, input_files: Iterable[Path] = (),
+                font_dirs: Optional[List[str]] = None) -> float:
+        """Set up the process font configuration, preload branding fonts and compile templates.
+
+        Font directories come from ``font_dirs``, the options, or the first
+        config of ``input_files`` that sets them. Runs before the first render
+        and returns the seconds spent.
+        """
+        start = time.perf_counter()
+        configs = [self.load_config(Path(input_file)) for input_file in input_files]
+        font_dirs = font_dirs or self.options.font_dirs or next(
+            (config.font_dirs for config in configs if config.font_dirs), None)
+        get_font_config(font_dirs)
+        self.font_dirs = font_dirs
+        css_files = {config.css_file for config in configs} or {self.options.css_file}
+        preload_fonts([(self.load_css(css_file), css_base_url(css_file)) for css_file in css_files])
+        for template_dir in {config.template_dir for config in configs} or {self.options.template_dir}:
+            self.html_generator.load_templates(_template_dir(template_dir))
+        self.font_setup_time = time.perf_counter() - start
+        if self.options.verbose:
+            click.echo(f"Font setup: {self.font_setup_time:.2f}s"
+                       + (f" (font dirs: {', '.join(font_dirs)})" if font_dirs else ""))
+        return self.font_setup_time
+
+    def render(self, input_file: Path, output_path: Optional[Path] = None) -> Path:
+        """Render a single markdown file and return the path of the generated PDF.
+
+        Without 'pdf' in the output formats, the HTML copy or first preview is returned.
+        In thumbnail mode, only the thumbnail is written, named after the PDF
+        (``notes.thumb.png``) unless ``output_path`` is a PNG.
+        """
+        if output_path is None:
+            output_path = input_file.with_suffix('.pdf')
+        if self.options.thumbnail:
+            output_path = thumbnail_path(output_path)
+        if self.memory_budget is None:
+            return self._render_profiled(input_file, output_path)
+
+        self.last_peak_memory = None
+        with MemoryMonitor() as monitor:
+            self._memory_monitor = monitor
+            try:
+                rendered = self._render_profiled(input_file, output_path)
+            finally:
+                self._memory_monitor = None
+        self.last_peak_memory = monitor.peak
+        if self.options.verbose:
+            click.echo(f"Peak memory: {monitor.peak / (1024 * 1024):.1f} MB")
+        return rendered
+
+    def _render_profiled(self, input_file: Path, output_path: Path) -> Path:
+        if not self.options.profile:
+            return self._render(input_file, output_path, None)
+
+        profiler = StageProfiler(use_cprofile=self.options.profile == 'cprofile')
+        with profiler:
+            rendered = self._render(input_file, output_path, profiler)
+        self._write_profile(profiler, input_file, output_path)
+        return rendered
+
+    def _render(self, input_file: Path, output_path: Path,
+                profiler: Optional[StageProfiler]) -> Path:
+        if self.font_setup_time is None:
+            with stage(profiler, 'fonts'):
+                self.warm_up([input_file])
+        self.last_cache_hit = False
+        self.last_pandoc_cache_hit = None
+        self.last_section_reuse = None
+        self.last_optimization = None
+        self.last_previews = []
+
+        document = self.prepare(input_file, output_path, profiler)
+        if document is None:
+            self.last_cache_hit = True
+            return output_path
+        if self.options.thumbnail:
+            return self._render_thumbnail(document, profiler)
+        self.convert(document, profiler)
+        self.last_pandoc_cache_hit = document.pandoc_cache_hit
+        self.compose(document, profiler)
+
+        formats = self.output_formats
+        if not formats & {'pdf', 'png'}:
+            return output_path.with_suffix('.html')
+        # Without 'pdf', the PDF is only laid out in memory for the previews
+        target = str(output_path) if 'pdf' in formats else io.BytesIO()
+        if 'pdf' in formats:
+            _unlink_hard_link(output_path)
+        if document.section_documents:
+            pages = self.section_renderer.render(document.section_documents, document.css_content,
+                                                 document.base_url, target, profiler,
+                                                 document.pdf_options)
+            if self.cache is not None:
+                self.last_section_reuse = (self.section_renderer.last_reused,
+                                           len(document.section_documents))
+            if self.options.verbose:
+                click.echo(f"Sections: {len(document.section_documents)} ({pages} pages)")
+        else:
+            self.pdf_generator.profiler = profiler
+            monitor = self._memory_monitor
+            if monitor is not None:
+                monitor.begin()
+            start = time.perf_counter()
+            try:
+                self.pdf_generator.render_pdf(document.html_content, target,
+                                              base_url=document.base_url,
+                                              pdf_options=document.pdf_options)
+            finally:
+                self.pdf_generator.profiler = None
+            if monitor is not None:
+                self.memory_budget.observe(len(document.body_html), monitor.growth())
+            if self.options.optimize_report:
+                size = os.path.getsize(target) if isinstance(target, str) else len(target.getvalue())
+                self.last_optimization = self._measure_baseline(document, size,
+                                                                time.perf_counter() - start)
+
+        if 'png' in formats:
+            with stage(profiler, 'previews'):
+                self.last_previews = write_previews(
+                    target if isinstance(target, str) else target.getvalue(), output_path,
+                    parse_pages(self.options.preview_pages), self.options.preview_dpi)
+            if self.options.verbose:
+                click.echo(f"Previews: {', '.join(str(path) for path in self.last_previews)}")
+        if 'pdf' not in formats:
+            return self.last_previews[0] if self.last_previews else output_path
+
+        self.store(document, profiler)
+        return output_path
+
+    def _render_thumbnail(self, document: PreparedDocument,
+                          profiler: Optional[StageProfiler] = None) -> Path:
+        """Lay out just enough of the document for its first page and write that as a PNG.
+
+        A ``[CRLF]`` page break always starts a new page, so only the content
+        before the first one is converted and laid out. The 'title' source lays
+        out the title page alone, without converting the markdown at all.
+        """
+        config = document.config
+        if self.options.thumbnail == 'title':
+            body_html = ''
+        else:
+            self.convert(document, profiler)
+            self.last_pandoc_cache_hit = document.pandoc_cache_hit
+            body_html = split_sections(document.body_html)[0]
+            body_html = self.scale_images(document, body_html, profiler)
+        with stage(profiler, 'logo'):
+            logo_src = self.logo_src(config.logo_file, document.css_content)
+        with stage(profiler, 'template'):
+            html_content = self.html_generator.render_template(
+                body_html, document.metadata, document.css_content, logo_src,
+                template_dir=_template_dir(config.template_dir))
+        pdf = self.pdf_generator.render_first_page(html_content, document.base_url, document.pdf_options)
+        with stage(profiler, 'thumbnail'):
+            write_thumbnail(pdf, document.output_path, self.options.thumbnail_width)
+        self.store(document, profiler)
+        return document.output_path
+
+    @property
+    def cache_suffix(self) -> str:
+        """Suffix of the cached output of each render.
+
+        Thumbnails are cached under the same key as their document's PDF.
+        """
+        if self.options.thumbnail:
+            return f'.thumb-{self.options.thumbnail}-{self.options.thumbnail_width}.png'
+        return '.pdf'
+
+    @property
+    def output_formats(self) -> Set[str]:
+        """Formats each render writes; --keep-html adds the HTML copy."""
+        formats = set(self.options.formats)
+        if self.options.keep_html:
+            formats.add('html')
+        return formats
+
+    def _measure_baseline(self, document: PreparedDocument, size: int,
+                          seconds: float) -> Tuple[int, float, int, float]:
+        """Render the document again with WeasyPrint's defaults, to compare against."""
+        start = time.perf_counter()
+        # With images decoded from scratch, as a render without the shared cache would
+        baseline = self.pdf_generator.render_pdf(document.html_content, None,
+                                                 base_url=document.base_url, image_cache={})
+        return size, seconds, len(baseline), time.perf_counter() - start
+
+    def prepare(self, input_file: Path, output_path: Path,
+                profiler: Optional[StageProfiler] = None) -> Optional[PreparedDocument]:
+        """Load config and CSS, check the output cache and process the markdown.
+
+        Returns None when the PDF was restored from the cache.
+        """
+        options = self.options
+        with stage(profiler, 'config'):
+            config = self.load_config(input_file)
+            css_content = self.load_css(config.css_file)
+
+        if options.verbose:
+            click.echo(f"Processing: {input_file}")
+            click.echo(f"CSS: {config.css_file or 'default'}")
+            click.echo(f"Logo: {config.logo_file or 'none'}")
+            click.echo(f"Company: {config.company_name}")
+            click.echo(f"Markdown engine: {config.engine}")
+            click.echo(f"Templates: {config.template_dir or 'default'}")
+
+        # The cache only holds PDFs and thumbnails, so other output formats always render
+        cache_key = None
+        if self.cache is not None:
+            with stage(profiler, 'cache'):
+                cache_key = self.cache_key(input_file, config, css_content)
+                restored = ((self.options.thumbnail or self.output_formats == {'pdf'})
+                            and self.cache.restore(cache_key, str(output_path), self.cache_suffix))
+            if restored:
+                if options.verbose:
+                    click.echo(f"Cache hit: {input_file}")
+                return None
+
+        # Process markdown, passing config to processor for fallback
+        with stage(profiler, 'process'):
+            content, metadata = self.processor.process_file(str(input_file), config)
+
+        # Update metadata with CLI options (highest priority)
+        if options.company:
+            metadata['company_name'] = options.company
+        if options.author:
+            metadata['author'] = options.author
+
+        return PreparedDocument(input_file, output_path, config, css_content, cache_key,
+                                content, metadata)
+
+    def convert(self, document: PreparedDocument, profiler: Optional[StageProfiler] = None) -> None:
+        """Convert the processed markdown to HTML (the pandoc stage)."""
+        engine = document.config.engine
+        with stage(profiler, 'pandoc' if engine == 'pandoc' else 'markdown'):
+            conversion = self.html_generator.convert(document.content, engine)
+        document.body_html = conversion.html
+        if conversion.cache_hit is not None:
+            document.pandoc_cache_hit = conversion.cache_hit
+            if self.options.verbose:
+                click.echo(f"Pandoc stage: {'cache hit' if document.pandoc_cache_hit else 'converted'}")
+
+    def compose(self, document: PreparedDocument, profiler: Optional[StageProfiler] = None) -> None:
+        """Wrap the converted HTML in the templates, split into sections if requested."""
+        options = self.options
+        config = document.config
+        write_html = 'html' in self.output_formats
+        with stage(profiler, 'logo'):
+            logo_src = self.logo_src(config.logo_file, document.css_content)
+        body_html = document.body_html = self.scale_images(document, document.body_html, profiler)
+        split = options.section_jobs is not None or self._exceeds_memory_budget(document)
+        sections = split_sections(body_html) if split else [body_html]
+        if split and len(sections) == 1 and options.section_jobs is None:
+            click.echo(f"Warning: {document.input_file} may exceed the memory budget but has no "
+                       "[CRLF] page breaks to render it in sections at", err=True)
+        template_dir = _template_dir(config.template_dir)
+        with stage(profiler, 'template'):
+            document.html_content = self.html_generator.render_template(
+                body_html, document.metadata, document.css_content, logo_src, template_dir=template_dir
+            ) if len(sections) == 1 or write_html else None
+            document.section_documents = [
+                self.html_generator.render_template(section, document.metadata, document.css_content,
+                                                    logo_src, title_page=index == 0,
+                                                    template_dir=template_dir)
+                for index, section in enumerate(sections)
+            ] if len(sections) > 1 else []
+
+        if write_html:
+            html_path = document.output_path.with_suffix('.html')
+            self.html_generator.save_html(self_contained_html(document.html_content, document.base_url),
+                                          str(html_path))
+            if options.verbose:
+                click.echo(f"Saved HTML: {html_path}")
+
+    def scale_images(self, document: PreparedDocument, body_html: str,
+                     profiler: Optional[StageProfiler] = None) -> str:
+        """Point the converted HTML's images at copies downscaled to the page's print resolution."""
+        config = document.config
+        if not config.scale_images:
+            return body_html
+        with stage(profiler, 'images'):
+            return self.image_optimizer.optimize(body_html, document.base_url, document.css_content,
+                                                 config.dpi or DEFAULT_DPI,
+                                                 config.jpeg_quality or JPEG_QUALITY)
+
+    def write_output(self, document: PreparedDocument, pdf: bytes) -> None:
+        """Write a PDF laid out elsewhere (e.g. in a pool worker) and add it to the output cache."""
+        _unlink_hard_link(document.output_path)
+        with open(document.output_path, 'wb') as f:
+            f.write(pdf)
+        self.store(document)
+
+    def store(self, document: PreparedDocument, profiler: Optional[StageProfiler] = None) -> None:
+        """Add the written PDF (or thumbnail) to the output cache."""
+        if document.cache_key is not None:
+            with stage(profiler, 'cache store'):
+                self.cache.store(document.cache_key, str(document.output_path), self.cache_suffix)
+
+    def _exceeds_memory_budget(self, document: PreparedDocument) -> bool:
+        """Whether laying out the document in one piece would likely go over the memory budget."""
+        if self.memory_budget is None or import_pypdf() is None:
+            return False
+        estimate = self.memory_budget.estimate(len(document.body_html))
+        if estimate <= self.memory_budget.limit:
+            return False
+        if self.options.verbose:
+            click.echo(f"Memory: about {estimate / (1024 * 1024):.0f} MB in one piece, over the "
+                       f"{self.memory_budget.limit / (1024 * 1024):.0f} MB budget; rendering in sections")
+        return True
+
+    @property
+    def section_renderer(self) -> SectionRenderer:
+        """Section layout pool, started on the first split render.
+
+        Documents split only to stay within the memory budget are laid out
+        one section at a time in this process.
+        """
+        if self._section_renderer is None:
+            self._section_renderer = SectionRenderer(self.options.section_jobs, self.font_dirs,
+                                                     generator=self.pdf_generator, cache=self.cache,
+                                                     low_memory=self.options.section_jobs is None)
+        return self._section_renderer
+
+    def close(self) -> None:
+        """Stop the section layout workers, if any were started."""
+        if self._section_renderer is not None:
+            self._section_renderer.close()
+            self._section_renderer = None
+
+    def _write_profile(self, profiler: StageProfiler, input_file: Path, output_path: Path) -> None:
+        """Save the JSON profile (and pstats of the slowest stage) next to the PDF and print a summary."""
+        profiler.record(input=str(input_file), output=str(output_path),
+                        output_size=_size(output_path), cache_hit=self.last_cache_hit)
+        report_path = output_path.with_suffix('.profile.json')
+        profiler.write_json(str(report_path))
+        click.echo(f"Profile of {input_file}:")
+        click.echo(profiler.summary())
+        click.echo(f"  report: {report_path}")
+        if profiler.use_cprofile:
+            pstats_path = output_path.with_suffix('.pstats')
+            slowest = profiler.dump_cprofile(str(pstats_path))
+            if slowest:
+                click.echo(f"  cProfile of slowest stage ({slowest}): {pstats_path}")
+
+    def cache_key(self, input_file: Path, config: BorelConfig, css_content: str) -> str:
+        """Hash everything that affects a document's PDF output."""
+        logo_digest = self.logo_digest(config.logo_file)
+        # Adding or removing a font changes its directory's mtime
+        font_dirs = self.font_dirs or self.options.font_dirs or config.font_dirs or ()
+        return self.cache.document_key(str(input_file), {
+            'config': config.to_dict(),
+            'company': self.options.company,
+            'author': self.options.author,
+            'css': hash_bytes(css_content.encode('utf-8')),
+            'logo': logo_digest,
+            'font_dirs': [(font_dir, _mtime(font_dir)) for font_dir in sorted(font_dirs)],
+            'template': self.html_generator.template_digest(_template_dir(config.template_dir)),
+            'versions': backend_versions(),
+        })
+
+    def logo_digest(self, logo_file: Optional[str]) -> Optional[str]:
+        """Content hash of a logo file, computed once per loaded logo."""
+        if not logo_file or not os.path.exists(logo_file):
+            return None
+        if logo_file not in self._logo_digests:
+            self._loaded_files[logo_file] = _mtime(logo_file)
+            self._logo_digests[logo_file] = hash_file(logo_file)
+        return self._logo_digests[logo_file]
+
+    def logo_src(self, logo_file: Optional[str], css_content: str) -> Optional[str]:
+        """Image source for the letterhead: the logo scaled to its printed size, as a data URI."""
+        digest = self.logo_digest(logo_file)
+        if digest is None:
+            return None
+        try:
+            return self.logo_processor.data_uri(logo_file, css_content, digest)
+        except OSError as e:
+            click.echo(f"Warning: Could not process logo '{logo_file}': {e}", err=True)
+            return logo_file
+
+    def invalidate(self) -> None:
+        """Forget loaded configs, CSS and logo digests so changes on disk are picked up."""
+        self.config_resolver.clear()
+        self._css_cache.clear()
+        self._logo_digests.clear()
+        self.logo_processor.clear()
+        self.image_optimizer.clear()
+        self._loaded_files.clear()
+
+    def refresh(self) -> bool:
+        """Invalidate loaded configs and CSS if any of their files changed on disk.
+
+        Returns True when something was reloaded. Long-running processes call
+        this before each render to hot-reload branding changes.
+        """
+        if self.config_resolver.refresh():
+            self.invalidate()
+            return True
+        for path, mtime in self._loaded_files.items():
+            if _mtime(path) != mtime:
+                self.invalidate()
+                return True
+        return False
+
+    def load_config(self, input_file: Path) -> BorelConfig:
+        """Load configuration for an input file and apply CLI overrides."""
+        # The resolver returns a copy, so CLI overrides never leak into the cached config
+        config = self.config_resolver.resolve(str(input_file))
+
+        options = self.options
+        if options.css_file:
+            config.css_file = options.css_file
+        if options.logo_file:
+            config.logo_file = options.logo_file
+        if options.company:
+            config.company_name = options.company
+        if options.author:
+            config.default_author = options.author
+        if options.engine:
+            config.engine = options.engine
+        if options.template_dir:
+            config.template_dir = options.template_dir
+        if options.optimize:
+            config.optimize = True
+        if options.jpeg_quality:
+            config.jpeg_quality = options.jpeg_quality
+        if options.dpi:
+            config.dpi = options.dpi
+        if options.full_fonts:
+            config.full_fonts = True
+        if options.uncompressed:
+            config.compress = False
+        if not options.scale_images:
+            config.scale_images = False
+
+        return config
+
+    def load_css(self, css_file: Optional[str]) -> str:
+        """Load CSS content from file or return default, reading each file only once."""
+        if css_file not in self._css_cache:
+            if css_file:
+                self._loaded_files[css_file] = _mtime(css_file)
+            self._css_cache[css_file] = load_css(css_file)
+        return self._css_cache[css_file]
+
+
+def pdf_options_for(config: BorelConfig) -> PDFOptions:
+    """PDF output options of a configuration; ``optimize`` fills in JPEG quality and DPI."""
+    return PDFOptions(
+        optimize_images=config.optimize,
+        jpeg_quality=config.jpeg_quality or (OPTIMIZE_JPEG_QUALITY if config.optimize else None),
+        dpi=config.dpi or (OPTIMIZE_DPI if config.optimize else None),
+        full_fonts=config.full_fonts,
+        compress=config.compress,
+    )
+
+
+def css_base_url(css_file: Optional[str]) -> Optional[str]:
+    """Base URL of a CSS file's relative ``url()`` references: its directory (None for the default CSS)."""
+    if css_file and os.path.exists(css_file):
+        return os.path.join(os.path.dirname(os.path.abspath(css_file)), '')
+    return None
+
+
+def _template_dir(template_dir: Optional[str]) -> Optional[str]:
+    """Absolute template directory, so each directory gets one Jinja environment per process."""
+    return os.path.abspath(template_dir) if template_dir else None
+
+
+def _unlink_hard_link(output_path: Path) -> None:
+    """Never write through a hard link into the cache."""
+    if os.path.exists(output_path) and os.stat(output_path).st_nlink > 1:
+        os.unlink(output_path)
+
+
+def _size(path: Path) -> Optional[int]:
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return None
+
+
+def _mtime(path: str) -> Optional[int]:
+    """Modification time of a file in nanoseconds, or None if it is missing."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def backend_versions() -> Dict[str, Optional[str]]:
+    """Versions of borel and the rendering backends, from the cached backend probe."""
+    probe = probe_backends()
+    return {'borel': __version__, 'pandoc': probe['pandoc_version'],
+            'weasyprint': probe['weasyprint_version']}
+
+
+def load_css(css_file: Optional[str]) -> str:
+    """Load CSS content from file or return default."""
+    if css_file and os.path.exists(css_file):
+        try:
+            with open(css_file, 'r', encoding='utf-8') as f:
+                return f.read()
+        except Exception as e:
+            click.echo(f"Warning: Could not read CSS file '{css_file}': {e}", err=True)
+            return get_default_css()
+    else:
+        return get_default_css()
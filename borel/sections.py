@@ -0,0 +1,392 @@
+"""
+Parallel layout of very large documents, one ``[CRLF]`` section per task.
+
+The page breaks written by ``[CRLF]`` markers start a new page anyway, so the
+sections between them can be laid out independently. Each section is laid
+out in a worker process with its page margin boxes (headers, footers, page
+numbers) switched off. The margin boxes of the whole document are then laid
+out once, on blank pages, and stamped over the stitched section pages, which
+keeps page numbering continuous across sections. So that ``@page :first``,
+``:left`` and ``:right`` rules match each section's pages as they would in
+the whole document, blank shim pages are laid out ahead of every section after
+the first and dropped before stitching. Stitching uses the optional ``pypdf``
+package.
+
+With the output cache enabled, laid-out sections are cached, so re-rendering an
+edited document only lays out the sections that changed.
+"""
+
+import gc
+import io
+import os
+import re
+from html.parser import HTMLParser
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple, Union
+
+from . import __version__
+from .backends import import_pypdf, probe_backends
+from .cache import OutputCache, compute_key, hash_bytes
+from .fetcher import URLFetcher
+from .pdf_generator import PDFGenerator, PDFOptions, parse_css
+from .profiling import StageProfiler, stage
+
+MARGIN_BOXES = (
+    'top-left-corner', 'top-left', 'top-center', 'top-right', 'top-right-corner',
+    'right-top', 'right-middle', 'right-bottom',
+    'bottom-right-corner', 'bottom-right', 'bottom-center', 'bottom-left', 'bottom-left-corner',
+    'left-bottom', 'left-middle', 'left-top',
+)
+
+# Sections are laid out without margin boxes; they come from the page frame
+SECTION_CSS = ('@page { %s }' % ' '.join(f'@{box} {{ content: none !important; }}'
+                                          for box in MARGIN_BOXES)
+               + ' .borel-shim-page { display: block !important; break-after: page !important;'
+                 ' height: 0 !important; margin: 0 !important; padding: 0 !important;'
+                 ' border: 0 !important; }')
+
+# The page frame only paints margin boxes, over the section pages
+FRAME_CSS = """
+@page { background: none !important; }
+html, body { background: none !important; }
+.borel-frame-page { break-before: page; height: 0; margin: 0; padding: 0; border: 0; }
+"""
+
+_BODY_START = re.compile(r'<body[^>]*>', re.IGNORECASE)
+# Page rules whose pages depend on the side of the spread they fall on
+_SIDED_PAGE = re.compile(r'@page[^{]*:(?:left|right|recto|verso)\b', re.IGNORECASE)
+_BODY_END = re.compile(r'</body\s*>', re.IGNORECASE)
+_VOID_ELEMENTS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+    'param', 'source', 'track', 'wbr',
+))
+
+
+class _PageBreakFinder(HTMLParser):
+    """Find the page-break divs at the top level of an HTML fragment."""
+
+    def __init__(self, text: str):
+        super().__init__(convert_charrefs=False)
+        self.text = text
+        self.breaks: List[Tuple[int, int]] = []
+        self.depth = 0
+        self._line_starts = [0] + [match.end() for match in re.finditer('\n', text)]
+        self._break_start: Optional[int] = None
+
+    def _offset(self) -> int:
+        line, column = self.getpos()
+        return self._line_starts[line - 1] + column
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _VOID_ELEMENTS:
+            return
+        classes = (dict(attrs).get('class') or '').split()
+        if tag == 'div' and self.depth == 0 and 'page-break' in classes:
+            self._break_start = self._offset()
+        self.depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in _VOID_ELEMENTS:
+            return
+        self.depth -= 1
+        if self.depth == 0 and self._break_start is not None:
+            end = self.text.index('>', self._offset()) + 1
+            self.breaks.append((self._break_start, end))
+            self._break_start = None
+
+
+def split_sections(html: str) -> List[str]:
+    """Split converted HTML at its top-level page breaks.
+
+    Every section keeps the text around the body (pandoc's standalone head),
+    so each one is a complete document. Page breaks nested inside other
+    elements (a ``[CRLF]`` in a list item) are not split at. Returns the HTML
+    unsplit if its body cannot be parsed into balanced elements.
+    """
+    start = _BODY_START.search(html)
+    ends = list(_BODY_END.finditer(html))
+    body_start = start.end() if start else 0
+    body_end = ends[-1].start() if ends and ends[-1].start() >= body_start else len(html)
+    prefix, body, suffix = html[:body_start], html[body_start:body_end], html[body_end:]
+
+    finder = _PageBreakFinder(body)
+    finder.feed(body)
+    finder.close()
+    if finder.depth != 0 or not finder.breaks:
+        return [html]
+
+    sections = []
+    position = 0
+    for break_start, break_end in finder.breaks:
+        sections.append(body[position:break_start])
+        position = break_end
+    sections.append(body[position:])
+    return [prefix + section + suffix for section in sections]
+
+
+def shim_pages(start_page: int) -> int:
+    """Blank pages to lay out ahead of a section that starts on page ``start_page`` of the document.
+
+    None for the first page; otherwise enough that the section's first page is
+    not ``:first`` and falls on the same side of the spread as in the document.
+    """
+    if start_page <= 1:
+        return 0
+    return 1 if start_page % 2 == 0 else 2
+
+
+def with_shim_pages(html: str, count: int) -> str:
+    """Insert ``count`` blank pages at the start of the body of ``html``."""
+    if count <= 0:
+        return html
+    start = _BODY_START.search(html)
+    position = start.end() if start else 0
+    return html[:position] + '<div class="borel-shim-page"></div>' * count + html[position:]
+
+
+def frame_html(css_content: str, pages: int) -> str:
+    """A document of ``pages`` blank pages that only shows the stylesheet's margin boxes."""
+    return ('<!DOCTYPE html><html><head><meta charset="UTF-8">'
+            f'<style>{css_content}</style><style>{FRAME_CSS}</style></head><body>'
+            + '<div class="borel-frame-page"></div>' * pages
+            + '</body></html>')
+
+
+class SectionStitcher:
+    """Stitch section PDFs into one document as they are laid out.
+
+    Each section is appended to the writer as soon as it arrives, so its PDF
+    bytes can be freed before the next section is laid out.
+    """
+
+    def __init__(self):
+        self.pypdf = import_pypdf()
+        self.writer = self.pypdf.PdfWriter()
+        self.metadata = None
+        self.sections = 0
+
+    def append(self, pdf: bytes) -> None:
+        reader = self.pypdf.PdfReader(io.BytesIO(pdf))
+        if self.sections == 0:
+            self.metadata = reader.metadata
+        self.writer.append(reader)
+        self.sections += 1
+
+    def finish(self, frame_pdf: bytes, target: Union[str, BinaryIO]) -> None:
+        """Stamp the page frame over every page and write the document to ``target``."""
+        for page, frame_page in zip(self.writer.pages,
+                                    self.pypdf.PdfReader(io.BytesIO(frame_pdf)).pages):
+            page.merge_page(frame_page)
+        if self.metadata:
+            self.writer.add_metadata(self.metadata)
+        # Every section embeds its own font subsets; share what is identical
+        if hasattr(self.writer, 'compress_identical_objects'):
+            self.writer.compress_identical_objects()
+        self.writer.write(target)
+
+
+def stitch(section_pdfs: Iterable[bytes], frame_pdf: bytes,
+           target: Union[str, BinaryIO]) -> None:
+    """Concatenate the section PDFs and stamp the page frame over every page."""
+    stitcher = SectionStitcher()
+    for pdf in section_pdfs:
+        stitcher.append(pdf)
+    stitcher.finish(frame_pdf, target)
+
+
+# Per-process generator, created once by the pool initializer
+_worker_generator: Optional[PDFGenerator] = None
+
+
+def _init_section_worker(font_dirs: Optional[List[str]] = None,
+                         url_fetcher: Optional[URLFetcher] = None) -> None:
+    """Pool initializer: load WeasyPrint and the font configuration once per worker."""
+    global _worker_generator
+    from .fonts import get_font_config
+    get_font_config(font_dirs)
+    _worker_generator = PDFGenerator(url_fetcher=url_fetcher)
+
+
+def layout_section(generator: PDFGenerator, html_content: str, base_url: str,
+                   pdf_options: Optional[PDFOptions] = None,
+                   shims: int = 0) -> Tuple[bytes, int]:
+    """Lay out one section without margin boxes, after ``shims`` blank pages.
+
+    Returns its PDF and page count, without the shim pages.
+    """
+    pdf_options = pdf_options or PDFOptions()
+    document = generator.render_document(with_shim_pages(html_content, shims),
+                                         [parse_css(SECTION_CSS)], base_url, pdf_options)
+    if shims:
+        document = document.copy(document.pages[shims:])
+    return document.write_pdf(**pdf_options.weasyprint_options()), len(document.pages)
+
+
+def page_count(pdf: bytes) -> int:
+    return len(import_pypdf().PdfReader(io.BytesIO(pdf)).pages)
+
+
+def _layout_section(html_content: str, base_url: str, pdf_options: Optional[PDFOptions] = None,
+                    shims: int = 0) -> Tuple[bytes, int]:
+    return layout_section(_worker_generator, html_content, base_url, pdf_options, shims)
+
+
+class SectionRenderer:
+    """Lay out the sections of a document over a pool of worker processes and stitch them.
+
+    The pool is started on first use and kept for the renderer's lifetime, so
+    a watch session pays the worker start-up (WeasyPrint import, fonts) once.
+    With a ``cache``, the laid-out pages of each section and the page frame are
+    cached by the hash of their HTML, so an edit only lays out the sections it
+    touched. With ``low_memory``, sections are laid out one at a time in this
+    process, and each one's layout is freed before the next starts.
+    """
+
+    def __init__(self, jobs: Optional[int] = None, font_dirs: Optional[List[str]] = None,
+                 generator: Optional[PDFGenerator] = None, cache: Optional[OutputCache] = None,
+                 low_memory: bool = False):
+        # 0 or None: one worker per CPU
+        self.jobs = jobs or os.cpu_count() or 1
+        self.low_memory = low_memory
+        self.font_dirs = font_dirs
+        self.generator = generator
+        self.cache = cache
+        self.last_reused = 0
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(max_workers=self.jobs,
+                                                 initializer=_init_section_worker,
+                                                 initargs=(self.font_dirs,
+                                                           getattr(self.generator, 'url_fetcher', None)))
+        return self._executor
+
+    def _key(self, html_content: str, base_url: str, pdf_options: PDFOptions,
+             shims: int = 0) -> str:
+        """Cache key of laid-out HTML: the HTML embeds the CSS, metadata and logo it depends on."""
+        return compute_key({
+            'stage': 'section',
+            'html': hash_bytes(html_content.encode('utf-8')),
+            'shims': shims,
+            'base_url': base_url,
+            'pdf_options': pdf_options.weasyprint_options(),
+            'section_css': SECTION_CSS,
+            'font_dirs': self.font_dirs,
+            'borel': __version__,
+            'weasyprint': probe_backends()['weasyprint_version'],
+        })
+
+    def _layout(self, documents: List[str], shims: List[int], base_url: str,
+                pdf_options: PDFOptions) -> Iterator[Tuple[bytes, int]]:
+        # A single section is laid out by the warm generator of this process
+        if self.low_memory or self.jobs <= 1 or len(documents) <= 1:
+            generator = self.generator or PDFGenerator()
+            for document, count in zip(documents, shims):
+                yield layout_section(generator, document, base_url, pdf_options, count)
+                if self.low_memory:
+                    # Box trees are full of reference cycles; free them before the next section
+                    gc.collect()
+            return
+        yield from self._pool().map(_layout_section, documents, [base_url] * len(documents),
+                                    [pdf_options] * len(documents), shims)
+
+    def _iter_cached(self, documents: List[str], shims: List[int], base_url: str,
+                     pdf_options: PDFOptions) -> Iterator[Tuple[bytes, int]]:
+        """Yield the sections in order, laying out those not in the cache.
+
+        Sets ``last_reused`` to how many came from the cache once done.
+        """
+        keys = ([self._key(document, base_url, pdf_options, count)
+                 for document, count in zip(documents, shims)] if self.cache
+                else [None] * len(documents))
+        missing = [index for index, key in enumerate(keys)
+                   if key is None or not self.cache.object_path(key, '.section').exists()]
+        laid_out = self._layout([documents[i] for i in missing], [shims[i] for i in missing],
+                                base_url, pdf_options)
+        reused = 0
+        for index, key in enumerate(keys):
+            pdf = self.cache.read_bytes(key, '.section') if index not in missing else None
+            if pdf is not None:
+                reused += 1
+                yield pdf, page_count(pdf)
+                continue
+            # Missing, or pruned from the cache since it was looked up
+            result = (next(laid_out) if index in missing
+                      else next(self._layout([documents[index]], [shims[index]],
+                                             base_url, pdf_options)))
+            if self.cache:
+                self.cache.write_bytes(key, result[0], '.section')
+            yield result
+        self.last_reused = reused
+
+    def iter_layout(self, documents: List[str], base_url: str,
+                    pdf_options: Optional[PDFOptions] = None) -> Iterator[Tuple[bytes, int]]:
+        """Yield the PDF and page count of every section in order, as each is laid out.
+
+        Sections not in the cache are laid out in parallel when there are
+        several workers. They only depend on the pages before them through
+        ``@page :left`` and ``:right`` rules; with those, sections are laid
+        out in order.
+        """
+        pdf_options = pdf_options or PDFOptions()
+        if not documents or not _SIDED_PAGE.search(documents[0]):
+            # One shim page is enough to keep later sections off :first
+            yield from self._iter_cached(documents, [0] + [1] * (len(documents) - 1),
+                                         base_url, pdf_options)
+            return
+
+        start_page = 1
+        reused = 0
+        for document in documents:
+            for pdf, count in self._iter_cached([document], [shim_pages(start_page)],
+                                                base_url, pdf_options):
+                yield pdf, count
+                start_page += count
+            reused += self.last_reused
+        self.last_reused = reused
+
+    def layout(self, documents: List[str], base_url: str,
+               pdf_options: Optional[PDFOptions] = None) -> List[Tuple[bytes, int]]:
+        """Lay out every section; see ``iter_layout``."""
+        return list(self.iter_layout(documents, base_url, pdf_options))
+
+    def frame(self, css_content: str, pages: int, base_url: str,
+              pdf_options: Optional[PDFOptions] = None) -> bytes:
+        """Lay out the page frame (margin boxes only) of a document with ``pages`` pages."""
+        pdf_options = pdf_options or PDFOptions()
+        html_content = frame_html(css_content, pages)
+        key = self._key(html_content, base_url, pdf_options) if self.cache else None
+        frame_pdf = self.cache.read_bytes(key, '.frame') if key else None
+        if frame_pdf is None:
+            generator = self.generator or PDFGenerator()
+            frame_pdf = generator.render_pdf(html_content, None, base_url=base_url,
+                                             pdf_options=pdf_options)
+            if key:
+                self.cache.write_bytes(key, frame_pdf, '.frame')
+        return frame_pdf
+
+    def render(self, documents: List[str], css_content: str, base_url: str,
+               target: Union[str, BinaryIO], profiler: Optional[StageProfiler] = None,
+               pdf_options: Optional[PDFOptions] = None) -> int:
+        """Render the section documents into one PDF at ``target``. Returns the page count."""
+        if import_pypdf() is None:
+            raise ImportError("pypdf is required to stitch sections. Install with: pip install pypdf")
+        stitcher = SectionStitcher()
+        pages = 0
+        with stage(profiler, 'layout'):
+            for pdf, count in self.iter_layout(documents, base_url, pdf_options):
+                stitcher.append(pdf)
+                pages += count
+        with stage(profiler, 'page frame'):
+            frame_pdf = self.frame(css_content, pages, base_url, pdf_options)
+        with stage(profiler, 'stitch'):
+            stitcher.finish(frame_pdf, target)
+        if profiler is not None:
+            profiler.record(pages=pages, sections=stitcher.sections, sections_reused=self.last_reused)
+        return pages
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
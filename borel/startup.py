@@ -0,0 +1,108 @@
+"""
+Startup report: where the time goes before borel renders anything.
+
+Imports are measured in a fresh interpreter with ``python -X importtime``, so
+modules already loaded by the reporting process do not hide their cost.
+"""
+
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+# Heavy modules imported on demand, with the stage that needs them
+STAGE_IMPORTS = [
+    ('yaml', 'frontmatter'),
+    ('jinja2', 'HTML template'),
+    ('pypandoc', 'pandoc fallback'),
+    ('PIL.Image', 'logo pipeline'),
+    ('weasyprint', 'PDF rendering'),
+]
+
+_MARKER = '@@borel-stage '
+
+_SCRIPT = f"""
+import importlib, sys
+def mark(name):
+    sys.stderr.write({_MARKER!r} + name + '\\n')
+    sys.stderr.flush()
+mark('borel.cli')
+import borel.cli
+for name in sys.argv[1:]:
+    mark(name)
+    try:
+        importlib.import_module(name)
+    except Exception:
+        mark('!failed')
+mark('!end')
+"""
+
+
+def _parse_importtime(output: str) -> Tuple[Dict[str, float], Dict[str, Dict[str, float]], List[str]]:
+    """Split ``-X importtime`` output at the stage markers.
+
+    Returns the cumulative seconds per stage, the self time per top-level
+    package within each stage, and the stages whose import failed.
+    """
+    totals: Dict[str, float] = {}
+    packages: Dict[str, Dict[str, float]] = {}
+    failed: List[str] = []
+    stage = None
+    for line in output.splitlines():
+        if line.startswith(_MARKER):
+            name = line[len(_MARKER):]
+            if name == '!failed':
+                failed.append(stage)
+            elif name != '!end':
+                stage = name
+                totals[stage] = 0.0
+                packages[stage] = {}
+            continue
+        if stage is None or not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        name = name.rstrip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        package = name.strip().split('.')[0]
+        packages[stage][package] = packages[stage].get(package, 0.0) + int(self_us) / 1e6
+        if depth == 0:
+            totals[stage] += int(cumulative_us) / 1e6
+    return totals, packages, failed
+
+
+def measure_imports() -> Tuple[Dict[str, float], Dict[str, Dict[str, float]], List[str]]:
+    """Import the CLI and then each stage's dependencies in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _SCRIPT] + [name for name, _ in STAGE_IMPORTS],
+        capture_output=True, text=True
+    )
+    return _parse_importtime(result.stderr)
+
+
+def startup_report(top: int = 8) -> str:
+    """Format the import-time breakdown and the backend probe timing."""
+    from .backends import probe_backends
+
+    totals, packages, failed = measure_imports()
+    ms = lambda seconds: f"{seconds * 1000:8.1f} ms"  # noqa: E731
+
+    lines = ["Startup report (fresh interpreter)", "",
+             f"  borel CLI imports            {ms(totals.get('borel.cli', 0.0))}"]
+    heaviest = sorted(packages.get('borel.cli', {}).items(), key=lambda item: -item[1])[:top]
+    for package, seconds in heaviest:
+        lines.append(f"    {package:<26} {ms(seconds)}")
+
+    lines += ["", "  Imported on demand:"]
+    for name, stage in STAGE_IMPORTS:
+        status = "unavailable" if name in failed else ms(totals.get(name, 0.0)).strip()
+        lines.append(f"    {name:<12} {stage:<15} {status:>9}")
+
+    start = time.perf_counter()
+    probe = probe_backends()
+    probe_time = time.perf_counter() - start
+    lines += ["", f"  Backend probe                {ms(probe_time)}"
+              f" ({'cached' if probe['cached'] else 'probed'})",
+              f"    pandoc      {probe['pandoc_version'] or 'not found'}"
+              + (f" ({probe['pandoc_path']})" if probe['pandoc_path'] else ""),
+              f"    WeasyPrint  {probe['weasyprint_version'] or 'unavailable'}"]
+    return '\n'.join(lines)
@@ -0,0 +1,83 @@
+"""
+Process-wide cache of compiled WeasyPrint stylesheets.
+
+These are user stylesheets, which lose to every author rule in the document
+whatever its specificity. The branding CSS is therefore not one of them: the
+template inlines it, once, at author origin, where it cascades with the
+template's and pandoc's own styles.
+"""
+
+import os
+import threading
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+from .cache import hash_bytes
+from .fonts import get_font_config
+
+if TYPE_CHECKING:
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
+
+class StylesheetManager:
+    """Compile each distinct CSS source once and hand out the compiled stylesheet.
+
+    Compiled stylesheets are keyed by a hash of their content, their base URL
+    (which relative ``url()`` references resolve against) and the font
+    configuration their ``@font-face`` rules were registered in, so the same
+    branding CSS loaded from a file, from ``get_default_css()`` or passed as a
+    string is only parsed once per process.
+    """
+
+    def __init__(self):
+        # Each entry keeps its font configuration alive, so the id in its key is not reused
+        self._compiled: Dict[Tuple[str, Optional[str], int], Tuple["FontConfiguration", "CSS"]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, css_content: str, base_url: Optional[str] = None,
+            font_config: Optional["FontConfiguration"] = None) -> "CSS":
+        """Return the compiled stylesheet for a CSS string.
+
+        ``font_config`` defaults to the process-wide font configuration, which
+        must also be the one used to render (``@font-face`` rules register
+        their fonts in it).
+        """
+        if font_config is None:
+            font_config = get_font_config()
+        key = (hash_bytes(css_content.encode('utf-8')), base_url, id(font_config))
+        with self._lock:
+            entry = self._compiled.get(key)
+            if entry is not None:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        from weasyprint import CSS
+        stylesheet = CSS(string=css_content, base_url=base_url, font_config=font_config)
+        with self._lock:
+            return self._compiled.setdefault(key, (font_config, stylesheet))[1]
+
+    def get_file(self, css_file: str) -> "CSS":
+        """Return the compiled stylesheet for a CSS file."""
+        with open(css_file, 'r', encoding='utf-8') as f:
+            css_content = f.read()
+        return self.get(css_content, os.path.join(os.path.dirname(os.path.abspath(css_file)), ''))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._compiled.clear()
+
+    def __len__(self) -> int:
+        return len(self._compiled)
+
+
+_manager: Optional[StylesheetManager] = None
+
+
+def get_stylesheet_manager() -> StylesheetManager:
+    """Return the stylesheet manager shared by every renderer in this process."""
+    global _manager
+    if _manager is None:
+        _manager = StylesheetManager()
+    return _manager
@@ -0,0 +1,260 @@
+"""
+Watch mode: keep a warm renderer and re-render documents when their inputs change.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import click
+
+from .batch import collect_inputs
+from .html_generator import TEMPLATE_NAMES
+from .renderer import DocumentRenderer, RenderOptions
+
+# inotify event flags (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct('iIII')
+_WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+               IN_MOVED_TO | IN_CREATE | IN_DELETE)
+
+
+class PollingWatcher:
+    """Detect changes by comparing file mtimes and sizes at a fixed interval."""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._snapshot: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._directories: Set[str] = set()
+
+    @staticmethod
+    def _stat(path: str) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(path)
+            return st.st_mtime_ns, st.st_size
+        except OSError:
+            return None
+
+    def set_paths(self, paths: Set[str], directories: Set[str]) -> None:
+        """Watch the given files. Directories are scanned for new markdown files."""
+        snapshot = {path: self._snapshot.get(path, self._stat(path)) for path in paths}
+        for directory in directories:
+            for md in Path(directory).rglob('*.md'):
+                path = str(md.resolve())
+                snapshot.setdefault(path, self._snapshot.get(path, self._stat(path)))
+        self._directories = directories
+        self._snapshot = snapshot
+
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        """Block until something changes (or timeout) and return the changed paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path, previous in list(self._snapshot.items()):
+                current = self._stat(path)
+                if current != previous:
+                    self._snapshot[path] = current
+                    changed.add(path)
+            for directory in self._directories:
+                for md in Path(directory).rglob('*.md'):
+                    path = str(md.resolve())
+                    if path not in self._snapshot:
+                        self._snapshot[path] = self._stat(path)
+                        changed.add(path)
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self.interval if deadline is None
+                       else max(0.0, min(self.interval, deadline - time.monotonic())))
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify watcher on the directories that contain watched files."""
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c') or 'libc.so.6'
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        self._fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watches: Dict[int, str] = {}
+        self._paths: Set[str] = set()
+        self._directories: Set[str] = set()
+
+    def set_paths(self, paths: Set[str], directories: Set[str]) -> None:
+        """Watch the given files. Directories are watched for new markdown files."""
+        self._paths = set(paths)
+        self._directories = set(directories)
+        wanted = {os.path.dirname(path) for path in paths} | self._all_subdirectories(directories)
+        watched = set(self._watches.values())
+        for directory in wanted - watched:
+            wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+            if wd >= 0:
+                self._watches[wd] = directory
+
+    @staticmethod
+    def _all_subdirectories(directories: Set[str]) -> Set[str]:
+        result = set()
+        for directory in directories:
+            for root, _, _ in os.walk(directory):
+                result.add(os.path.abspath(root))
+        return result
+
+    def _is_relevant(self, path: str) -> bool:
+        if path in self._paths:
+            return True
+        return path.endswith('.md') and any(
+            path.startswith(directory + os.sep) for directory in self._directories)
+
+    def wait(self, timeout: Optional[float] = None) -> Set[str]:
+        """Block until a watched file changes (or timeout) and return the changed paths."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self._fd], [], [], remaining)
+            if not readable:
+                return set()
+            changed = set()
+            for directory, name in self._read_events():
+                path = os.path.join(directory, name)
+                if self._is_relevant(path):
+                    changed.add(path)
+            if changed:
+                return changed
+
+    def _read_events(self) -> Iterable[Tuple[str, str]]:
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if wd in self._watches and name:
+                yield self._watches[wd], os.fsdecode(name)
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+def create_watcher(interval: float = 0.5):
+    """Use inotify where the platform provides it, otherwise poll."""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(interval)
+
+
+class WatchSession:
+    """Render documents once, then re-render only those affected by each change."""
+
+    def __init__(self, inputs: Iterable[str], options: RenderOptions, debounce: float = 0.2,
+                 watcher=None):
+        self.inputs = list(inputs)
+        self.options = options
+        self.debounce = debounce
+        self.renderer = DocumentRenderer(options)
+        self.watcher = watcher or create_watcher()
+        self.documents: List[str] = []
+        # Watched path -> documents that depend on it
+        self.dependents: Dict[str, Set[str]] = {}
+
+    def _collect(self) -> None:
+        files, _ = collect_inputs(self.inputs)
+        self.documents = [str(path.resolve()) for path in files]
+
+    def _dependencies(self, document: str) -> Set[str]:
+        """Files whose change should re-render a document."""
+        deps = {document}
+        deps.update(self.renderer.config_resolver.config_files(os.path.dirname(document)))
+        config = self.renderer.load_config(Path(document))
+        for path in (config.css_file, config.logo_file):
+            if path:
+                deps.add(os.path.abspath(path))
+        if config.template_dir:
+            for name in TEMPLATE_NAMES:
+                path = os.path.join(config.template_dir, name)
+                if os.path.exists(path):
+                    deps.add(os.path.abspath(path))
+        return deps
+
+    def _update_watches(self) -> None:
+        self.dependents = {}
+        for document in self.documents:
+            for dep in self._dependencies(document):
+                self.dependents.setdefault(dep, set()).add(document)
+        directories = {os.path.abspath(arg) for arg in self.inputs if os.path.isdir(arg)}
+        self.watcher.set_paths(set(self.dependents), directories)
+
+    def render(self, documents: Iterable[str]) -> None:
+        """Render documents with the warm renderer, printing per-render latency."""
+        for document in documents:
+            if not os.path.exists(document):
+                continue
+            start = time.perf_counter()
+            try:
+                output = self.renderer.render(Path(document))
+                click.echo(f"Generated: {output} ({time.perf_counter() - start:.2f}s)")
+            except Exception as e:
+                click.echo(f"Failed: {document}: {e}", err=True)
+
+    def affected(self, changed: Set[str]) -> List[str]:
+        """Documents depending on any of the changed paths, in input order."""
+        affected = set()
+        for path in changed:
+            affected |= self.dependents.get(path, set())
+            if path.endswith('.md') and path not in self.dependents:
+                # A new markdown file appeared in a watched directory
+                affected.add(path)
+        return [document for document in self.documents if document in affected]
+
+    def run(self) -> None:
+        """Render everything, then watch until interrupted."""
+        self._collect()
+        self.render(self.documents)
+        self._update_watches()
+        click.echo(f"Watching {len(self.documents)} document(s) for changes. Press Ctrl+C to stop.")
+        try:
+            while True:
+                changed = self.watcher.wait()
+                # Debounce bursts of saves (editors often write several times)
+                while True:
+                    more = self.watcher.wait(self.debounce)
+                    if not more:
+                        break
+                    changed |= more
+
+                if any(path not in self.documents for path in changed):
+                    # Config, CSS or logo changed: drop the renderer's loaded copies
+                    self.renderer.invalidate()
+                    self._collect()
+                self.render(self.affected(changed))
+                self._update_watches()
+        except KeyboardInterrupt:
+            click.echo("Stopped watching.")
+        finally:
+            self.watcher.close()
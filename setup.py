@@ -41,6 +41,12 @@ setup(
         "pyyaml>=6.0",
     ],
     extras_require={
+        "sections": [
+            "pypdf>=3.0",
+        ],
+        "previews": [
+            "pypdfium2>=4.0",
+        ],
         "dev": [
             "pytest>=6.0",
             "pytest-cov>=2.0",
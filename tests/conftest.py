@@ -0,0 +1,140 @@
+"""
+Shared test fixtures.
+"""
+
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+# Add the borel package to the path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from borel import fonts, renderer, stylesheets
+from borel.backends import import_weasyprint
+
+
+class FakeCSS:
+    """A parsed stylesheet; counts how often CSS is parsed."""
+
+    parsed = 0
+
+    def __init__(self, string=None, filename=None, base_url=None, font_config=None):
+        if filename is not None:
+            with open(filename, encoding='utf-8') as f:
+                string = f.read()
+        self.string = string
+        self.base_url = base_url
+        self.font_config = font_config
+        FakeCSS.parsed += 1
+
+
+class FakeDocument:
+    def __init__(self, html, stylesheets):
+        self.html = html
+        self.stylesheets = stylesheets
+        self.pages = [object()]
+
+    def write_pdf(self, target=None, **options):
+        data = b'%PDF-fake ' + (self.html.string or '').encode('utf-8')
+        if target is None:
+            return data
+        if hasattr(target, 'write'):
+            target.write(data)
+        else:
+            with open(target, 'wb') as f:
+                f.write(data)
+        return None
+
+
+class FakeHTML:
+    """Records how documents are loaded and laid out, instead of running WeasyPrint."""
+
+    loaded = []
+
+    def __init__(self, string=None, filename=None, base_url=None, url_fetcher=None):
+        self.string = string
+        self.filename = filename
+        self.base_url = base_url
+        self.url_fetcher = url_fetcher
+        if filename is not None:
+            with open(filename, encoding='utf-8') as f:
+                self.string = f.read()
+        self.render_calls = []
+        FakeHTML.loaded.append(self)
+
+    def render(self, stylesheets=(), font_config=None, cache=None, **options):
+        self.render_calls.append({'stylesheets': list(stylesheets), 'font_config': font_config,
+                                  'cache': cache, 'options': options})
+        return FakeDocument(self, list(stylesheets))
+
+    def write_pdf(self, target=None, stylesheets=(), font_config=None, **options):
+        return self.render(stylesheets, font_config).write_pdf(target)
+
+
+class FakeFontConfiguration:
+    pass
+
+
+class FakePDFGenerator:
+    """Stands in for the PDF generator: records the HTML laid out and returns ``pdf(html)``."""
+
+    profiler = None
+    laid_out = []
+    # By default the 'PDF' is the length of the laid-out HTML
+    pdf = staticmethod(lambda html_content: b'%PDF ' + str(len(html_content)).encode())
+
+    def __init__(self, font_config=None, url_fetcher=None):
+        self.url_fetcher = url_fetcher
+
+    def render_pdf(self, html_content, target=None, stylesheets=None, base_url=None, pdf_options=None,
+                   image_cache=None):
+        self.laid_out.append(html_content)
+        return self.pdf(html_content)
+
+    def render_first_page(self, html_content, base_url=None, pdf_options=None, stylesheets=None):
+        self.laid_out.append(html_content)
+        return self.pdf(html_content)
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep every test's caches out of the user's cache directory."""
+    path = tmp_path / "borel-cache"
+    monkeypatch.setenv('BOREL_CACHE_DIR', str(path))
+    yield path
+
+
+@pytest.fixture
+def fake_weasyprint(monkeypatch):
+    """Stand in for WeasyPrint, which needs Pango, with a module that records its calls."""
+    module = types.ModuleType('weasyprint')
+    module.__version__ = 'fake'
+    module.HTML = FakeHTML
+    module.CSS = FakeCSS
+    text = types.ModuleType('weasyprint.text')
+    text.fonts = types.ModuleType('weasyprint.text.fonts')
+    text.fonts.FontConfiguration = FakeFontConfiguration
+    module.text = text
+    monkeypatch.setitem(sys.modules, 'weasyprint', module)
+    monkeypatch.setitem(sys.modules, 'weasyprint.text', text)
+    monkeypatch.setitem(sys.modules, 'weasyprint.text.fonts', text.fonts)
+    monkeypatch.setattr(FakeHTML, 'loaded', [])
+    monkeypatch.setattr(FakeCSS, 'parsed', 0)
+    # Nothing set up with the fake may outlive the test
+    monkeypatch.setattr(fonts, '_font_config', None)
+    monkeypatch.setattr(stylesheets, '_manager', None)
+    import_weasyprint.cache_clear()
+    yield module
+    import_weasyprint.cache_clear()
+
+
+@pytest.fixture
+def fake_pdf_generator(monkeypatch, fake_weasyprint):
+    """Render documents with ``FakePDFGenerator`` and no font setup; yields the class."""
+    monkeypatch.setattr(FakePDFGenerator, 'laid_out', [])
+    monkeypatch.setattr(renderer, 'PDFGenerator', FakePDFGenerator)
+    monkeypatch.setattr(renderer, 'get_font_config', lambda font_dirs=None: None)
+    monkeypatch.setattr(renderer, 'preload_fonts', lambda stylesheets: None)
+    yield FakePDFGenerator
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Tests for cached backend probing.
+"""
+
+import sys
+
+from borel import backends
+
+
+def test_missing_pandoc_is_cached_until_one_is_installed(tmp_path, monkeypatch):
+    pandoc = tmp_path / "bin" / "pandoc"
+    pandoc.parent.mkdir()
+    monkeypatch.setenv('PYPANDOC_PANDOC', str(pandoc))
+    monkeypatch.setattr(backends, 'probe_path', lambda: tmp_path / "backends.json")
+    probes = []
+    probe = backends._probe
+    monkeypatch.setattr(backends, '_probe', lambda: probes.append(1) or probe())
+    backends.probe_backends.cache_clear()
+    try:
+        assert backends.probe_backends()['pandoc_path'] is None
+        backends.probe_backends.cache_clear()
+        result = backends.probe_backends()
+        assert result['pandoc_path'] is None and result['cached']
+        assert len(probes) == 1
+
+        pandoc.write_text(f"#!{sys.executable}\nprint('pandoc 3.1.2')\n")
+        pandoc.chmod(0o755)
+        backends.probe_backends.cache_clear()
+        result = backends.probe_backends()
+        assert (result['pandoc_path'], result['pandoc_version'], result['cached']) == (str(pandoc), '3.1.2', False)
+        assert len(probes) == 2
+    finally:
+        backends.probe_backends.cache_clear()
+
+
+def test_weasyprint_is_found_once_its_libraries_are_installed(tmp_path, monkeypatch, fake_weasyprint):
+    monkeypatch.setenv('PYPANDOC_PANDOC', str(tmp_path / "pandoc"))
+    monkeypatch.setattr(backends, 'probe_path', lambda: tmp_path / "backends.json")
+    # Pango is missing: WeasyPrint fails to load
+    monkeypatch.setitem(sys.modules, 'weasyprint', None)
+    backends.import_weasyprint.cache_clear()
+    backends.probe_backends.cache_clear()
+    try:
+        assert not backends.probe_backends()['weasyprint_available']
+
+        # Installing Pango changes nothing the fingerprint covers
+        monkeypatch.setitem(sys.modules, 'weasyprint', fake_weasyprint)
+        backends.import_weasyprint.cache_clear()
+        backends.probe_backends.cache_clear()
+        result = backends.probe_backends()
+        assert (result['weasyprint_available'], result['weasyprint_version'], result['cached']) == (
+            True, 'fake', False)
+        backends.probe_backends.cache_clear()
+        assert backends.probe_backends()['cached']
+    finally:
+        backends.probe_backends.cache_clear()
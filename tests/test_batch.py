@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Tests for batch input collection.
+"""
+
+from borel.batch import collect_inputs
+
+
+def test_collect_inputs_expands_dirs_and_globs(tmp_path):
+    """Directories are searched recursively and globs are expanded without duplicates."""
+    (tmp_path / "notes" / "sub").mkdir(parents=True)
+    first = tmp_path / "notes" / "a.md"
+    second = tmp_path / "notes" / "sub" / "b.md"
+    first.write_text("# A")
+    second.write_text("# B")
+    (tmp_path / "notes" / "ignored.txt").write_text("not markdown")
+
+    files, unmatched = collect_inputs([
+        str(tmp_path / "notes"),
+        str(tmp_path / "notes" / "*.md"),
+        str(tmp_path / "missing-*.md"),
+    ])
+
+    assert files == [first, second]
+    assert unmatched == [str(tmp_path / "missing-*.md")]
+
+
+def test_collect_inputs_keeps_explicit_files(tmp_path):
+    """Explicit files are accepted whatever their extension."""
+    note = tmp_path / "note.markdown"
+    note.write_text("# Note")
+
+    files, unmatched = collect_inputs([str(note)])
+
+    assert files == [note]
+    assert unmatched == []
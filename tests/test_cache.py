@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the content-addressed output cache.
+"""
+
+import os
+import time
+
+from click.testing import CliRunner
+
+from borel import cli, html_generator
+from borel.cache import OutputCache, StageCache
+from borel.html_generator import HTMLGenerator
+
+
+def test_key_changes_with_content_and_parts(tmp_path):
+    """Keys depend on the markdown bytes and on every other key component."""
+    cache = OutputCache(str(tmp_path / "cache"))
+    note = tmp_path / "note.md"
+    note.write_text("---\ndate: 2025-01-15\n---\n# Note\n")
+
+    key = cache.document_key(str(note), {'css': 'a'})
+    assert cache.document_key(str(note), {'css': 'a'}) == key
+    assert cache.document_key(str(note), {'css': 'b'}) != key
+
+    note.write_text("---\ndate: 2025-01-15\n---\n# Edited note\n")
+    assert cache.document_key(str(note), {'css': 'a'}) != key
+
+
+def test_restore_after_store(tmp_path):
+    """A stored PDF is materialized at a new output path on a hit."""
+    cache = OutputCache(str(tmp_path / "cache"))
+    rendered = tmp_path / "rendered.pdf"
+    rendered.write_bytes(b"%PDF-1.7 test")
+
+    assert not cache.restore("ab" * 32, str(tmp_path / "out.pdf"))
+    cache.store("ab" * 32, str(rendered))
+    assert cache.restore("ab" * 32, str(tmp_path / "out.pdf"))
+    assert (tmp_path / "out.pdf").read_bytes() == b"%PDF-1.7 test"
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_prune_evicts_least_recently_used(tmp_path):
+    """Pruning removes the oldest entries first until the cache fits."""
+    cache = OutputCache(str(tmp_path / "cache"))
+    rendered = tmp_path / "rendered.pdf"
+    rendered.write_bytes(b"x" * 100)
+
+    for index, key in enumerate(("aa" * 32, "bb" * 32, "cc" * 32)):
+        cache.store(key, str(rendered))
+        past = time.time() - 100 + index
+        os.utime(cache.object_path(key), (past, past))
+
+    removed, freed = cache.prune(max_size=200)
+
+    assert (removed, freed) == (1, 100)
+    assert not cache.object_path("aa" * 32).exists()
+    assert cache.object_path("cc" * 32).exists()
+
+
+def test_runs_without_cache_still_prune_the_resources(tmp_path, cache_dir, monkeypatch):
+    """Logos, images and fetched resources are cached on every run, so every run prunes."""
+    cache = OutputCache(str(cache_dir))
+    cache.write_bytes("aa" * 32, b"x" * (2 * 1024 * 1024), '.blob')
+    note = tmp_path / "note.md"
+    note.write_text("# Note")
+    monkeypatch.setattr(cli, 'check_weasyprint_available', lambda: True)
+    monkeypatch.setattr(cli, '_render_single', lambda *args: None)
+
+    result = CliRunner().invoke(cli.main, [str(note), '--cache-size', '1'])
+    assert result.exit_code == 0, result.output
+    assert not cache.object_path("aa" * 32, '.blob').exists()
+
+
+def test_stage_cache_counts_hits_and_misses(tmp_path):
+    """Stage results round-trip through the shared cache and are counted."""
+    stage = StageCache(OutputCache(str(tmp_path / "cache")), 'pandoc')
+    key = stage.key({'markdown': 'abc', 'pandoc': '3.1'})
+
+    assert stage.get(key) is None
+    stage.put(key, "<h1>Hi</h1>")
+    assert stage.get(key) == "<h1>Hi</h1>"
+    assert (stage.hits, stage.misses) == (1, 1)
+    assert stage.key({'markdown': 'abc', 'pandoc': '3.2'}) != key
+
+
+def test_conversion_reports_cache_hits_and_fallbacks(tmp_path, monkeypatch):
+    """How a document was converted comes back with it, not from shared counters."""
+    monkeypatch.setattr(html_generator, 'get_pandoc_version', lambda: '3.1')
+    stage = StageCache(OutputCache(str(tmp_path / "cache")), 'pandoc')
+    generator = HTMLGenerator(stage_cache=stage)
+    monkeypatch.setattr(generator, '_convert_markdown', lambda content: ("<h1>Hi</h1>", False))
+
+    first, second = generator.convert("# Hi"), generator.convert("# Hi")
+    assert (first.cache_hit, second.cache_hit) == (False, True)
+    assert second.html == "<h1>Hi</h1>" and not second.fallback
+
+    # The degraded fallback is reported and never cached
+    monkeypatch.setattr(generator, '_convert_markdown', lambda content: ("<p>Bye</p>", True))
+    conversion = generator.convert("Bye")
+    assert (conversion.cache_hit, conversion.fallback) == (False, True)
+    assert generator.convert("Bye").cache_hit is False
+    assert generator.convert("# Hi", engine='native').cache_hit is None
+
+
+def test_adding_a_font_invalidates_cached_documents(tmp_path, fake_pdf_generator):
+    from borel.renderer import DocumentRenderer, RenderOptions
+    fonts = tmp_path / "fonts"
+    fonts.mkdir()
+    source = tmp_path / "note.md"
+    source.write_text("# Note")
+    renderer = DocumentRenderer(RenderOptions(font_dirs=[str(fonts)], cache=True,
+                                              cache_dir=str(tmp_path / "cache")))
+    config = renderer.load_config(source)
+
+    key = renderer.cache_key(source, config, "body {}")
+    assert renderer.cache_key(source, config, "body {}") == key
+    (fonts / "Brand.ttf").write_bytes(b"font")
+    os.utime(fonts, ns=(time.time_ns() + 10 ** 9,) * 2)
+    assert renderer.cache_key(source, config, "body {}") != key
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Tests for configuration discovery.
+"""
+
+import json
+import os
+
+from borel.config import ConfigResolver
+
+
+def test_nested_configs_merge_and_refresh_on_change(tmp_path):
+    """Child configs override their parents; changed or new files are picked up by refresh."""
+    (tmp_path / "borel.config.json").write_text(json.dumps({"company_name": "Acme", "engine": "native"}))
+    team = tmp_path / "team" / "notes"
+    team.mkdir(parents=True)
+    team_config = tmp_path / "team" / "borel.config.json"
+    team_config.write_text(json.dumps({"company_name": "Acme Labs"}))
+
+    resolver = ConfigResolver()
+    config = resolver.resolve(str(team / "a.md"))
+    assert (config.company_name, config.engine) == ("Acme Labs", "native")
+    assert resolver.config_files(str(team)) == (str(tmp_path / "borel.config.json"), str(team_config))
+
+    config.company_name = "Changed"
+    assert resolver.resolve(str(team / "b.md")).company_name == "Acme Labs"
+    assert not resolver.refresh()
+
+    team_config.write_text(json.dumps({"company_name": "Acme Research"}))
+    os.utime(team_config, ns=(0, 0))
+    (team / "borel.config.json").write_text(json.dumps({"default_author": "Ada"}))
+    assert resolver.refresh()
+    config = resolver.resolve(str(team / "a.md"))
+    assert (config.company_name, config.default_author) == ("Acme Research", "Ada")
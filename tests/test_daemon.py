@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Tests for the render daemon protocol and the CLI's hand-off to it.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from borel import cli, daemon
+from borel.batch import BatchResult
+from borel.daemon import DaemonClient, RenderDaemon, parse_address
+from borel.renderer import RenderOptions
+
+
+def _fake_render(input_file, output_path, options, cwd):
+    if input_file.endswith('broken.md'):
+        return BatchResult(Path(input_file), error='broken')
+    return BatchResult(Path(input_file), Path(input_file).with_suffix('.pdf'))
+
+
+@pytest.fixture
+def running_daemon(tmp_path, monkeypatch):
+    """A daemon on a Unix socket in ``tmp_path``, rendering with a fake in threads."""
+    monkeypatch.setattr(daemon, '_daemon_render', _fake_render)
+    server = RenderDaemon(str(tmp_path / 'borel.sock'), workers=2)
+    server.executor = ThreadPoolExecutor(2)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    # The daemon answers pings once it is serving
+    for _ in range(200):
+        client = DaemonClient.connect(server.address)
+        if client is not None:
+            client.close()
+            break
+        thread.join(0.01)
+    yield server
+    server.server.shutdown()
+    thread.join(5)
+
+
+def test_only_loopback_addresses_are_accepted():
+    assert parse_address(':8765') == ('127.0.0.1', 8765)
+    assert parse_address('localhost:8765') == ('localhost', 8765)
+    assert parse_address('/tmp/borel.sock') == '/tmp/borel.sock'
+    for address in ('0.0.0.0:8765', '192.168.1.10:8765', 'example.com:8765'):
+        with pytest.raises(ValueError):
+            parse_address(address)
+    with pytest.raises(ValueError):
+        RenderDaemon(('0.0.0.0', 8765))
+
+
+def test_jobs_are_streamed_back_to_the_client(running_daemon, tmp_path):
+    assert oct(Path(running_daemon.address).stat().st_mode & 0o777) == '0o600'
+    client = DaemonClient.connect(running_daemon.address)
+    assert client is not None
+    try:
+        jobs = [{'input': str(tmp_path / 'a.md')}, {'input': str(tmp_path / 'broken.md')}]
+        results = sorted(client.render(jobs, RenderOptions()), key=lambda result: result.input_file)
+        assert [(result.input_file.name, result.ok) for result in results] == [
+            ('a.md', True), ('broken.md', False)]
+        assert results[0].output_path == tmp_path / 'a.pdf'
+        stats = client.call({'op': 'stats'})
+        assert (stats['jobs'], stats['failed'], stats['in_flight']) == (2, 1, 0)
+        assert not client.call({'op': 'nonsense'})['ok']
+    finally:
+        client.close()
+
+
+def test_cli_hands_jobs_to_a_running_daemon(running_daemon, tmp_path, monkeypatch):
+    note = tmp_path / 'note.md'
+    note.write_text('# Note')
+    monkeypatch.setattr(cli, '_render_single', lambda *args: pytest.fail('rendered in-process'))
+    result = CliRunner().invoke(cli.main, [str(note), '--daemon', running_daemon.address])
+    assert result.exit_code == 0, result.output
+    assert running_daemon.stats['jobs'] == 1
+
+
+def test_cli_renders_in_process_without_a_daemon(tmp_path, monkeypatch):
+    note = tmp_path / 'note.md'
+    note.write_text('# Note')
+    (tmp_path / 'stale.sock').write_text('')
+    rendered = []
+    monkeypatch.setattr(cli, 'check_weasyprint_available', lambda: True)
+    monkeypatch.setattr(cli, '_render_single', lambda input_file, *args: rendered.append(input_file))
+    for address in (str(tmp_path / 'missing.sock'), str(tmp_path / 'stale.sock')):
+        assert DaemonClient.connect(address) is None
+        result = CliRunner().invoke(cli.main, [str(note), '--daemon', address])
+        assert result.exit_code == 0, result.output
+    assert len(rendered) == 2
+
+
+def test_worker_renderers_are_capped(monkeypatch):
+    closed = []
+
+    class FakeRenderer:
+        def __init__(self, options):
+            self.options = options
+
+        def refresh(self):
+            return False
+
+        def close(self):
+            closed.append(self.options.company)
+
+    monkeypatch.setattr(daemon, 'DocumentRenderer', FakeRenderer)
+    monkeypatch.setattr(daemon, 'render_to_result', lambda renderer, input_file, output: None)
+    monkeypatch.setattr(daemon, '_worker_renderers', {})
+    monkeypatch.setattr(daemon.os, 'chdir', lambda cwd: None)
+    for index in range(daemon.MAX_WORKER_RENDERERS + 2):
+        daemon._daemon_render('a.md', None, RenderOptions(company=str(index)), '.')
+        # The first renderer stays warm while it keeps being used
+        daemon._daemon_render('a.md', None, RenderOptions(company='0'), '.')
+    assert len(daemon._worker_renderers) == daemon.MAX_WORKER_RENDERERS
+    assert closed == ['1', '2']
+
+
+def test_socket_is_private_from_creation(tmp_path, monkeypatch):
+    modes = []
+    monkeypatch.setattr(daemon.os, 'chmod', lambda path, mode: modes.append(os.stat(path).st_mode))
+    server = RenderDaemon(str(tmp_path / 'borel.sock'), workers=1)
+    server.executor = ThreadPoolExecutor(1)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        for _ in range(200):
+            if modes:
+                break
+            thread.join(0.01)
+        assert modes and modes[0] & 0o077 == 0
+    finally:
+        server.server.shutdown()
+        thread.join(5)
+
+
+def test_malformed_render_requests_get_an_error_reply(running_daemon, tmp_path):
+    client = DaemonClient.connect(running_daemon.address)
+    try:
+        for request in ({'op': 'render', 'jobs': [{'output': 'a.pdf'}]},
+                        {'op': 'render', 'jobs': ['a.md']},
+                        {'op': 'render', 'jobs': [], 'options': {'no_such_option': True}},
+                        {'op': 'render', 'jobs': [], 'options': ['verbose']}):
+            reply = client.call(request)
+            assert not reply['ok'] and reply['error'].startswith('Invalid render request')
+        # The connection is still served
+        assert client.call({'op': 'ping'})['ok']
+        assert running_daemon.stats['jobs'] == 0
+    finally:
+        client.close()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for the caching URL fetcher.
+"""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from borel import fetcher as fetcher_module
+from borel.cache import OutputCache
+from borel.fetcher import FetchError, URLFetcher, resource_urls
+
+
+class _Handler(BaseHTTPRequestHandler):
+    requests = 0
+
+    def do_GET(self):
+        type(self).requests += 1
+        body = b'x' * (2048 if self.path == '/large.png' else 16)
+        self.send_response(200)
+        self.send_header('Content-Type', 'image/png')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+def test_resource_urls_resolve_against_the_document():
+    html = ('<link rel="stylesheet" href="style.css"><img alt="a" src="img/a.png">'
+            '<img src="data:image/png;base64,AA=="><a href="other.html">x</a>'
+            '<style>body { background: url("bg.png") }</style><img src="https://example.com/b.png">')
+    assert resource_urls(html, '/docs/') == [
+        '/docs/img/a.png', 'https://example.com/b.png', '/docs/style.css', '/docs/bg.png',
+    ]
+
+
+def test_local_files_are_limited_to_allowed_directories(tmp_path):
+    (tmp_path / "docs").mkdir()
+    (tmp_path / "docs" / "a.png").write_bytes(b'a')
+    (tmp_path / "secret.txt").write_bytes(b's')
+    fetcher = URLFetcher(allowed_dirs=[])
+    fetched = fetcher.prefetch([f"{tmp_path}/docs/a.png", f"{tmp_path}/secret.txt"], f"{tmp_path}/docs/")
+    assert list(fetched) == [f"{tmp_path}/docs/a.png"]
+    assert fetched[f"{tmp_path}/docs/a.png"].mime_type == 'image/png'
+    with pytest.raises(FetchError):
+        fetcher.fetch(f"file://{tmp_path}/secret.txt")
+
+
+def test_remote_resources_are_cached_and_served_offline(tmp_path, server):
+    cache = OutputCache(str(tmp_path / "cache"))
+    fetcher = URLFetcher(cache, max_size=1024)
+    assert fetcher.fetch(f"{server}/logo.png").data == b'x' * 16
+    with pytest.raises(FetchError):
+        fetcher.fetch(f"{server}/large.png")
+    requests = _Handler.requests
+
+    offline = URLFetcher(cache, offline=True)
+    assert offline.fetch(f"{server}/logo.png").data == b'x' * 16
+    with pytest.raises(FetchError):
+        offline.fetch(f"{server}/missing.png")
+    assert _Handler.requests == requests
+
+
+def test_cached_resources_expire_even_when_read(tmp_path, server, monkeypatch):
+    cache = OutputCache(str(tmp_path / "cache"))
+    fetcher = URLFetcher(cache, max_age=60)
+    now = time.time()
+    # Fetched two minutes ago
+    monkeypatch.setattr(fetcher_module.time, 'time', lambda: now - 120)
+    fetcher.fetch(f"{server}/logo.png")
+    monkeypatch.undo()
+    requests = _Handler.requests
+
+    # Reading the entry refreshes its files for pruning, but not its age
+    assert URLFetcher(cache, offline=True).fetch(f"{server}/logo.png").data == b'x' * 16
+    assert fetcher.fetch(f"{server}/logo.png").data == b'x' * 16
+    assert _Handler.requests == requests + 1
+    assert fetcher.fetch(f"{server}/logo.png").data == b'x' * 16
+    assert _Handler.requests == requests + 1
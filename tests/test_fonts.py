@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Tests for the process-wide font setup.
+"""
+
+from pathlib import Path
+
+from borel.fonts import write_fontconfig_file
+
+
+def test_fontconfig_file_restricts_font_dirs(tmp_path):
+    """The generated fonts.conf lists only the given directories and is reused."""
+    fonts = tmp_path / "fonts"
+    fonts.mkdir()
+
+    path = write_fontconfig_file([str(fonts)], str(tmp_path / "cache"))
+    content = Path(path).read_text()
+    assert f"<dir>{fonts}</dir>" in content
+    assert content.count("<dir>") == 1
+    assert "/etc/fonts/conf.d" in content
+
+    assert write_fontconfig_file([str(fonts)], str(tmp_path / "cache")) == path
+    assert write_fontconfig_file([str(tmp_path)], str(tmp_path / "cache")) != path
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for downscaling embedded images before layout.
+"""
+
+import re
+
+import pytest
+
+from borel.cache import OutputCache
+from borel.config import get_default_css
+from borel.images import ImageOptimizer, content_width
+
+
+def test_content_width_from_page_size_and_margins():
+    assert content_width(get_default_css()) == pytest.approx((210 - 40) / 25.4)
+    css = ('@page { size: A4; margin: 2.5cm 2cm 2.5cm 1cm; /* margins: outer */\n'
+           '  @top-right { content: "x"; } }\n@page :first { margin: 0; }')
+    assert content_width(css) == pytest.approx((210 - 30) / 25.4)
+    assert content_width('@page { size: letter landscape; margin: 1in }') == pytest.approx(9.0)
+    assert content_width('@page { size: 8in 10in; margin-left: 2in }') == pytest.approx(8 - 2 - 75 / 96)
+    assert content_width('') == pytest.approx(210 / 25.4 - 2 * 75 / 96)
+
+
+def test_large_images_are_downscaled_and_cached(tmp_path):
+    Image = pytest.importorskip('PIL.Image')
+    Image.new('RGB', (3000, 2000), (200, 30, 30)).save(tmp_path / "shot.jpg", quality=95)
+    Image.new('RGB', (40, 40), (0, 0, 0)).save(tmp_path / "icon.png")
+    html = '<p><img src="shot.jpg" alt="Shot" /><img src="icon.png" /><img src="shot.jpg" /></p>'
+    css = '@page { size: A4; margin: 2cm }'
+    cache = OutputCache(str(tmp_path / "cache"))
+
+    optimizer = ImageOptimizer(cache, workers=2)
+    optimized = optimizer.optimize(html, f"{tmp_path}/", css, dpi=100)
+    sources = re.findall(r'src="([^"]+)"', optimized)
+    assert sources[0] == sources[2] and sources[0].startswith(str(cache.objects_dir))
+    with Image.open(sources[0]) as image:
+        assert image.width == round((210 - 40) / 25.4 * 100)
+    # Small images are never enlarged
+    with Image.open(tmp_path / sources[1]) as image:
+        assert image.width == 40
+    assert optimizer.misses == 2
+
+    again = ImageOptimizer(cache)
+    assert again.optimize(html, f"{tmp_path}/", css, dpi=100) == optimized
+    assert (again.hits, again.misses) == (2, 0)
+
+
+def test_exif_orientation_is_applied_before_downscaling(tmp_path):
+    Image = pytest.importorskip('PIL.Image')
+    exif = Image.Exif()
+    # Taken with the camera on its side: display rotated 90 degrees clockwise
+    exif[0x0112] = 6
+    Image.new('RGB', (3000, 2000), (30, 30, 200)).save(tmp_path / "photo.jpg", quality=95, exif=exif)
+    cache = OutputCache(str(tmp_path / "cache"))
+
+    optimized = ImageOptimizer(cache).optimize('<img src="photo.jpg" />', f"{tmp_path}/",
+                                               '@page { size: A4; margin: 2cm }', dpi=100)
+    source, = re.findall(r'src="([^"]+)"', optimized)
+    with Image.open(source) as image:
+        width = round((210 - 40) / 25.4 * 100)
+        assert image.size == (width, round(3000 * width / 2000))
+        assert image.getexif().get(0x0112) in (None, 1)
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Tests for the logo asset pipeline.
+"""
+
+import base64
+from io import BytesIO
+
+import pytest
+
+from borel.cache import OutputCache
+from borel.logo import LogoProcessor, letterhead_width, sanitize_svg
+
+Image = pytest.importorskip("PIL.Image")
+
+
+def test_letterhead_width_from_css():
+    """The logo box width is read from the last .letterhead rule."""
+    assert letterhead_width(".letterhead { top: 1cm; width: 3cm; }") == pytest.approx(3 / 2.54)
+    assert letterhead_width(".letterhead { width: 3cm; }\n.letterhead { width: 2in }") == 2.0
+    assert letterhead_width(".letterhead { max-width: 1in; }") == pytest.approx(3 / 2.54)
+
+
+def test_raster_logo_scaled_and_cached(tmp_path):
+    """Large logos are downsampled to the box's print resolution and cached on disk."""
+    logo = tmp_path / "logo.png"
+    Image.new("RGBA", (4000, 1000), (238, 49, 46, 255)).save(logo)
+    css = ".letterhead { width: 1in; }"
+
+    processor = LogoProcessor(OutputCache(str(tmp_path / "cache")), dpi=300)
+    data_uri = processor.data_uri(str(logo), css)
+    assert data_uri.startswith("data:image/png;base64,")
+    with Image.open(BytesIO(base64.b64decode(data_uri.split(",", 1)[1]))) as scaled:
+        assert scaled.size == (300, 75)
+
+    fresh = LogoProcessor(OutputCache(str(tmp_path / "cache")), dpi=300)
+    assert fresh.data_uri(str(logo), css) == data_uri
+    assert (fresh.hits, fresh.misses) == (1, 0)
+
+
+def test_sanitize_svg_strips_editor_data():
+    svg = (b'<svg xmlns="http://www.w3.org/2000/svg" '
+           b'xmlns:inkscape="http://www.inkscape.org/namespaces/inkscape" inkscape:version="1.0">'
+           b'<!-- exported --><metadata>x</metadata><script>alert(1)</script>'
+           b'<rect width="10" height="10" onclick="x()"/></svg>')
+    cleaned = sanitize_svg(svg)
+    assert b"<rect" in cleaned
+    for removed in (b"inkscape", b"exported", b"metadata", b"script", b"onclick"):
+        assert removed not in cleaned
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Tests for the native markdown engine. Expected output is pandoc's
+(``--from=markdown --to=html --wrap=none``, without syntax highlighting).
+"""
+
+from borel.html_generator import HTMLGenerator
+from borel.markdown_engine import MAX_NESTING, markdown_to_html
+
+
+def test_headings_inlines_and_links():
+    markdown = ('# Heading *one*\n\n## Heading *one*\n\n'
+                'Para with **bold**, `a<b`, [link](http://x.com "t") & <http://auto.com>\\\n'
+                'next "quoted" line -- it\'s [ref].\n\n[ref]: /r\n')
+    assert markdown_to_html(markdown) == (
+        '<h1 id="heading-one">Heading <em>one</em></h1>\n'
+        '<h2 id="heading-one-1">Heading <em>one</em></h2>\n'
+        '<p>Para with <strong>bold</strong>, <code>a&lt;b</code>, '
+        '<a href="http://x.com" title="t">link</a> &amp; '
+        '<a href="http://auto.com" class="uri">http://auto.com</a><br />\n'
+        'next “quoted” line – it’s <a href="/r">ref</a>.</p>\n'
+    )
+
+
+def test_lists_tables_code_and_page_breaks():
+    markdown = ('- a\n- b\n    - nested\n\n3. three\n4. four\n\n'
+                '| A | B |\n|:--|--:|\n| 1 | `x|y` |\n\n'
+                '```python\nprint("hi")\n```\n\n<div class="page-break"></div>\n\n'
+                '![Caption](images/f.png)\n')
+    assert markdown_to_html(markdown) == (
+        '<ul>\n<li>a</li>\n<li>b\n<ul>\n<li>nested</li>\n</ul></li>\n</ul>\n'
+        '<ol start="3" type="1">\n<li>three</li>\n<li>four</li>\n</ol>\n'
+        '<table>\n<thead>\n<tr>\n<th style="text-align: left;">A</th>\n'
+        '<th style="text-align: right;">B</th>\n</tr>\n</thead>\n<tbody>\n<tr>\n'
+        '<td style="text-align: left;">1</td>\n<td style="text-align: right;"><code>x|y</code></td>\n'
+        '</tr>\n</tbody>\n</table>\n'
+        '<pre class="python"><code>print(&quot;hi&quot;)</code></pre>\n'
+        '<div class="page-break"></div>\n'
+        '<figure>\n<img src="images/f.png" alt="Caption" />\n'
+        '<figcaption aria-hidden="true">Caption</figcaption>\n</figure>\n'
+    )
+
+
+def test_loose_lists_and_lists_after_paragraphs():
+    """Like pandoc, a list needs a blank line before it; blank lines between items make <p>s."""
+    markdown = 'Para\n- not a list\n\n* loose\n\n* list\n'
+    assert markdown_to_html(markdown) == (
+        '<p>Para - not a list</p>\n<ul>\n<li><p>loose</p></li>\n<li><p>list</p></li>\n</ul>\n'
+    )
+
+
+def test_deeply_nested_containers_are_kept_as_text():
+    html = markdown_to_html('>' * 1000 + ' deep\n')
+    assert html.count('<blockquote>') == MAX_NESTING
+    assert '<p>' + '&gt;' * (1000 - MAX_NESTING) + ' deep</p>' in html
+
+    html = markdown_to_html(''.join('  ' * level + '- item\n' for level in range(1000)))
+    assert html.count('<ul>') == MAX_NESTING
+
+
+def test_generator_uses_native_engine_without_pandoc():
+    generator = HTMLGenerator(engine='native')
+    assert generator._markdown_to_html('*x*') == '<p><em>x</em></p>\n'
+    assert HTMLGenerator()._markdown_to_html('*x*', engine='native') == '<p><em>x</em></p>\n'
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for memory-bounded rendering.
+"""
+
+import io
+
+import pytest
+
+from borel import sections
+from borel.memory import DEFAULT_BYTES_PER_HTML_BYTE, MemoryBudget, MemoryMonitor
+from borel.renderer import DocumentRenderer, RenderOptions
+
+
+def _blank_pdf(pypdf, pages):
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(595, 842)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def test_budget_learns_from_measured_layouts():
+    budget = MemoryBudget(limit=100 * 1024 * 1024)
+    assert budget.estimate(1000, rss=0) == 1000 * DEFAULT_BYTES_PER_HTML_BYTE
+    budget.observe(1000, 50 * 1000)
+    budget.observe(1000, 20 * 1000)
+    assert budget.estimate(1000, rss=0) == 20 * 1000
+    assert budget.fits(4 * 1024 * 1024, rss=0) and not budget.fits(6 * 1024 * 1024, rss=0)
+    # Later measurements are averaged in, not taken as they are
+    budget.observe(1000, 30 * 1000)
+    assert budget.estimate(1000, rss=0) == 23 * 1000
+
+
+def test_small_first_document_does_not_skew_the_budget():
+    budget = MemoryBudget(limit=512 * 1024 * 1024)
+    # Warm-up dominates the first, small layout
+    budget.observe(2 * 1024, 40 * 1024 * 1024)
+    budget.observe(1024 * 1024, 80 * 1024 * 1024)
+    assert budget.estimate(1024 * 1024, rss=0) == 80 * 1024 * 1024
+    assert budget.fits(4 * 1024 * 1024, rss=0)
+
+
+def test_monitor_measures_growth():
+    with MemoryMonitor() as monitor:
+        monitor.begin()
+        data = b'x' * (32 * 1024 * 1024)
+        growth = monitor.growth()
+        del data
+    assert growth > 16 * 1024 * 1024
+    assert monitor.peak > monitor.start
+
+
+def test_monitor_measures_layouts_below_the_high_water_mark():
+    """Memory freed by an earlier render is reused without growing RSS, but still counts."""
+    with MemoryMonitor() as monitor:
+        monitor.begin()
+        data = [bytearray(1024) for _ in range(64 * 1024)]
+        monitor.growth()
+        del data
+        monitor.begin()
+        data = [bytearray(1024) for _ in range(32 * 1024)]
+        growth = monitor.growth()
+        del data
+    assert growth > 16 * 1024 * 1024
+
+
+def test_over_budget_document_is_laid_out_in_sections(tmp_path, monkeypatch, fake_pdf_generator):
+    pypdf = pytest.importorskip('pypdf')
+    laid_out = []
+
+    def fake_layout(generator, html_content, base_url, pdf_options=None, shims=0):
+        laid_out.append(html_content)
+        return _blank_pdf(pypdf, 1), 1
+
+    monkeypatch.setattr(fake_pdf_generator, 'pdf', staticmethod(
+        lambda html_content: _blank_pdf(pypdf, html_content.count('borel-frame-page"'))))
+    monkeypatch.setattr(sections, 'layout_section', fake_layout)
+    source = tmp_path / "manual.md"
+    source.write_text("# One\n\n[CRLF]\n\n# Two\n\n[CRLF]\n\n# Three\n")
+
+    document_renderer = DocumentRenderer(RenderOptions(engine='native', max_memory=1))
+    output = document_renderer.render(source)
+    assert len(laid_out) == 3
+    assert len(pypdf.PdfReader(str(output)).pages) == 3
+    assert document_renderer.last_peak_memory > 0
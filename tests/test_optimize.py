@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Tests for the --optimize output mode.
+"""
+
+from borel.config import BorelConfig
+from borel.pdf_generator import dedupe_images
+from borel.renderer import pdf_options_for
+
+
+def test_identical_image_files_share_one_url(tmp_path):
+    (tmp_path / "a.png").write_bytes(b"same")
+    (tmp_path / "b.png").write_bytes(b"same")
+    (tmp_path / "c.png").write_bytes(b"other")
+    html = ('<img src="a.png" alt="A" /><img alt="B" src="b.png" />'
+            '<img src="c.png" /><img src="missing.png" /><img src="data:image/png;base64,AA==" />')
+    assert dedupe_images(html, f"{tmp_path}/") == (
+        '<img src="a.png" alt="A" /><img alt="B" src="a.png" />'
+        '<img src="c.png" /><img src="missing.png" /><img src="data:image/png;base64,AA==" />'
+    )
+
+
+def test_optimize_fills_in_quality_and_dpi_defaults():
+    assert pdf_options_for(BorelConfig()).weasyprint_options() == {
+        'optimize_images': False, 'jpeg_quality': None, 'dpi': None,
+        'full_fonts': False, 'uncompressed_pdf': False,
+    }
+    options = pdf_options_for(BorelConfig(optimize=True, dpi=150))
+    assert (options.optimize_images, options.jpeg_quality, options.dpi) == (True, 85, 150)
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for the HTML and PNG outputs.
+"""
+
+import click
+import pytest
+
+from borel.backends import import_pypdf, import_pypdfium2
+from borel.outputs import parse_pages, self_contained_html, write_previews, write_thumbnail
+
+
+def test_parse_pages():
+    assert parse_pages('1') == {1}
+    assert parse_pages('1, 3-5') == {1, 3, 4, 5}
+    assert parse_pages('all') is None
+    for spec in ('0', '2-', 'first', '', '3-1'):
+        with pytest.raises(ValueError):
+            parse_pages(spec)
+
+
+def test_reversed_page_range_is_a_bad_parameter():
+    from borel.cli import _validate_pages
+    with pytest.raises(click.BadParameter, match="'3-1'"):
+        _validate_pages(None, None, '3-1')
+
+
+def test_html_embeds_local_images(tmp_path):
+    (tmp_path / "logo.png").write_bytes(b"\x89PNG")
+    html = '<img src="logo.png" alt="Logo" /><img src="missing.png" /><img src="https://example.com/a.png" />'
+    assert self_contained_html(html, f"{tmp_path}/") == (
+        '<img src="data:image/png;base64,iVBORw==" alt="Logo" />'
+        '<img src="missing.png" /><img src="https://example.com/a.png" />'
+    )
+
+
+@pytest.mark.skipif(import_pypdfium2() is None or import_pypdf() is None,
+                    reason="needs pypdfium2 and pypdf")
+def test_previews_of_selected_pages_and_thumbnail(tmp_path):
+    writer = import_pypdf().PdfWriter()
+    for _ in range(3):
+        writer.add_blank_page(width=72, height=72)
+    pdf = tmp_path / "notes.pdf"
+    with open(pdf, 'wb') as f:
+        writer.write(f)
+
+    paths = write_previews(str(pdf), pdf, {1, 3}, dpi=144)
+    assert [path.name for path in paths] == ['notes-1.png', 'notes-3.png']
+    assert paths[0].read_bytes().startswith(b'\x89PNG')
+
+    thumbnail = write_thumbnail(str(pdf), tmp_path / "notes.thumb.png", width=30)
+    from PIL import Image
+    with Image.open(thumbnail) as image:
+        assert image.width == 30
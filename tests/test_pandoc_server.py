@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the persistent pandoc server backend, against a fake pandoc binary.
+"""
+
+import sys
+
+from borel import html_generator, pandoc_server
+from borel.html_generator import HTMLGenerator
+from borel.pandoc_server import PandocServer, get_server_pool
+
+# Serves the pandoc server HTTP API (``pandoc server --port N``), answering with
+# the server's pid so tests can tell processes apart; otherwise converts stdin
+FAKE_PANDOC = '''#!{python}
+import http.server, json, os, sys
+
+if sys.argv[1:2] != ['server']:
+    sys.stdout.write('<p>subprocess: ' + sys.stdin.read().strip() + '</p>')
+    sys.exit(0)
+if {fail}:
+    sys.exit(1)
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def reply(self, body):
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.reply('3.1')
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.reply(json.dumps({{'output': '%d:%s' % (os.getpid(), request['text']), 'base64': False}}))
+
+    def log_message(self, *args):
+        pass
+
+port = int(sys.argv[sys.argv.index('--port') + 1])
+http.server.HTTPServer(('127.0.0.1', port), Handler).serve_forever()
+'''
+
+
+def _fake_pandoc(tmp_path, fail=False):
+    path = tmp_path / ('pandoc-broken' if fail else 'pandoc')
+    path.write_text(FAKE_PANDOC.format(python=sys.executable, fail=fail))
+    path.chmod(0o755)
+    return str(path)
+
+
+def test_server_is_started_once_and_reused(tmp_path):
+    server = PandocServer(_fake_pandoc(tmp_path))
+    server.start()
+    try:
+        pid = server.process.pid
+        assert server.convert('one', {}) == f'{pid}:one'
+        connection = server._connection
+        assert server.convert('two', {}) == f'{pid}:two'
+        assert server._connection is connection
+        assert server.restarts == 0
+    finally:
+        server.stop()
+    assert server.process is None
+
+
+def test_crashed_server_is_restarted(tmp_path):
+    server = PandocServer(_fake_pandoc(tmp_path))
+    server.start()
+    try:
+        crashed = server.process
+        crashed.kill()
+        crashed.wait()
+        output = server.convert('text', {})
+        assert server.restarts == 1
+        assert server.process is not crashed
+        assert output == f'{server.process.pid}:text'
+    finally:
+        server.stop()
+
+
+def test_falls_back_to_subprocess_without_server_mode(tmp_path, monkeypatch, capsys):
+    broken = _fake_pandoc(tmp_path, fail=True)
+    monkeypatch.setattr(pandoc_server, '_pool', None)
+    monkeypatch.setattr(pandoc_server, '_pool_error', None)
+    monkeypatch.setattr(pandoc_server, 'find_pandoc', lambda: broken)
+    assert get_server_pool() is None
+    assert 'pandoc server unavailable' in capsys.readouterr().err
+    # The failure is remembered instead of probed for every document
+    monkeypatch.setattr(pandoc_server, 'find_pandoc', lambda: None)
+    assert get_server_pool() is None
+
+    monkeypatch.setattr(html_generator, 'probe_backends', lambda: {'pandoc_path': broken})
+    generator = HTMLGenerator(pandoc_backend='server')
+    assert generator._markdown_to_html('# Title') == '<p>subprocess: # Title</p>'
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for rendering PDFs from memory.
+"""
+
+import io
+import os
+import tempfile
+
+from borel.pdf_generator import PDFGenerator, PDFOptions
+
+
+def _no_temp_files(*args, **kwargs):
+    raise AssertionError("rendering must not write temporary files")
+
+
+def test_generate_pdf_renders_html_string_without_temp_files(fake_weasyprint, tmp_path, monkeypatch):
+    monkeypatch.setattr(tempfile, 'NamedTemporaryFile', _no_temp_files)
+    monkeypatch.setattr(tempfile, 'mkstemp', _no_temp_files)
+    output = tmp_path / "out.pdf"
+    base_url = f"{tmp_path}/"
+
+    assert PDFGenerator().generate_pdf('<p>Hello</p>', output, base_url=base_url) is None
+    assert output.read_bytes() == b'%PDF-fake <p>Hello</p>'
+    html, = fake_weasyprint.HTML.loaded
+    assert (html.string, html.filename, html.base_url) == ('<p>Hello</p>', None, base_url)
+
+    monkeypatch.chdir(tmp_path)
+    PDFGenerator().generate_pdf('<p>Again</p>', None)
+    # Relative URLs resolve against the current directory by default
+    assert fake_weasyprint.HTML.loaded[-1].base_url == os.path.join(str(tmp_path), '')
+
+
+def test_render_pdf_writes_to_paths_streams_or_bytes(fake_weasyprint, tmp_path):
+    generator = PDFGenerator()
+    stylesheet = fake_weasyprint.CSS(string='p { color: red }')
+
+    stream = io.BytesIO()
+    assert generator.render_pdf('<p>a</p>', stream, [stylesheet]) is None
+    assert stream.getvalue() == b'%PDF-fake <p>a</p>'
+    assert generator.render_pdf('<p>b</p>') == b'%PDF-fake <p>b</p>'
+    generator.render_pdf('<p>c</p>', str(tmp_path / "c.pdf"))
+    assert (tmp_path / "c.pdf").read_bytes() == b'%PDF-fake <p>c</p>'
+
+    # Already-parsed stylesheets are used as they are, not parsed again
+    assert fake_weasyprint.HTML.loaded[0].render_calls[0]['stylesheets'] == [stylesheet]
+    assert fake_weasyprint.CSS.parsed == 1
+
+
+def test_html_files_still_render(fake_weasyprint, tmp_path):
+    html_file = tmp_path / "page.html"
+    html_file.write_text('<p>From a file</p>')
+    css_file = tmp_path / "style.css"
+    css_file.write_text('p { color: blue }')
+
+    PDFGenerator().generate_pdf_from_html_file(str(html_file), str(tmp_path / "page.pdf"), str(css_file))
+    assert (tmp_path / "page.pdf").read_bytes() == b'%PDF-fake <p>From a file</p>'
+    stylesheet, = fake_weasyprint.HTML.loaded[0].render_calls[0]['stylesheets']
+    assert stylesheet.string == 'p { color: blue }'
+
+
+def test_image_cache_is_shared_per_pdf_options(fake_weasyprint):
+    generator = PDFGenerator()
+    optimized = PDFOptions(optimize_images=True, jpeg_quality=85)
+    for options in (None, optimized, PDFOptions(), PDFOptions(optimize_images=True, jpeg_quality=85)):
+        generator.render_pdf('<img src="a.png" />', pdf_options=options)
+    generator.render_pdf('<img src="a.png" />', pdf_options=optimized, image_cache={})
+
+    caches = [html.render_calls[0]['cache'] for html in fake_weasyprint.HTML.loaded]
+    assert caches[0] is caches[2] is generator.image_cache(PDFOptions())
+    assert caches[1] is caches[3] is generator.image_cache(optimized)
+    assert caches[0] is not caches[1]
+    # A render given its own cache leaves the shared ones alone
+    assert caches[4] == {} and all(caches[4] is not cache for cache in caches[:4])
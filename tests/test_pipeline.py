@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for the asyncio render pipeline.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from borel import pipeline
+from borel.renderer import RenderOptions
+
+
+def test_pipeline_renders_caches_and_reports_failures(tmp_path, monkeypatch, fake_pdf_generator):
+    # Lay out in threads with the fake generator, so the test needs neither WeasyPrint nor fork
+    monkeypatch.setattr(pipeline, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    inputs = []
+    for index in range(5):
+        path = tmp_path / f"note{index}.md"
+        path.write_text(f"# Note {index}\n\n" + "Some *text*.\n\n" * index)
+        inputs.append(path)
+    missing = tmp_path / "missing.md"
+    options = RenderOptions(engine='native', cache=True, cache_dir=str(tmp_path / "cache"))
+
+    results = pipeline.run_pipeline(inputs + [missing], options, jobs=2)
+    by_name = {result.input_file.name: result for result in results}
+    assert not by_name['missing.md'].ok
+    assert all(by_name[path.name].ok and not by_name[path.name].cached for path in inputs)
+    assert all(path.with_suffix('.pdf').read_bytes().startswith(b'%PDF ') for path in inputs)
+
+    async def render_again():
+        async with pipeline.AsyncRenderer(options, jobs=2, queue_size=1) as async_renderer:
+            return [result async for result in async_renderer.render_many(inputs)]
+
+    assert all(result.cached for result in asyncio.run(render_again()))
+
+
+def test_shared_renderers_close_with_their_event_loop(tmp_path, monkeypatch, fake_pdf_generator):
+    monkeypatch.setattr(pipeline, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(pipeline, '_renderers', {})
+    closed = []
+    shutdown = pipeline.AsyncRenderer._shutdown
+    monkeypatch.setattr(pipeline.AsyncRenderer, '_shutdown',
+                        lambda self, wait=True: closed.append(wait) or shutdown(self, wait))
+    source = tmp_path / "note.md"
+    source.write_text("# Note\n")
+    options = RenderOptions(engine='native', cache_dir=str(tmp_path / "cache"))
+
+    async def render_twice():
+        first = await pipeline.render(source, options=options)
+        assert await pipeline.render(source, options=options) == first
+        assert len(pipeline._renderers[asyncio.get_running_loop()]) == 1
+        return first
+
+    assert asyncio.run(render_twice()) == tmp_path / "note.pdf"
+    assert pipeline._renderers == {} and closed == [True]
+
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Tests for per-stage profiling.
+"""
+
+import json
+
+from borel.profiling import StageProfiler, stage
+
+
+def test_profiler_records_stages_and_slowest_pstats(tmp_path):
+    """Each stage gets wall, CPU and memory figures; cProfile covers the slowest one."""
+    with StageProfiler(use_cprofile=True) as profiler:
+        with stage(profiler, 'small'):
+            sum(range(1000))
+        with stage(profiler, 'large'):
+            data = [bytes(1024) for _ in range(2000)]
+            del data
+        profiler.record(pages=3)
+
+    names = [entry['stage'] for entry in profiler.stages]
+    assert names == ['small', 'large']
+    large = profiler.stages[1]
+    assert large['wall_time'] > 0 and large['peak_memory'] > 1024 * 1024
+    assert profiler.slowest_stage() == 'large'
+
+    assert profiler.dump_cprofile(str(tmp_path / 'slow.pstats')) == 'large'
+    assert (tmp_path / 'slow.pstats').exists()
+
+    profiler.write_json(str(tmp_path / 'profile.json'))
+    report = json.loads((tmp_path / 'profile.json').read_text())
+    assert report['pages'] == 3 and len(report['stages']) == 2 and 'wall_time' in report
+
+
+def test_stage_without_profiler_is_a_no_op():
+    with stage(None, 'anything'):
+        pass
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for splitting documents into sections and stitching their pages.
+"""
+
+import io
+
+import pytest
+
+from borel import sections
+from borel.cache import OutputCache
+from borel.sections import SectionRenderer, split_sections, stitch
+
+
+def _blank_pdf(pypdf, pages, title=None):
+    writer = pypdf.PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(595, 842)
+    if title:
+        writer.add_metadata({'/Title': title})
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def test_split_sections_at_top_level_page_breaks():
+    """Only top-level breaks split; every section keeps the standalone head."""
+    html = ('<html><head><title>T</title></head><body>\n'
+            '<h1>One</h1>\n<div class="page-break">\n\n</div>\n'
+            '<ul>\n<li>b\n<div class="page-break">\n\n</div>\ninline</li>\n</ul>\n'
+            '<div class="page-break"></div>\n<p>three</p>\n</body></html>')
+    parts = split_sections(html)
+
+    assert len(parts) == 3
+    assert all(section.startswith('<html><head><title>T</title></head><body>') for section in parts)
+    assert all(section.endswith('</body></html>') for section in parts)
+    assert '<h1>One</h1>' in parts[0] and 'page-break' not in parts[0]
+    assert 'inline</li>' in parts[1] and 'page-break' in parts[1]
+    assert '<p>three</p>' in parts[2]
+
+    assert split_sections('<p>no breaks</p>') == ['<p>no breaks</p>']
+    # Unbalanced markup is never split
+    unbalanced = '<div><p>a</p><div class="page-break"></div>'
+    assert split_sections(unbalanced) == [unbalanced]
+
+
+def test_stitch_keeps_page_order_and_metadata():
+    pypdf = pytest.importorskip('pypdf')
+
+    output = io.BytesIO()
+    stitch([_blank_pdf(pypdf, 2, 'Handbook'), _blank_pdf(pypdf, 3)], _blank_pdf(pypdf, 5), output)
+    reader = pypdf.PdfReader(io.BytesIO(output.getvalue()))
+
+    assert len(reader.pages) == 5
+    assert reader.metadata.title == 'Handbook'
+
+
+def test_section_cache_lays_out_only_changed_sections(tmp_path, monkeypatch):
+    pypdf = pytest.importorskip('pypdf')
+    laid_out = []
+
+    def fake_layout(generator, html_content, base_url, pdf_options=None, shims=0):
+        laid_out.append(html_content)
+        return _blank_pdf(pypdf, 2), 2
+
+    monkeypatch.setattr(sections, 'layout_section', fake_layout)
+    renderer = SectionRenderer(jobs=1, generator=object(), cache=OutputCache(str(tmp_path)))
+
+    first = renderer.layout(['<p>one</p>', '<p>two</p>', '<p>three</p>'], '/docs/')
+    assert len(laid_out) == 3 and renderer.last_reused == 0
+
+    laid_out.clear()
+    second = renderer.layout(['<p>one</p>', '<p>TWO</p>', '<p>three</p>'], '/docs/')
+    assert laid_out == ['<p>TWO</p>']
+    assert renderer.last_reused == 2
+    assert [pages for _, pages in second] == [2, 2, 2]
+    assert second[0][0] == first[0][0]
+
+
+def test_later_sections_start_after_shim_pages():
+    html = '<html><head></head><body class="x"><h1>Two</h1></body></html>'
+    assert sections.with_shim_pages(html, 0) == html
+    shim = '<div class="borel-shim-page"></div>'
+    assert sections.with_shim_pages(html, 2) == html.replace('<h1>', shim * 2 + '<h1>')
+    # Page 1 is a right page: even pages need one shim, odd pages two
+    assert [sections.shim_pages(page) for page in (1, 2, 3, 4, 5)] == [0, 1, 2, 1, 2]
+
+
+def test_sections_keep_first_and_spread_sides(monkeypatch):
+    pypdf = pytest.importorskip('pypdf')
+    shim_counts = []
+
+    def fake_layout(generator, html_content, base_url, pdf_options=None, shims=0):
+        shim_counts.append(shims)
+        return _blank_pdf(pypdf, 3), 3
+
+    monkeypatch.setattr(sections, 'layout_section', fake_layout)
+    renderer = SectionRenderer(jobs=1, generator=object())
+
+    # Without :left/:right rules only the document's first page is :first
+    renderer.layout(['<style>@page :first { counter-reset: page 0 }</style><p>one</p>',
+                     '<p>two</p>', '<p>three</p>'], '/docs/')
+    assert shim_counts == [0, 1, 1]
+
+    # With them, each section starts on the side its first page falls on: pages 1, 4 and 7
+    shim_counts.clear()
+    renderer.layout(['<style>@page :left { margin-left: 3cm }</style><p>one</p>',
+                     '<p>two</p>', '<p>three</p>'], '/docs/')
+    assert shim_counts == [0, 1, 2]
+
+
+def test_sections_are_stitched_as_they_are_laid_out(monkeypatch):
+    pypdf = pytest.importorskip('pypdf')
+    events = []
+
+    def fake_layout(generator, html_content, base_url, pdf_options=None, shims=0):
+        events.append('layout')
+        return _blank_pdf(pypdf, 1), 1
+
+    append = sections.SectionStitcher.append
+
+    def record_append(self, pdf):
+        events.append('append')
+        append(self, pdf)
+
+    monkeypatch.setattr(sections, 'layout_section', fake_layout)
+    monkeypatch.setattr(sections.SectionStitcher, 'append', record_append)
+    renderer = SectionRenderer(jobs=1, generator=object())
+    monkeypatch.setattr(renderer, 'frame', lambda css_content, pages, base_url, pdf_options=None:
+                        _blank_pdf(pypdf, pages))
+
+    output = io.BytesIO()
+    assert renderer.render(['<p>one</p>', '<p>two</p>', '<p>three</p>'], '', '/docs/', output) == 3
+    assert events == ['layout', 'append'] * 3
+    assert len(pypdf.PdfReader(io.BytesIO(output.getvalue())).pages) == 3
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Tests for compiling stylesheets once and applying the branding CSS once.
+"""
+
+from borel.html_generator import Conversion
+from borel.renderer import DocumentRenderer, RenderOptions
+from borel.stylesheets import StylesheetManager
+
+BRANDING_CSS = 'h1 { color: #c00; }'
+PANDOC_HTML = ('<!DOCTYPE html><html><head><title>Note</title><style>body { max-width: 36em; }</style>'
+               '</head><body><h1>Note</h1><style>.raw { color: red; }</style></body></html>')
+
+
+def test_each_stylesheet_is_compiled_once_per_font_configuration(fake_weasyprint):
+    manager = StylesheetManager()
+    fonts, other_fonts = object(), object()
+    first = manager.get(BRANDING_CSS, '/docs/', font_config=fonts)
+    assert manager.get(BRANDING_CSS, '/docs/', font_config=fonts) is first
+    assert fake_weasyprint.CSS.parsed == 1 and manager.hits == 1
+
+    # @font-face rules register their fonts in the configuration they are compiled with
+    assert manager.get(BRANDING_CSS, '/docs/', font_config=other_fonts).font_config is other_fonts
+    assert manager.get(BRANDING_CSS, '/other/', font_config=fonts) is not first
+    assert fake_weasyprint.CSS.parsed == 3
+
+
+def test_branding_css_is_applied_once_at_author_origin(fake_weasyprint, tmp_path):
+    css_file = tmp_path / "brand.css"
+    css_file.write_text(BRANDING_CSS)
+    (tmp_path / "note.md").write_text("# Note\n")
+    renderer = DocumentRenderer(RenderOptions(css_file=str(css_file), engine='pandoc',
+                                              cache_dir=str(tmp_path / "cache")))
+    renderer.html_generator.convert = lambda content, engine=None: Conversion(PANDOC_HTML)
+
+    renderer.render(tmp_path / "note.md")
+
+    html, = fake_weasyprint.HTML.loaded
+    # Inline, so it cascades with the template's and pandoc's styles instead of losing to them
+    assert html.string.count(BRANDING_CSS) == 1
+    assert html.string.index(BRANDING_CSS) < html.string.index('footer.borel-footer')
+    assert 'max-width: 36em' in html.string
+    # No user stylesheets, and nothing parsed again as one
+    assert html.render_calls[0]['stylesheets'] == [] and fake_weasyprint.CSS.parsed == 0
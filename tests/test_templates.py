@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Tests for the document templates.
+"""
+
+from borel.html_generator import HTMLGenerator
+
+
+def test_template_dir_overrides_packaged_templates(tmp_path):
+    """A template directory can replace the title page alone; compiled templates are reused."""
+    generator = HTMLGenerator(cache_dir=str(tmp_path / "cache"))
+    metadata = {'title': 'Notes', 'author': 'Ada', 'company_name': 'Acme'}
+
+    html = generator.render_template('<p>body</p>', metadata, 'body {}', None)
+    assert '<div class="title-page"><h1>Notes</h1><div class="author">Ada</div>' in html
+    assert '<footer class="borel-footer">Acme &copy; </footer>' in html
+    assert 'title-page"' not in generator.render_template('<p>body</p>', metadata, '', None,
+                                                         title_page=False)
+
+    templates = tmp_path / "templates"
+    templates.mkdir()
+    (templates / "title_page.html").write_text('<section class="cover">{{ metadata.title }}</section>')
+    html = generator.render_template('<p>body</p>', metadata, '', None, template_dir=str(templates))
+    assert '<section class="cover">Notes</section>' in html
+    assert '<p>body</p>' in html and 'borel-footer' in html
+
+    assert generator.load_templates() is generator.load_templates()
+    assert generator.template_digest(str(templates)) != generator.template_digest()
+    assert list((tmp_path / "cache" / "templates").iterdir())
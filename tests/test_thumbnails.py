@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Tests for first-page thumbnails.
+"""
+
+from borel import renderer
+from borel.renderer import DocumentRenderer, RenderOptions
+
+
+def test_thumbnail_lays_out_first_section_only_and_is_cached(tmp_path, monkeypatch, fake_pdf_generator):
+    monkeypatch.setattr(renderer, 'write_thumbnail',
+                        lambda pdf, path, width: path.write_bytes(b'PNG %d' % width))
+    source = tmp_path / "notes.md"
+    source.write_text("---\ntitle: Notes\n---\n\nFirst part\n\n[CRLF]\n\nSecond part\n")
+    options = RenderOptions(engine='native', thumbnail='first', thumbnail_width=120,
+                            cache=True, cache_dir=str(tmp_path / "cache"))
+
+    path = DocumentRenderer(options).render(source)
+    assert path == tmp_path / "notes.thumb.png" and path.read_bytes() == b'PNG 120'
+    html = fake_pdf_generator.laid_out[-1]
+    assert 'First part' in html and 'Second part' not in html and 'Notes' in html
+
+    path.unlink()
+    cached = DocumentRenderer(options)
+    assert cached.render(source) == path and cached.last_cache_hit
+    assert path.read_bytes() == b'PNG 120'
+
+    title = DocumentRenderer(RenderOptions(engine='native', thumbnail='title'))
+    assert title.render(source, tmp_path / "cover.png") == tmp_path / "cover.png"
+    assert 'First part' not in fake_pdf_generator.laid_out[-1]
@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+Tests for watch-mode change detection.
+"""
+
+from borel.watch import PollingWatcher
+
+
+def test_polling_watcher_reports_changed_and_new_files(tmp_path):
+    """Edits to watched files and new markdown files in watched directories are reported."""
+    note = tmp_path / "note.md"
+    css = tmp_path / "style.css"
+    note.write_text("# Note")
+    css.write_text("body {}")
+
+    watcher = PollingWatcher(interval=0.01)
+    watcher.set_paths({str(note.resolve()), str(css.resolve())}, {str(tmp_path)})
+    assert watcher.wait(timeout=0.05) == set()
+
+    css.write_text("body { color: red; }")
+    assert watcher.wait(timeout=1) == {str(css.resolve())}
+
+    (tmp_path / "new.md").write_text("# New")
+    assert watcher.wait(timeout=1) == {str((tmp_path / "new.md").resolve())}